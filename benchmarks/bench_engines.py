@@ -0,0 +1,69 @@
+import argparse
+import logging
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from synthetic_site import SyntheticSite
+from crawler.engine import CrawlConfig, CrawlEngine
+
+
+def run_crawl(engine: str, concurrency: int, site: SyntheticSite, max_depth: int, results_dir: str):
+    config = CrawlConfig(
+        start_url=site.url,
+        engine=engine,
+        workers=concurrency,
+        max_depth=max_depth,
+        delay=0,
+        host_concurrency=concurrency,
+        adaptive=False,
+        robots_cache="",
+        http_cache="",
+        results_prefix=os.path.join(results_dir, f"{engine}_{concurrency}")
+    )
+    crawler = CrawlEngine(config)
+
+    started = time.perf_counter()
+    crawler.run()
+    elapsed = time.perf_counter() - started
+
+    stats = crawler.stats.get_stats()
+    return {
+        "engine": engine,
+        "concurrency": concurrency,
+        "pages": stats["pages_crawled"],
+        "errors": stats["errors"],
+        "seconds": elapsed,
+        "pages_per_sec": stats["pages_crawled"] / elapsed if elapsed else 0,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Compare the threaded and asyncio crawl engines on a local synthetic site")
+    parser.add_argument("--pages", type=int, default=500)
+    parser.add_argument("--fanout", type=int, default=10)
+    parser.add_argument("--latency", type=float, default=0.05, help="Simulated server latency in seconds")
+    parser.add_argument("--depth", type=int, default=10)
+    parser.add_argument("--concurrency", type=int, nargs="+", default=[1, 8, 32, 128])
+    parser.add_argument("--engines", nargs="+", default=["threaded", "asyncio"])
+    parser.add_argument("--results-dir", default="crawl_results")
+    args = parser.parse_args()
+
+    logging.disable(logging.CRITICAL)
+
+    print(f"{'engine':<10} {'workers':>8} {'pages':>7} {'errors':>7} {'seconds':>9} {'pages/s':>9}")
+    for engine in args.engines:
+        for concurrency in args.concurrency:
+            site = SyntheticSite(pages=args.pages, fanout=args.fanout, latency=args.latency).start()
+            try:
+                result = run_crawl(engine, concurrency, site, args.depth, args.results_dir)
+            finally:
+                site.stop()
+            print(f"{result['engine']:<10} {result['concurrency']:>8} {result['pages']:>7} {result['errors']:>7} "
+                  f"{result['seconds']:>9.2f} {result['pages_per_sec']:>9.1f}")
+
+
+if __name__ == "__main__":
+    main()
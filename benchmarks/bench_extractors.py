@@ -0,0 +1,95 @@
+import argparse
+import glob
+import os
+import random
+import sys
+import time
+from urllib.parse import urljoin
+
+from bs4 import BeautifulSoup
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from crawler.extractor import EXTRACTOR_BACKENDS, create_extractor, LxmlExtractor
+
+
+def baseline_extract(url: str, text: str):
+    # The parsing code handle_page used before the extractor backends
+    soup = BeautifulSoup(text, 'html.parser')
+    links = soup.find_all('a', href=True)
+    title = soup.title.string if soup.title else ''
+    records = [{'text': link.get_text(strip=True), 'href': urljoin(url, link['href'])}
+               for link in links if link.get('href')]
+    next_urls = [urljoin(url, link['href']) for link in links]
+    return title, records, next_urls
+
+
+def generate_page(rng: random.Random, index: int, links: int) -> str:
+    nav = "".join(f'<li class="nav-item"><a class="nav-link" href="/section/{i}/">Section {i}</a></li>'
+                  for i in range(12))
+    body = []
+    for i in range(links):
+        target = rng.randrange(100000)
+        body.append(
+            f'<div class="card"><h3><a href="../article/{target}.html?ref=home&amp;utm_source=feed" '
+            f'title="Article {target}">Article {target} &ndash; headline</a></h3>'
+            f'<p>Lorem ipsum <em>dolor</em> sit amet, <span>consectetur</span> adipiscing elit {i}.</p></div>'
+        )
+    return (
+        f'<!DOCTYPE html><html lang="en"><head><meta charset="utf-8"><title>Page {index} | Example</title>'
+        '<meta name="viewport" content="width=device-width"><link rel="stylesheet" href="/static/site.css">'
+        '<script>window.dataLayer = window.dataLayer || []; function gtag(){dataLayer.push(arguments);}</script>'
+        '<style>.card { margin: 1em; } .nav-link { color: #333; }</style></head>'
+        f'<body><header><nav><ul>{nav}</ul></nav></header><main>{"".join(body)}</main>'
+        '<footer><a href="/about">About</a> <a href="/contact" rel="nofollow">Contact</a></footer></body></html>'
+    )
+
+
+def load_corpus(directory: str):
+    pages = []
+    for path in sorted(glob.glob(os.path.join(directory, "*.htm*"))):
+        with open(path, encoding="utf-8", errors="replace") as f:
+            pages.append(f.read())
+    return pages
+
+
+def run(extract, corpus, repeat: int) -> float:
+    started = time.perf_counter()
+    for _ in range(repeat):
+        for text in corpus:
+            extract("https://www.example.com/blog/index.html", text)
+    return len(corpus) * repeat / (time.perf_counter() - started)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Compare link extractor backends with the BeautifulSoup baseline")
+    parser.add_argument("--corpus", help="Directory of saved .html pages (a generated corpus is used otherwise)")
+    parser.add_argument("--pages", type=int, default=200)
+    parser.add_argument("--links", type=int, default=80)
+    parser.add_argument("--repeat", type=int, default=3)
+    args = parser.parse_args()
+
+    if args.corpus:
+        corpus = load_corpus(args.corpus)
+    else:
+        rng = random.Random(0)
+        corpus = [generate_page(rng, i, args.links) for i in range(args.pages)]
+    size = sum(len(text) for text in corpus)
+    print(f"{len(corpus)} pages, {size / len(corpus) / 1024:.1f} KiB average")
+
+    backends = [("baseline (soup x2 urljoin)", baseline_extract)]
+    for backend in EXTRACTOR_BACKENDS:
+        if backend == "auto" or (backend == "lxml" and not LxmlExtractor.is_available()):
+            continue
+        backends.append((backend, create_extractor(backend).extract))
+
+    baseline_rate = None
+    print(f"{'backend':<28} {'pages/s':>10} {'MiB/s':>8} {'speedup':>8}")
+    for name, extract in backends:
+        rate = run(extract, corpus, args.repeat)
+        baseline_rate = baseline_rate or rate
+        print(f"{name:<28} {rate:>10.1f} {rate * size / len(corpus) / 1048576:>8.2f} {rate / baseline_rate:>7.1f}x")
+
+
+if __name__ == "__main__":
+    main()
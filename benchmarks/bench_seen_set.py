@@ -0,0 +1,76 @@
+import argparse
+import gc
+import os
+import random
+import sys
+import time
+import tracemalloc
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from crawler.seen_set import SEEN_SET_BACKENDS, create_seen_set
+
+
+def make_url(i: int) -> str:
+    return f"https://www.example{i % 5000}.com/section/{i % 97}/article-{i}.html?page={i % 13}"
+
+
+def fill(seen_set, count: int) -> None:
+    for i in range(count):
+        seen_set.add(make_url(i))
+
+
+def measure_memory(backend: str, count: int) -> float:
+    gc.collect()
+    tracemalloc.start()
+    baseline = tracemalloc.get_traced_memory()[0]
+    seen_set = create_seen_set(backend)
+    fill(seen_set, count)
+    used = tracemalloc.get_traced_memory()[0] - baseline
+    tracemalloc.stop()
+    del seen_set
+    gc.collect()
+    return used / count
+
+
+def measure_speed(backend: str, count: int, lookups: int):
+    seen_set = create_seen_set(backend)
+    started = time.perf_counter()
+    fill(seen_set, count)
+    insert_rate = count / (time.perf_counter() - started)
+
+    rng = random.Random(0)
+    present = [make_url(rng.randrange(count)) for _ in range(lookups // 2)]
+    absent = [make_url(count + rng.randrange(count)) for _ in range(lookups // 2)]
+    probes = present + absent
+    rng.shuffle(probes)
+
+    started = time.perf_counter()
+    false_positives = 0
+    for url in probes:
+        if url in seen_set:
+            false_positives += 1
+    lookup_rate = len(probes) / (time.perf_counter() - started)
+    false_positives -= len(present)
+
+    return insert_rate, lookup_rate, false_positives / len(absent)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Memory and speed of the seen-set backends")
+    parser.add_argument("--sizes", type=int, nargs="+", default=[1000000, 10000000])
+    parser.add_argument("--backends", nargs="+", default=list(SEEN_SET_BACKENDS))
+    parser.add_argument("--lookups", type=int, default=200000)
+    args = parser.parse_args()
+
+    print(f"{'backend':<12} {'urls':>10} {'bytes/url':>10} {'inserts/s':>11} {'lookups/s':>11} {'false pos':>10}")
+    for size in args.sizes:
+        for backend in args.backends:
+            bytes_per_url = measure_memory(backend, size)
+            insert_rate, lookup_rate, false_positive_rate = measure_speed(backend, size, args.lookups)
+            print(f"{backend:<12} {size:>10} {bytes_per_url:>10.1f} {insert_rate:>11.0f} "
+                  f"{lookup_rate:>11.0f} {false_positive_rate:>10.5f}")
+
+
+if __name__ == "__main__":
+    main()
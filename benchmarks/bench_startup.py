@@ -0,0 +1,99 @@
+import argparse
+import os
+import statistics
+import subprocess
+import sys
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+# Packages that should only be imported once a feature needs them
+DEFERRED = ("matplotlib", "aiohttp", "pyarrow", "lxml", "pandas", "bs4", "requests", "psutil")
+
+WINDOW_SCRIPT = """
+import tkinter as tk
+import webcrawler
+root = tk.Tk()
+app = webcrawler.EnhancedWebCrawler(root)
+root.update()
+print("ready", flush=True)
+root.destroy()
+"""
+
+
+def import_times(module: str):
+    # (nesting level, name, cumulative microseconds) for the module and everything
+    # it imports, from the interpreter's -X importtime report. Modules are listed
+    # after the modules they import, so the subtree ends at the module's own line.
+    result = subprocess.run([sys.executable, "-X", "importtime", "-c", f"import {module}"],
+                            cwd=ROOT, capture_output=True, text=True)
+    if result.returncode != 0:
+        raise RuntimeError(result.stderr.strip().splitlines()[-1])
+
+    imports = []
+    for line in result.stderr.splitlines():
+        if not line.startswith("import time:") or "|" not in line or "cumulative" in line:
+            continue
+        _, cumulative, name = line[len("import time:"):].split("|")
+        level = (len(name) - len(name.lstrip()) - 1) // 2
+        imports.append((level, name.strip(), int(cumulative)))
+        if level == 0:
+            if name.strip() == module:
+                return imports
+            imports = []
+    raise RuntimeError(f"{module} missing from the import report")
+
+
+def time_to_window() -> float:
+    # From launching the interpreter to the first drawn window
+    started = time.perf_counter()
+    process = subprocess.Popen([sys.executable, "-c", WINDOW_SCRIPT], cwd=ROOT,
+                               stdout=subprocess.PIPE, stderr=subprocess.PIPE, text=True)
+    line = process.stdout.readline()
+    elapsed = time.perf_counter() - started
+    _, errors = process.communicate()
+    if line.strip() != "ready":
+        raise RuntimeError(errors.strip().splitlines()[-1] if errors.strip() else "no window")
+    return elapsed
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Import time breakdown and time to first window of the GUI")
+    parser.add_argument("--module", default="webcrawler")
+    parser.add_argument("--runs", type=int, default=5)
+    parser.add_argument("--top", type=int, default=10, help="Slowest direct imports to list")
+    parser.add_argument("--budget-ms", type=float, default=0,
+                        help="Exit with an error when the median import time is above this; 0 for no check")
+    args = parser.parse_args()
+
+    runs = [import_times(args.module) for _ in range(args.runs)]
+    totals = [run[-1][2] for run in runs]
+    median_run = runs[totals.index(sorted(totals)[len(totals) // 2])]
+
+    print(f"import {args.module}: median {statistics.median(totals) / 1000:.1f} ms over {args.runs} runs "
+          f"(min {min(totals) / 1000:.1f}, max {max(totals) / 1000:.1f})")
+    # Modules the entry point imports directly sit one level below it
+    direct = [(cumulative, name) for level, name, cumulative in median_run if level == 1]
+    print(f"\n{'direct import':<40} {'ms':>8}")
+    for cumulative, name in sorted(direct, reverse=True)[:args.top]:
+        print(f"{name:<40} {cumulative / 1000:>8.1f}")
+
+    loaded = {name.split(".")[0] for _, name, _ in median_run}
+    deferred = [package for package in DEFERRED if package in loaded]
+    print(f"\nDeferred packages imported at startup: {', '.join(deferred) or 'none'}")
+
+    windows = []
+    try:
+        windows = [time_to_window() for _ in range(args.runs)]
+        print(f"Time to first window: median {statistics.median(windows) * 1000:.0f} ms "
+              f"(min {min(windows) * 1000:.0f}, max {max(windows) * 1000:.0f})")
+    except RuntimeError as e:
+        print(f"Time to first window: skipped ({e})")
+
+    if args.budget_ms and statistics.median(totals) / 1000 > args.budget_ms:
+        print(f"Import time is over the budget of {args.budget_ms:.0f} ms", file=sys.stderr)
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,95 @@
+import argparse
+import os
+import random
+import re
+import sys
+import time
+from urllib.parse import urlparse
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from crawler.url_filter import URLFilter
+
+
+class LegacyURLFilter:
+    # The filter as it was before rules were compiled: urlparse on every call,
+    # a list scan for domains and one search per pattern
+    def __init__(self):
+        self.include_patterns = []
+        self.exclude_patterns = []
+        self.allowed_domains = []
+
+    def should_crawl(self, url: str) -> bool:
+        domain = urlparse(url).netloc.lower()
+        if self.allowed_domains and domain not in self.allowed_domains:
+            return False
+        for pattern in self.exclude_patterns:
+            if pattern.search(url):
+                return False
+        if self.include_patterns:
+            return any(pattern.search(url) for pattern in self.include_patterns)
+        return True
+
+
+def make_rules(count: int):
+    domains = [f"www.site{i}.com" for i in range(count)]
+    excludes = [rf"/archive/{i}/" for i in range(count)] + [r"\.(?:pdf|zip|jpg|png)$"]
+    includes = [rf"/section/{i}/" for i in range(count)]
+    return domains, excludes, includes
+
+
+def make_urls(count: int, rules: int, distinct: int, seed: int = 0):
+    rng = random.Random(seed)
+    pool = [
+        f"https://www.site{rng.randrange(max(1, rules * 2))}.com/section/{rng.randrange(max(1, rules * 2))}/"
+        f"article-{rng.randrange(10 ** 6)}.html"
+        for _ in range(distinct)
+    ]
+    return [pool[rng.randrange(distinct)] for _ in range(count)]
+
+
+def build(filter_class, domains, excludes, includes):
+    url_filter = filter_class()
+    if filter_class is URLFilter:
+        url_filter.set_allowed_domains(domains)
+        for pattern in excludes:
+            url_filter.add_exclude_pattern(pattern)
+        for pattern in includes:
+            url_filter.add_include_pattern(pattern)
+    else:
+        url_filter.allowed_domains = list(domains)
+        url_filter.exclude_patterns = [re.compile(p) for p in excludes]
+        url_filter.include_patterns = [re.compile(p) for p in includes]
+    return url_filter
+
+
+def rate(url_filter, urls) -> float:
+    started = time.perf_counter()
+    for url in urls:
+        url_filter.should_crawl(url)
+    return len(urls) / (time.perf_counter() - started)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="URL filter decisions per second against the number of rules")
+    parser.add_argument("--rules", type=int, nargs="+", default=[0, 10, 100, 500])
+    parser.add_argument("--urls", type=int, default=200000)
+    parser.add_argument("--distinct", type=int, default=20000,
+                        help="Distinct URLs among those checked; links repeat across pages")
+    args = parser.parse_args()
+
+    print(f"{'rules':>6} {'legacy/s':>12} {'compiled/s':>12} {'all unique/s':>13}")
+    for count in args.rules:
+        domains, excludes, includes = make_rules(count)
+        urls = make_urls(args.urls, count, args.distinct)
+        unique = make_urls(args.urls, count, args.urls, seed=1)
+
+        legacy = rate(build(LegacyURLFilter, domains, excludes, includes), urls)
+        compiled = rate(build(URLFilter, domains, excludes, includes), urls)
+        # Decision cache of no help: every URL is new
+        uncached = rate(build(URLFilter, domains, excludes, includes), unique)
+        print(f"{count:>6} {legacy:>12.0f} {compiled:>12.0f} {uncached:>13.0f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,243 @@
+import argparse
+import json
+import logging
+import multiprocessing
+import os
+import platform
+import queue
+import statistics
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+from datetime import datetime
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+from synthetic_site import SyntheticSite
+
+# Site settings of each scenario; options given on the command line override them
+SCENARIOS = {
+    "clean": {"latency": 0.01},
+    "realistic": {
+        "latency": 0.02, "tail_latency": 0.5, "tail_rate": 0.01, "error_rate": 0.02, "broken_link_rate": 0.02,
+        "disallow_rate": 0.05, "duplicate_rate": 0.05, "variant_rate": 0.1, "trap_rate": 0.01
+    }
+}
+SITE_OPTIONS = ("pages", "fanout", "page_size", "seed", "latency", "tail_latency", "tail_rate", "error_rate",
+                "broken_link_rate", "disallow_rate", "crawl_delay", "duplicate_rate", "variant_rate", "trap_rate")
+
+
+def crawl(settings: dict, results: "multiprocessing.Queue") -> None:
+    # Runs in a fresh process, so memory and CPU time are the crawl's alone
+    import psutil
+    from crawler.engine import CrawlConfig, CrawlEngine
+
+    logging.disable(logging.CRITICAL)
+    process = psutil.Process()
+    peak = [process.memory_info().rss]
+    sampling = threading.Event()
+
+    def sample_memory():
+        while not sampling.wait(0.05):
+            peak[0] = max(peak[0], process.memory_info().rss)
+
+    threading.Thread(target=sample_memory, daemon=True).start()
+    engine = CrawlEngine(CrawlConfig(**settings))
+    cpu_before = process.cpu_times()
+    started = time.perf_counter()
+    error = engine.run()
+    elapsed = time.perf_counter() - started
+    cpu_after = process.cpu_times()
+    sampling.set()
+    peak[0] = max(peak[0], process.memory_info().rss)
+
+    # Parse processes are counted once they have exited, which run() waits for
+    cpu = sum(after - before for after, before in zip(cpu_after[:4], cpu_before[:4]))
+    stats = engine.stats.get_stats()
+    pages = stats["pages_crawled"]
+    results.put({
+        "error": error,
+        "pages": pages,
+        "errors": stats["errors"],
+        "retries": stats["retries"],
+        "duplicates": stats["duplicates"],
+        "seconds": elapsed,
+        "pages_per_sec": pages / elapsed if elapsed else 0.0,
+        "fetch_p50": stats["fetch_p50"],
+        "fetch_p99": stats["fetch_p99"],
+        "total_p50": stats["total_p50"],
+        "total_p99": stats["total_p99"],
+        "peak_rss_mb": peak[0] / 1048576,
+        "cpu_seconds": cpu,
+        "cpu_ms_per_page": cpu / pages * 1000 if pages else 0.0,
+        "stages": stats["stages"]
+    })
+
+
+def run_once(site: SyntheticSite, settings: dict, timeout: float) -> dict:
+    context = multiprocessing.get_context("spawn")
+    results = context.Queue()
+    child = context.Process(target=crawl, args=(dict(settings, start_url=site.url), results))
+    child.start()
+    deadline = time.monotonic() + timeout
+    try:
+        while True:
+            try:
+                return results.get(timeout=1)
+            except queue.Empty:
+                if not child.is_alive():
+                    raise RuntimeError(f"The crawl process exited with code {child.exitcode}")
+                if time.monotonic() > deadline:
+                    raise RuntimeError(f"The crawl took longer than {timeout:.0f} seconds")
+    finally:
+        child.join(5)
+        if child.is_alive():
+            child.terminate()
+
+
+def git_revision() -> str:
+    try:
+        result = subprocess.run(["git", "describe", "--always", "--dirty"], cwd=ROOT, capture_output=True,
+                                text=True, timeout=30)
+        return result.stdout.strip() or "unknown"
+    except (OSError, subprocess.SubprocessError):
+        return "unknown"
+
+
+def summarize(runs: list) -> list:
+    # Medians over the repeated runs of each engine and worker count
+    groups = {}
+    for run in runs:
+        groups.setdefault((run["engine"], run["workers"]), []).append(run)
+    summary = []
+    for (engine, workers), group in groups.items():
+        row = {"engine": engine, "workers": workers, "runs": len(group)}
+        for name in ("pages", "pages_per_sec", "fetch_p99", "total_p99", "peak_rss_mb", "cpu_ms_per_page"):
+            row[name] = statistics.median(run[name] for run in group)
+        summary.append(row)
+    return summary
+
+
+def print_summary(summary: list, baseline: dict = None) -> None:
+    previous = {(row["engine"], row["workers"]): row for row in (baseline or {}).get("summary", [])}
+    print(f"{'engine':<10} {'workers':>8} {'pages':>7} {'pages/s':>9} {'fetch p99':>10} {'total p99':>10} "
+          f"{'peak MB':>8} {'CPU ms/pg':>10}" + ("  vs baseline" if previous else ""))
+    for row in summary:
+        line = (f"{row['engine']:<10} {row['workers']:>8} {row['pages']:>7.0f} {row['pages_per_sec']:>9.1f} "
+                f"{row['fetch_p99'] * 1000:>8.1f}ms {row['total_p99'] * 1000:>8.1f}ms {row['peak_rss_mb']:>8.1f} "
+                f"{row['cpu_ms_per_page']:>10.2f}")
+        old = previous.get((row["engine"], row["workers"]))
+        if old:
+            changes = []
+            for name, label in (("pages_per_sec", "pages/s"), ("total_p99", "p99"), ("cpu_ms_per_page", "CPU")):
+                if old[name]:
+                    changes.append(f"{label} {(row[name] / old[name] - 1) * 100:+.0f}%")
+            line += "  " + ", ".join(changes)
+        print(line)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Crawl a generated local site with the headless engine and "
+                                                 "write throughput, latency, memory and CPU figures to JSON")
+    parser.add_argument("--scenario", choices=sorted(SCENARIOS), default="realistic")
+    site = parser.add_argument_group("site (overrides the scenario)")
+    site.add_argument("--pages", type=int, default=2000)
+    site.add_argument("--fanout", type=int, default=10)
+    site.add_argument("--page-size", type=int, default=8192)
+    site.add_argument("--seed", type=int, default=0)
+    site.add_argument("--latency", type=float, help="Seconds per response")
+    site.add_argument("--tail-latency", type=float, help="Seconds per response of the slow pages")
+    site.add_argument("--tail-rate", type=float, help="Share of slow pages")
+    site.add_argument("--error-rate", type=float, help="Share of pages whose first request gets a 503")
+    site.add_argument("--broken-link-rate", type=float, help="Share of links to missing pages")
+    site.add_argument("--disallow-rate", type=float, help="Share of pages disallowed by robots.txt")
+    site.add_argument("--crawl-delay", type=float, help="Crawl-delay in robots.txt")
+    site.add_argument("--duplicate-rate", type=float, help="Share of pages duplicating another page")
+    site.add_argument("--variant-rate", type=float, help="Share of links with tracking or session parameters")
+    site.add_argument("--trap-rate", type=float, help="Share of pages linking into an endless calendar")
+
+    crawl_group = parser.add_argument_group("crawl")
+    crawl_group.add_argument("--engines", nargs="+", default=["threaded", "asyncio"])
+    crawl_group.add_argument("--workers", type=int, nargs="+", default=[8, 32])
+    crawl_group.add_argument("--depth", type=int, default=10)
+    crawl_group.add_argument("--parse-workers", type=int, default=0)
+    crawl_group.add_argument("--adaptive", action="store_true", help="Use adaptive host limits")
+    crawl_group.add_argument("--trace", action="store_true", help="Also record the time by stage")
+    crawl_group.add_argument("--runs", type=int, default=3, help="Runs of each engine and worker count")
+    crawl_group.add_argument("--timeout", type=float, default=600, help="Seconds before a run is abandoned")
+
+    parser.add_argument("--output", help="JSON file; by default benchmark_results/<time>_<revision>.json")
+    parser.add_argument("--compare", metavar="BASELINE", help="Earlier results file to compare with")
+    args = parser.parse_args()
+
+    settings = dict(SCENARIOS[args.scenario])
+    for name in SITE_OPTIONS:
+        value = getattr(args, name)
+        if value is not None:
+            settings[name] = value
+    baseline = None
+    if args.compare:
+        with open(args.compare, encoding="utf-8") as f:
+            baseline = json.load(f)
+
+    revision = git_revision()
+    runs = []
+    with tempfile.TemporaryDirectory() as results_dir:
+        for engine in args.engines:
+            for workers in args.workers:
+                for run in range(args.runs):
+                    # A fresh site per run, so no state carries over between runs
+                    site = SyntheticSite(**settings).start()
+                    try:
+                        result = run_once(site, {
+                            "engine": engine,
+                            "workers": workers,
+                            "max_depth": args.depth,
+                            "delay": 0,
+                            "host_concurrency": workers,
+                            "adaptive": args.adaptive,
+                            "parse_workers": args.parse_workers,
+                            "trace_stages": args.trace,
+                            "robots_cache": "",
+                            "http_cache": "",
+                            "results_prefix": os.path.join(results_dir, f"{engine}_{workers}_{run}")
+                        }, args.timeout)
+                        served = site.served()
+                    finally:
+                        site.stop()
+                    if not args.trace:
+                        del result["stages"]
+                    runs.append(dict(engine=engine, workers=workers, run=run, served=served, **result))
+                    print(f"{engine} x{workers} run {run + 1}/{args.runs}: {result['pages']} pages, "
+                          f"{result['pages_per_sec']:.1f} pages/s", file=sys.stderr)
+
+    report = {
+        "created": datetime.now().isoformat(timespec="seconds"),
+        "revision": revision,
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "cpu_count": os.cpu_count(),
+        "scenario": args.scenario,
+        "site": SyntheticSite(**settings).settings(),
+        "crawl": {"depth": args.depth, "parse_workers": args.parse_workers, "adaptive": args.adaptive},
+        "runs": runs,
+        "summary": summarize(runs)
+    }
+    output = args.output or os.path.join(
+        "benchmark_results", f"{datetime.now().strftime('%Y%m%d_%H%M%S')}_{revision}.json"
+    )
+    os.makedirs(os.path.dirname(output) or ".", exist_ok=True)
+    with open(output, "w", encoding="utf-8") as f:
+        json.dump(report, f, indent=2)
+
+    if baseline and (baseline.get("site"), baseline.get("crawl")) != (report["site"], report["crawl"]):
+        print("Warning: the baseline was run with different site or crawl settings\n", file=sys.stderr)
+    print_summary(report["summary"], baseline)
+    print(f"\nResults written to {output}")
+
+
+if __name__ == "__main__":
+    main()
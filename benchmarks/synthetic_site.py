@@ -0,0 +1,231 @@
+import random
+import threading
+import time
+from collections import Counter
+from http.server import ThreadingHTTPServer, BaseHTTPRequestHandler
+from typing import Any, Dict, List, Optional
+
+
+class _Server(ThreadingHTTPServer):
+    daemon_threads = True
+    request_queue_size = 1024
+
+    def handle_error(self, request, client_address):
+        # Clients dropping keep-alive connections are expected during benchmarks
+        pass
+
+
+# A generated site on a local port. Pages 0..pages-1 each link to `fanout`
+# others picked by a seeded random generator, so the same settings always
+# give the same link graph. Every other feature is decided per page from the
+# seed as well, so runs are comparable however the requests are ordered:
+#   tail_rate      pages answered after tail_latency instead of latency
+#   error_rate     pages whose first request gets a 503 (retried by the crawler)
+#   broken_link_rate  links to pages that do not exist (404)
+#   disallow_rate  pages under /private/, which robots.txt disallows
+#   duplicate_rate pages with the same content as another page
+#   variant_rate   links with a utm_source (stripped by the canonicalizer) or
+#                  a session ID (not stripped, so a duplicate URL)
+#   trap_rate      pages linking into /calendar/, an endless chain of pages
+class SyntheticSite:
+    def __init__(self, pages: int = 1000, fanout: int = 10, latency: float = 0.0,
+                 page_size: int = 2048, seed: int = 0, tail_latency: float = 0.0, tail_rate: float = 0.0,
+                 error_rate: float = 0.0, broken_link_rate: float = 0.0, disallow_rate: float = 0.0,
+                 crawl_delay: Optional[float] = None, duplicate_rate: float = 0.0, variant_rate: float = 0.0,
+                 trap_rate: float = 0.0):
+        self.pages = pages
+        self.fanout = fanout
+        self.latency = latency
+        self.page_size = page_size
+        self.seed = seed
+        self.tail_latency = tail_latency
+        self.tail_rate = tail_rate
+        self.error_rate = error_rate
+        self.broken_link_rate = broken_link_rate
+        self.disallow_rate = disallow_rate
+        self.crawl_delay = crawl_delay
+        self.duplicate_rate = duplicate_rate
+        self.variant_rate = variant_rate
+        self.trap_rate = trap_rate
+        self.server = None
+        self.requests_served = 0
+        self.not_modified_served = 0
+        # Responses by status, and requests for disallowed pages (a polite crawler makes none)
+        self.statuses: Counter = Counter()
+        self.disallowed_served = 0
+        self.failed_once = set()
+        self.rolls: Dict[tuple, float] = {}
+        self.lock = threading.Lock()
+
+    @property
+    def url(self) -> str:
+        host, port = self.server.server_address[:2]
+        return f"http://{host}:{port}/page/0"
+
+    def settings(self) -> Dict[str, Any]:
+        return {name: getattr(self, name) for name in (
+            "pages", "fanout", "latency", "page_size", "seed", "tail_latency", "tail_rate", "error_rate",
+            "broken_link_rate", "disallow_rate", "crawl_delay", "duplicate_rate", "variant_rate", "trap_rate"
+        )}
+
+    def served(self) -> Dict[str, Any]:
+        with self.lock:
+            return {
+                "requests": self.requests_served,
+                "not_modified": self.not_modified_served,
+                "disallowed": self.disallowed_served,
+                "statuses": {str(status): count for status, count in sorted(self.statuses.items())}
+            }
+
+    def _roll(self, page: int, feature: str) -> float:
+        # A fixed number in [0, 1) per page and feature; seeding from a string is slow, so they are kept
+        key = (page, feature)
+        roll = self.rolls.get(key)
+        if roll is None:
+            roll = self.rolls[key] = random.Random(f"{self.seed}:{feature}:{page}").random()
+        return roll
+
+    def is_disallowed(self, page: int) -> bool:
+        return page != 0 and self._roll(page, "disallow") < self.disallow_rate
+
+    def duplicate_of(self, page: int) -> Optional[int]:
+        if page == 0 or self._roll(page, "duplicate") >= self.duplicate_rate:
+            return None
+        original = random.Random(f"{self.seed}:original:{page}").randrange(self.pages)
+        return original if original != page else None
+
+    def page_path(self, page: int) -> str:
+        return f"/private/page/{page}" if self.is_disallowed(page) else f"/page/{page}"
+
+    def links_for(self, page: int) -> List[int]:
+        rng = random.Random(self.seed * 1000003 + page)
+        return [rng.randrange(self.pages) for _ in range(self.fanout)]
+
+    def hrefs_for(self, page: int) -> List[str]:
+        rng = random.Random(f"{self.seed}:links:{page}")
+        hrefs = []
+        for target in self.links_for(page):
+            if rng.random() < self.broken_link_rate:
+                hrefs.append(f"/page/{self.pages + target}")
+                continue
+            href = self.page_path(target)
+            if rng.random() < self.variant_rate:
+                href += "?utm_source=feed" if rng.random() < 0.5 else f"?sid={rng.randrange(1 << 32):x}"
+            hrefs.append(href)
+        if self._roll(page, "trap") < self.trap_rate:
+            hrefs.append(f"/calendar/{page}")
+        return hrefs
+
+    def render(self, page: int) -> bytes:
+        original = self.duplicate_of(page)
+        if original is not None:
+            page = original
+        links = "".join(f'<li><a href="{href}">Page {href}</a></li>' for href in self.hrefs_for(page))
+        body = f"<html><head><title>Page {page}</title></head><body><h1>Page {page}</h1><ul>{links}</ul>"
+        padding = max(0, self.page_size - len(body) - 20)
+        return (body + f"<p>{'x' * padding}</p></body></html>").encode('utf-8')
+
+    def render_calendar(self, day: int) -> bytes:
+        return (f"<html><head><title>Day {day}</title></head><body><h1>Day {day}</h1>"
+                f'<a href="/calendar/{day + 1}">Next day</a> <a href="/page/0">Home</a></body></html>').encode('utf-8')
+
+    def robots_txt(self) -> bytes:
+        lines = ["User-agent: *"]
+        lines.append("Disallow: /private/" if self.disallow_rate else "Allow: /")
+        if self.crawl_delay is not None:
+            lines.append(f"Crawl-delay: {self.crawl_delay}")
+        return ("\n".join(lines) + "\n").encode('utf-8')
+
+    def page_latency(self, page: int) -> float:
+        if self.tail_rate and self._roll(page, "tail") < self.tail_rate:
+            return self.tail_latency
+        return self.latency
+
+    def fails_first_request(self, page: int) -> bool:
+        if not self.error_rate or self._roll(page, "error") >= self.error_rate:
+            return False
+        with self.lock:
+            if page in self.failed_once:
+                return False
+            self.failed_once.add(page)
+            return True
+
+    def start(self) -> "SyntheticSite":
+        site = self
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = "HTTP/1.1"
+            disable_nagle_algorithm = True
+
+            def log_message(self, format, *args):
+                pass
+
+            def do_GET(self):
+                with site.lock:
+                    site.requests_served += 1
+                path = self.path.split("?", 1)[0]
+
+                if path == "/robots.txt":
+                    if site.latency:
+                        time.sleep(site.latency)
+                    self._send(200, site.robots_txt(), "text/plain")
+                    return
+
+                if path.startswith("/calendar/"):
+                    if site.latency:
+                        time.sleep(site.latency)
+                    try:
+                        self._send(200, site.render_calendar(int(path.rsplit("/", 1)[-1])), "text/html; charset=utf-8")
+                    except ValueError:
+                        self._send(404, b"Not found", "text/plain")
+                    return
+
+                try:
+                    page = int(path.rsplit("/", 1)[-1])
+                except ValueError:
+                    page = -1
+                latency = site.page_latency(page) if 0 <= page < site.pages else site.latency
+                if latency:
+                    time.sleep(latency)
+                if not 0 <= page < site.pages or path != site.page_path(page):
+                    self._send(404, b"Not found", "text/plain")
+                    return
+                if site.is_disallowed(page):
+                    with site.lock:
+                        site.disallowed_served += 1
+                if site.fails_first_request(page):
+                    self._send(503, b"Try again", "text/plain")
+                    return
+
+                # Pages never change, so a matching ETag always gets a 304
+                etag = f'"{site.seed}-{page}"'
+                if self.headers.get("If-None-Match") == etag:
+                    with site.lock:
+                        site.not_modified_served += 1
+                        site.statuses[304] += 1
+                    self.send_response(304)
+                    self.send_header("ETag", etag)
+                    self.end_headers()
+                    return
+                self._send(200, site.render(page), "text/html; charset=utf-8", {"ETag": etag})
+
+            def _send(self, status: int, body: bytes, content_type: str, headers=None):
+                with site.lock:
+                    site.statuses[status] += 1
+                self.send_response(status)
+                for name, value in (headers or {}).items():
+                    self.send_header(name, value)
+                self.send_header("Content-Type", content_type)
+                self.send_header("Content-Length", str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+        self.server = _Server(("127.0.0.1", 0), Handler)
+        threading.Thread(target=self.server.serve_forever, daemon=True).start()
+        return self
+
+    def stop(self) -> None:
+        if self.server:
+            self.server.shutdown()
+            self.server.server_close()
+            self.server = None
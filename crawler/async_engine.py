@@ -0,0 +1,239 @@
+import asyncio
+import logging
+import os
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import Optional
+
+from crawler.host_control import THROTTLE_STATUSES
+from crawler.http_cache import content_hash
+from crawler.http_session import PROXY_FAILURE_STATUSES
+
+# Imported on first use, as it adds noticeably to startup
+aiohttp = None
+
+
+def _import_aiohttp() -> bool:
+    global aiohttp
+    if aiohttp is None:
+        try:
+            import aiohttp as module
+        except ImportError:
+            return False
+        aiohttp = module
+    return True
+
+
+# Fetches pages with non-blocking HTTP on an event loop running in a background
+# thread. The engine shares the crawl queue, robots parser, URL filter and stats
+# of the crawler that owns it, so only the fetch path differs from the threaded
+# workers. Parsing, the HTTP cache and following links run in a small thread
+# pool (or the parse processes), so the loop keeps serving other connections.
+class AsyncCrawlEngine:
+    def __init__(self, crawler, concurrency: int = 1000, timeout: float = 10):
+        self.crawler = crawler
+        self.concurrency = concurrency
+        self.timeout = timeout
+        self.loop: Optional[asyncio.AbstractEventLoop] = None
+        self.thread: Optional[threading.Thread] = None
+        self.page_pool: Optional[ThreadPoolExecutor] = None
+        self.logger = logging.getLogger(__name__)
+
+    @staticmethod
+    def is_available() -> bool:
+        return _import_aiohttp()
+
+    def start(self, start_url: Optional[str]) -> None:
+        if not self.is_available():
+            raise RuntimeError("The asyncio engine requires the 'aiohttp' package")
+
+        self.thread = threading.Thread(target=self._run, args=(start_url,), daemon=True)
+        self.thread.start()
+
+    def _run(self, start_url: Optional[str]) -> None:
+        self.loop = asyncio.new_event_loop()
+        asyncio.set_event_loop(self.loop)
+        # Separate from the loop's default executor, where slow robots.txt fetches could hold up parsing
+        self.page_pool = ThreadPoolExecutor(max_workers=min(32, (os.cpu_count() or 1) + 4),
+                                            thread_name_prefix="async-pages")
+        try:
+            if start_url:
+                self.crawler.enqueue_url(start_url, 0)
+            self.loop.run_until_complete(self._crawl())
+            self.page_pool.shutdown(wait=True)
+            self.crawler.crawl_completed()
+        except Exception as e:
+            self.logger.error(f"Async engine error: {str(e)}")
+            self.page_pool.shutdown(wait=True)
+            self.crawler.crawl_completed(error=str(e))
+        finally:
+            self.loop.close()
+
+    def _in_pool(self, function, *args):
+        return self.loop.run_in_executor(self.page_pool, function, *args)
+
+    async def _crawl(self) -> None:
+        connector = aiohttp.TCPConnector(limit=self.concurrency)
+        timeout = aiohttp.ClientTimeout(total=self.timeout)
+        headers = {"User-Agent": self.crawler.config.user_agent}
+
+        # Feed the same request/connection counters as the pooled requests session
+        stats = self.crawler.stats
+
+        async def on_request_start(session, context, params):
+            stats.increment_http_requests()
+
+        async def on_connection_create_end(session, context, params):
+            stats.increment_connections_opened()
+
+        trace_config = aiohttp.TraceConfig()
+        trace_config.on_request_start.append(on_request_start)
+        trace_config.on_connection_create_end.append(on_connection_create_end)
+
+        async with aiohttp.ClientSession(connector=connector, timeout=timeout, headers=headers,
+                                         trace_configs=[trace_config]) as session:
+            await self._dispatch(session)
+
+    async def _dispatch(self, session) -> None:
+        crawler = self.crawler
+        semaphore = asyncio.Semaphore(self.concurrency)
+        task_finished = asyncio.Event()
+        tasks = set()
+
+        def on_task_done(task):
+            tasks.discard(task)
+            task_finished.set()
+
+        while not crawler.stop_requested:
+            if crawler.pause_requested:
+                await asyncio.sleep(0.2)
+                continue
+
+            item = crawler.frontier.get(timeout=0)
+            if item is None:
+                if crawler.is_drained():
+                    break
+                # Work becomes ready when a task finishes or a host's delay expires
+                task_finished.clear()
+                try:
+                    await asyncio.wait_for(task_finished.wait(), timeout=0.05)
+                except asyncio.TimeoutError:
+                    pass
+                continue
+
+            url, depth = item
+            await semaphore.acquire()
+            task = asyncio.create_task(self._process(session, semaphore, url, depth))
+            tasks.add(task)
+            task.add_done_callback(on_task_done)
+
+        if crawler.stop_requested:
+            for task in tasks:
+                task.cancel()
+        if tasks:
+            await asyncio.gather(*tasks, return_exceptions=True)
+
+    async def _process(self, session, semaphore: asyncio.Semaphore, url: str, depth: int) -> None:
+        crawler = self.crawler
+        cancelled = False
+        following = None
+        started = time.perf_counter()
+        try:
+            if not crawler.should_process(url, depth):
+                return
+
+            tracer = crawler.tracer
+            # robots.txt is normally prefetched; otherwise it is loaded with blocking I/O off the loop
+            with tracer.span("robots"):
+                allowed = crawler.robots_parser.cached_decision(url)
+                if allowed is None:
+                    allowed = await self.loop.run_in_executor(None, self._check_robots, url)
+            if not allowed:
+                if not crawler.robots_unavailable(url, depth):
+                    self.logger.info(f"Skipping {url} - not allowed by robots.txt")
+                return
+
+            cached = await self._in_pool(crawler.cached_page, url) if crawler.http_cache else None
+            proxy = crawler.proxy_manager.get_proxy()
+            fetch_started = time.monotonic()
+            try:
+                async with session.get(url, headers=cached.conditional_headers() if cached else None,
+                                       proxy=proxy.url if proxy else None) as response:
+                    latency = time.monotonic() - fetch_started
+                    if proxy and response.status in PROXY_FAILURE_STATUSES:
+                        crawler.proxy_manager.record_failure(proxy)
+                    elif proxy:
+                        crawler.proxy_manager.record_success(proxy, latency)
+                    crawler.host_control.record_response(url, response.status, latency,
+                                                         response.headers.get("Retry-After"))
+                    if response.status in THROTTLE_STATUSES:
+                        crawler.throttled(url, depth, response.status, response.headers.get("Retry-After"))
+                        return
+                    response.raise_for_status()
+                    status = response.status
+                    headers = response.headers
+                    download_started = time.monotonic()
+                    content = await response.read()
+                    encoding = response.charset
+                fetch_done = time.monotonic()
+                crawler.stats.record_fetch(url, fetch_done - fetch_started)
+                tracer.add("request", latency)
+                tracer.add("download", fetch_done - download_started)
+            except (aiohttp.ClientError, asyncio.TimeoutError) as e:
+                # An HTTP error status came through the proxy, so only other errors count against it
+                if proxy and (isinstance(e, aiohttp.ClientHttpProxyError) or not isinstance(e, aiohttp.ClientResponseError)):
+                    crawler.proxy_manager.record_failure(proxy)
+                if isinstance(e, asyncio.TimeoutError):
+                    crawler.host_control.record_timeout(url, time.monotonic() - fetch_started)
+                crawler.request_failed(url, depth, e)
+                return
+
+            if status == 304 and cached:
+                page = crawler.not_modified(url, cached)
+            else:
+                digest = content_hash(content) if crawler.http_cache else None
+                page = crawler.unchanged_page(cached, digest)
+                parse_started = time.perf_counter()
+                if page is None and crawler.parse_pool:
+                    with tracer.span("parse"):
+                        page = await asyncio.wrap_future(crawler.parse_pool.submit(url, content, encoding))
+                    crawler.stats.record_parse(time.perf_counter() - parse_started)
+                elif page is None:
+                    # extract_page traces decoding and parsing in the pool thread
+                    page = await self._in_pool(crawler.extract_page, url, content, encoding)
+                    crawler.stats.record_parse(time.perf_counter() - parse_started)
+                if crawler.http_cache:
+                    await self._in_pool(crawler.store_page, url, headers, content, digest, page, cached)
+
+            # Runs to the end even if the crawl is stopped, as the page is recorded by then
+            following = self._in_pool(self._follow_links, url, depth, content, page)
+            await asyncio.shield(following)
+
+            crawler.stats.update_queue_size(crawler.frontier.qsize())
+            crawler.stats.record_total(time.perf_counter() - started)
+
+        except asyncio.CancelledError:
+            # Leave the URL in flight so a checkpoint keeps it for a resumed crawl, unless its page is being recorded
+            cancelled = following is None
+            raise
+        except Exception as e:
+            self.logger.error(f"Error processing {url}: {str(e)}")
+            crawler.stats.increment_errors(url)
+        finally:
+            semaphore.release()
+            if not cancelled:
+                crawler.task_done(url)
+
+    def _check_robots(self, url: str) -> bool:
+        robots_parser = self.crawler.robots_parser
+        allowed = robots_parser.can_fetch(url)
+        if allowed:
+            self.crawler.frontier.set_crawl_delay(url, robots_parser.get_crawl_delay(url))
+        return allowed
+
+    def _follow_links(self, url: str, depth: int, content: bytes, page) -> None:
+        # Records the page and canonicalizes, filters and queues its links
+        crawler = self.crawler
+        for next_url in crawler.handle_page(url, depth, content, page):
+            crawler.enqueue_url(next_url, depth + 1)
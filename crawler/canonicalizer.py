@@ -0,0 +1,109 @@
+import logging
+import re
+from typing import Iterable, List, Optional
+from urllib.parse import urlsplit, urlunsplit, unquote_plus
+
+DEFAULT_STRIP_PARAMS = (
+    "utm_*", "gclid", "dclid", "fbclid", "msclkid", "yclid",
+    "mc_cid", "mc_eid", "_ga", "_gl", "igshid"
+)
+DEFAULT_PORTS = {"http": 80, "https": 443}
+
+_PERCENT_ESCAPE = re.compile(r"%[0-9a-fA-F]{2}")
+
+
+def _upper_escape(match) -> str:
+    return match.group(0).upper()
+
+
+def _remove_dot_segments(path: str) -> str:
+    segments = path.split("/")
+    output: List[str] = []
+    for segment in segments:
+        if segment == ".":
+            continue
+        if segment == "..":
+            if len(output) > 1:
+                output.pop()
+            continue
+        output.append(segment)
+    if segments[-1] in (".", ".."):
+        output.append("")
+    return "/".join(output)
+
+
+class URLCanonicalizer:
+    def __init__(self, strip_params: Iterable[str] = DEFAULT_STRIP_PARAMS, sort_query: bool = True):
+        self.strip_names = set()
+        self.strip_prefixes = ()
+        self.sort_query = sort_query
+        self.logger = logging.getLogger(__name__)
+        self.set_strip_params(strip_params)
+
+    def set_strip_params(self, params: Iterable[str]) -> None:
+        # A trailing '*' strips every parameter that starts with the given prefix
+        names = set()
+        prefixes = []
+        for param in params:
+            param = param.strip().lower()
+            if not param:
+                continue
+            if param.endswith("*"):
+                prefixes.append(param[:-1])
+            else:
+                names.add(param)
+        self.strip_names = names
+        self.strip_prefixes = tuple(prefixes)
+
+    def canonicalize(self, url: str) -> Optional[str]:
+        try:
+            parts = urlsplit(url.strip())
+            scheme = parts.scheme.lower()
+            if scheme not in DEFAULT_PORTS:
+                return None
+
+            host = (parts.hostname or "").rstrip(".")
+            if not host:
+                return None
+            if ":" in host:
+                host = f"[{host}]"
+
+            port = parts.port
+            netloc = host
+            if port is not None and port != DEFAULT_PORTS[scheme]:
+                netloc = f"{host}:{port}"
+            if parts.username is not None:
+                userinfo = parts.username
+                if parts.password is not None:
+                    userinfo += f":{parts.password}"
+                netloc = f"{userinfo}@{netloc}"
+
+            path = parts.path or "/"
+            if "." in path:
+                path = _remove_dot_segments(path)
+            if "%" in path:
+                path = _PERCENT_ESCAPE.sub(_upper_escape, path)
+
+            query = self._canonical_query(parts.query) if parts.query else ""
+
+            return urlunsplit((scheme, netloc, path, query, ""))
+
+        except ValueError as e:
+            self.logger.debug(f"Cannot canonicalize URL {url}: {str(e)}")
+            return None
+
+    def _canonical_query(self, query: str) -> str:
+        params = []
+        for pair in query.split("&"):
+            if not pair:
+                continue
+            name = unquote_plus(pair.split("=", 1)[0]).lower()
+            if name in self.strip_names or (self.strip_prefixes and name.startswith(self.strip_prefixes)):
+                continue
+            if "%" in pair:
+                pair = _PERCENT_ESCAPE.sub(_upper_escape, pair)
+            params.append(pair)
+
+        if self.sort_query:
+            params.sort()
+        return "&".join(params)
@@ -0,0 +1,93 @@
+import glob
+import json
+import logging
+import os
+import pickle
+from typing import Any, Dict, Optional, Tuple
+
+from crawler.frontier_store import SQLiteFrontierStore
+from crawler.sinks import ResultSink
+
+
+class CrawlCheckpoint:
+    def __init__(self, state_dir: str):
+        self.state_dir = state_dir
+        os.makedirs(state_dir, exist_ok=True)
+        self.store = SQLiteFrontierStore(os.path.join(state_dir, "frontier.sqlite"))
+        self.generation = int(self.store.get_meta("generation") or 0)
+        self.logger = logging.getLogger(__name__)
+
+    def exists(self) -> bool:
+        return self.store.get_meta("state") is not None
+
+    def path(self, name: str) -> str:
+        return os.path.join(self.state_dir, name)
+
+    def save(self, frontier, seen_urls, seen_lock, state: Dict[str, Any], sink: ResultSink, duplicates=None,
+             retries=None) -> None:
+        # enqueue_url updates the seen set and the frontier under seen_lock, and
+        # a page record is written before its URL leaves the frontier, so holding
+        # both locks captures seen set, frontier and results at one point. Only
+        # cheap copies are taken under them; the copies are written after the
+        # locks are released, and what was added meanwhile is saved with the state.
+        generation = self.generation + 1
+        seen_file = f"seen.{generation}.pickle"
+        with seen_lock, frontier.condition:
+            seen_copy = seen_urls.snapshot()
+            seen_urls.start_journal()
+            duplicates_copy = None
+            if duplicates is not None:
+                with duplicates.lock:
+                    duplicates_copy = duplicates.snapshot()
+
+        try:
+            with open(self.path(seen_file), "wb") as f:
+                pickle.dump((seen_copy, duplicates_copy), f, protocol=pickle.HIGHEST_PROTOCOL)
+        except Exception:
+            with seen_lock:
+                seen_urls.stop_journal()
+            if duplicates is not None:
+                duplicates.stop_journal()
+            raise
+        del seen_copy, duplicates_copy
+
+        with seen_lock, frontier.condition:
+            seen_added = seen_urls.stop_journal()
+            duplicates_added = duplicates.stop_journal() if duplicates is not None else []
+            state = dict(state, seen_file=seen_file, seen_added=seen_added, duplicates_added=duplicates_added,
+                         sink_offsets=sink.checkpoint())
+            # The frontier commit, which also stores this state, is the atomic point of the checkpoint
+            # URLs waiting for a retry are queued again straight away on resume
+            frontier.checkpoint({"state": json.dumps(state), "generation": str(generation)},
+                                retries.items() if retries is not None else None)
+
+        self.generation = generation
+        self._remove_seen_files(keep=seen_file)
+        self.logger.info(f"Checkpoint {generation} saved to {self.state_dir}")
+
+    def load_state(self) -> Optional[Dict[str, Any]]:
+        value = self.store.get_meta("state")
+        return json.loads(value) if value else None
+
+    def load_seen_set(self, state: Dict[str, Any]) -> Tuple[Any, Any]:
+        # Returns the seen set and the duplicate detector (None if dedup was off)
+        with open(self.path(state["seen_file"]), "rb") as f:
+            seen_urls, duplicates = pickle.load(f)
+        for url in state.get("seen_added", ()):
+            seen_urls.add(url)
+        if duplicates is not None:
+            duplicates.replay(state.get("duplicates_added", ()))
+        return seen_urls, duplicates
+
+    def reset(self) -> None:
+        self.store.clear()
+        self.generation = 0
+        self._remove_seen_files()
+
+    def close(self) -> None:
+        self.store.close()
+
+    def _remove_seen_files(self, keep: Optional[str] = None) -> None:
+        for path in glob.glob(os.path.join(self.state_dir, "seen.*.pickle")):
+            if os.path.basename(path) != keep:
+                os.remove(path)
@@ -0,0 +1,158 @@
+import argparse
+import logging
+import signal
+import sys
+from typing import List, Optional
+
+from crawler.engine import ENGINES, EXPORT_FORMATS, CrawlConfig, CrawlEngine
+from crawler.extractor import EXTRACTOR_BACKENDS
+from crawler.seen_set import SEEN_SET_BACKENDS
+from crawler.tracing import PROFILE_MODES
+
+# URLs profiled after SIGUSR1 without --profile
+DEFAULT_PROFILE_PAGES = 200
+
+
+def _list(value: str) -> List[str]:
+    return [item.strip() for item in value.split(",") if item.strip()]
+
+
+def build_parser() -> argparse.ArgumentParser:
+    defaults = CrawlConfig
+    parser = argparse.ArgumentParser(prog="python -m crawler.cli", description="Crawl a site without the GUI")
+    parser.add_argument("start_url", nargs="?", default="", help="Not needed with --resume")
+
+    crawl = parser.add_argument_group("crawler settings")
+    crawl.add_argument("--depth", dest="max_depth", type=int, default=defaults.max_depth)
+    crawl.add_argument("--workers", type=int, default=defaults.workers)
+    crawl.add_argument("--delay", type=float, default=defaults.delay, help="Seconds between the starts of requests to the same host")
+    crawl.add_argument("--user-agent", default=defaults.user_agent)
+    crawl.add_argument("--engine", choices=ENGINES, default=defaults.engine)
+    crawl.add_argument("--pool-size", type=int, default=defaults.pool_size, help="Connections per host")
+    crawl.add_argument("--no-keep-alive", dest="keep_alive", action="store_false")
+    crawl.add_argument("--host-concurrency", type=int, default=defaults.host_concurrency,
+                       help="Requests in parallel per host, still spaced by --delay; the most a host can reach "
+                            "with adaptive limits")
+    crawl.add_argument("--fixed-limits", dest="adaptive", action="store_false", help="Turn off adaptive host limits")
+    crawl.add_argument("--global-limit", type=int, default=defaults.global_limit,
+                       help="Requests in flight across all hosts; 0 for no limit")
+    crawl.add_argument("--max-retries", type=int, default=defaults.max_retries)
+    crawl.add_argument("--seen-backend", choices=SEEN_SET_BACKENDS, default=defaults.seen_backend)
+    crawl.add_argument("--bloom-error", type=float, default=defaults.bloom_error)
+    crawl.add_argument("--parser", dest="extractor", choices=EXTRACTOR_BACKENDS, default=defaults.extractor)
+    crawl.add_argument("--parse-workers", type=int, default=defaults.parse_workers)
+    crawl.add_argument("--no-dedup", dest="dedup", action="store_false", help="Follow links of near-duplicate pages")
+    crawl.add_argument("--dedup-distance", type=int, default=defaults.dedup_distance)
+
+    filters = parser.add_argument_group("URL filters")
+    filters.add_argument("--include", dest="include_patterns", action="append", default=[], metavar="REGEX")
+    filters.add_argument("--exclude", dest="exclude_patterns", action="append", default=[], metavar="REGEX")
+    filters.add_argument("--allowed-domains", type=_list, default=[], help="e.g. example.com,*.example.org")
+    filters.add_argument("--strip-params", type=_list, default=list(defaults.strip_params))
+    filters.add_argument("--no-sort-query", dest="sort_query", action="store_false")
+
+    proxies = parser.add_argument_group("proxies")
+    proxies.add_argument("--proxies", type=_list, default=[], help="e.g. 10.0.0.1:3128,socks5://10.0.0.2:1080")
+    proxies.add_argument("--proxy-check-url")
+    proxies.add_argument("--proxy-cooldown", type=float, default=defaults.proxy_cooldown)
+
+    output = parser.add_argument_group("persistence and output")
+    output.add_argument("--state-dir", help="Checkpoint the crawl here so it can be resumed")
+    output.add_argument("--resume", action="store_true", help="Continue the crawl saved in --state-dir")
+    output.add_argument("--hot-window", type=int, default=defaults.hot_window)
+    output.add_argument("--checkpoint-interval", type=float, default=defaults.checkpoint_interval)
+    output.add_argument("--output", dest="results_prefix", metavar="PREFIX",
+                        help="Write results to PREFIX.ndjson (and .csv, .parquet)")
+    output.add_argument("--csv", dest="stream_csv", action="store_true")
+    output.add_argument("--parquet", dest="stream_parquet", action="store_true")
+    output.add_argument("--gzip", dest="compress_results", action="store_true")
+    output.add_argument("--export", choices=EXPORT_FORMATS, action="append", default=[],
+                        help="Also export the results in this format when the crawl ends")
+    output.add_argument("--robots-cache", default=defaults.robots_cache, help="Empty to turn off")
+    output.add_argument("--robots-ttl", type=float, default=defaults.robots_ttl, help="Hours")
+    output.add_argument("--http-cache", default=defaults.http_cache, help="Empty to turn off")
+    output.add_argument("--metrics-port", type=int, default=defaults.metrics_port,
+                        help="Serve Prometheus metrics at http://127.0.0.1:PORT/metrics")
+
+    diagnostics = parser.add_argument_group("diagnostics")
+    diagnostics.add_argument("--trace", dest="trace_stages", action="store_true",
+                             help="Time each stage of a URL and print the breakdown at the end")
+    diagnostics.add_argument("--profile", dest="profile_pages", type=int, default=0, metavar="N",
+                             help="Profile the first N URLs; SIGUSR1 profiles the next N at any time")
+    diagnostics.add_argument("--profile-mode", choices=PROFILE_MODES, default=defaults.profile_mode)
+
+    parser.add_argument("--progress-interval", type=float, default=5.0, help="Seconds between progress lines; 0 for none")
+    parser.add_argument("--log-level", default="WARNING")
+    return parser
+
+
+def print_progress(stats: dict) -> None:
+    print(f"pages {stats['pages_crawled']}  queued {stats['urls_in_queue']}  errors {stats['errors']}  "
+          f"retries {stats['retry_queue']}  {stats['pages_per_second']:.1f} pages/s  "
+          f"fetch p50/p99 {stats['fetch_p50'] * 1000:.0f}/{stats['fetch_p99'] * 1000:.0f} ms  "
+          f"{stats['bytes_downloaded'] / 1048576:.1f} MB", file=sys.stderr)
+
+
+def print_stages(stages: List[dict]) -> None:
+    print(f"{'stage':<12} {'calls':>8} {'total s':>9} {'mean ms':>9} {'share':>7}", file=sys.stderr)
+    for row in stages:
+        print(f"{row['stage']:<12} {row['count']:>8} {row['seconds']:>9.2f} {row['mean'] * 1000:>9.2f} "
+              f"{row['share'] * 100:>6.1f}%", file=sys.stderr)
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    args = vars(build_parser().parse_args(argv))
+    resume = args.pop("resume")
+    exports = args.pop("export")
+    interval = args.pop("progress_interval")
+    logging.basicConfig(
+        level=args.pop("log_level").upper(),
+        format='%(asctime)s - %(levelname)s - %(name)s - %(message)s'
+    )
+
+    engine = CrawlEngine(CrawlConfig(**args), on_progress=print_progress if interval > 0 else None,
+                         progress_interval=interval)
+
+    def stop(signum, frame):
+        print("Stopping after the pages being fetched...", file=sys.stderr)
+        engine.stop()
+
+    def profile(signum, frame):
+        try:
+            path = engine.profile(args["profile_pages"] or DEFAULT_PROFILE_PAGES, args["profile_mode"])
+            print(f"Profiling the next URLs to {path}", file=sys.stderr)
+        except (ValueError, RuntimeError) as e:
+            print(f"Cannot profile: {e}", file=sys.stderr)
+
+    signal.signal(signal.SIGINT, stop)
+    signal.signal(signal.SIGTERM, stop)
+    if hasattr(signal, "SIGUSR1"):
+        signal.signal(signal.SIGUSR1, profile)
+
+    try:
+        engine.start(resume)
+    except (ValueError, RuntimeError) as e:
+        print(f"Error: {e}", file=sys.stderr)
+        return 2
+
+    # Waiting in short steps lets the main thread handle signals
+    while not engine.wait(0.5):
+        pass
+
+    if engine.error:
+        print(f"Crawling failed: {engine.error}", file=sys.stderr)
+        return 1
+
+    print(f"Results written to {engine.results_path}", file=sys.stderr)
+    if engine.profiler and engine.profiler.written:
+        print(f"Profile written to {engine.profiler.path}", file=sys.stderr)
+    if args["trace_stages"]:
+        print_stages(engine.stats.get_stats()["stages"])
+    for format_type in exports:
+        filename = engine.export(format_type)
+        print(f"Exported {format_type} to {filename}", file=sys.stderr)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
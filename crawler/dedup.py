@@ -0,0 +1,128 @@
+import hashlib
+import re
+import threading
+from collections import Counter
+from typing import Dict, Iterable, List, Optional, Tuple
+
+_WORD = re.compile(r"\w+")
+SHINGLE_SIZE = 3
+# Pages with less text than this are never treated as duplicates
+MIN_WORDS = 20
+# The set bits of every byte value
+_BYTE_BITS = [[bit for bit in range(8) if value >> bit & 1] for value in range(256)]
+
+
+def simhash(features: Iterable[str]) -> int:
+    # 64-bit SimHash; a feature that repeats is weighted by its count. The
+    # feature hashes are joined into one bytes object and the values at each
+    # byte position counted with a slice, so the per-feature work is one hash.
+    digests = b"".join(hashlib.blake2b(feature.encode("utf-8"), digest_size=8).digest() for feature in features)
+    total = len(digests) // 8
+
+    fingerprint = 0
+    for position in range(8):
+        votes = [0] * 8
+        for value, weight in Counter(digests[position::8]).items():
+            for bit in _BYTE_BITS[value]:
+                votes[bit] += weight
+        for bit in range(8):
+            if votes[bit] * 2 > total:
+                fingerprint |= 1 << (position * 8 + bit)
+    return fingerprint
+
+
+def text_fingerprint(text: str) -> Tuple[Optional[str], Optional[int]]:
+    # Exact hash and SimHash of the visible text. Both ignore markup, whitespace
+    # and case, so pages differing only in session IDs or layout still match.
+    words = _WORD.findall(text.lower())
+    if len(words) < MIN_WORDS:
+        return None, None
+    text_hash = hashlib.blake2b(" ".join(words).encode("utf-8"), digest_size=16).hexdigest()
+    return text_hash, simhash(" ".join(words[i:i + SHINGLE_SIZE]) for i in range(len(words) - SHINGLE_SIZE + 1))
+
+
+class DuplicateDetector:
+    # Finds pages whose SimHash is within max_distance bits of an earlier page.
+    # The fingerprint is split into max_distance + 1 bands; two fingerprints that
+    # differ in at most max_distance bits must agree on at least one whole band,
+    # so only pages sharing a band are compared. Band buckets are tuples, replaced
+    # rather than changed, so a checkpoint can copy the index cheaply.
+    def __init__(self, max_distance: int = 3):
+        self.max_distance = max_distance
+        self.bands = max_distance + 1
+        self.band_bits = 64 // self.bands
+        self.exact: Dict[str, str] = {}
+        self.index: List[Dict[int, Tuple[Tuple[int, str], ...]]] = [{} for _ in range(self.bands)]
+        self.count = 0
+        # Pages registered while a checkpoint writes its copy
+        self.journal: Optional[List[Tuple[str, str, int]]] = None
+        self.lock = threading.Lock()
+
+    def __getstate__(self):
+        state = self.__dict__.copy()
+        del state["lock"]
+        state.pop("journal", None)
+        return state
+
+    def __setstate__(self, state):
+        self.__dict__.update(state)
+        self.journal = None
+        self.lock = threading.Lock()
+
+    def snapshot(self) -> "DuplicateDetector":
+        # Called with the lock held; starts the journal, see stop_journal
+        copy = DuplicateDetector.__new__(DuplicateDetector)
+        copy.__setstate__(self.__getstate__())
+        copy.exact = dict(self.exact)
+        copy.index = [dict(band) for band in self.index]
+        self.journal = []
+        return copy
+
+    def stop_journal(self) -> List[Tuple[str, str, int]]:
+        with self.lock:
+            journal, self.journal = self.journal or [], None
+        return journal
+
+    def replay(self, journal: Iterable[Tuple[str, str, int]]) -> None:
+        for url, text_hash, fingerprint in journal:
+            self._add(url, text_hash, fingerprint)
+
+    def check(self, url: str, text_hash: str, fingerprint: int) -> Optional[str]:
+        # Returns the URL of the page this one duplicates, or registers it and returns None
+        with self.lock:
+            original = self.exact.get(text_hash)
+            if original is None:
+                original = self._nearest(fingerprint)
+            if original is not None and original != url:
+                return original
+            if original is None:
+                self._add(url, text_hash, fingerprint)
+            return None
+
+    def __len__(self) -> int:
+        return self.count
+
+    def _band_keys(self, fingerprint: int):
+        mask = (1 << self.band_bits) - 1
+        for band in range(self.bands):
+            # The last band takes the leftover high bits
+            if band == self.bands - 1:
+                yield fingerprint >> (band * self.band_bits)
+            else:
+                yield (fingerprint >> (band * self.band_bits)) & mask
+
+    def _nearest(self, fingerprint: int) -> Optional[str]:
+        for band, key in enumerate(self._band_keys(fingerprint)):
+            for candidate, url in self.index[band].get(key, ()):
+                if bin(candidate ^ fingerprint).count("1") <= self.max_distance:
+                    return url
+        return None
+
+    def _add(self, url: str, text_hash: str, fingerprint: int) -> None:
+        self.exact[text_hash] = url
+        for band, key in enumerate(self._band_keys(fingerprint)):
+            buckets = self.index[band]
+            buckets[key] = (*buckets.get(key, ()), (fingerprint, url))
+        self.count += 1
+        if self.journal is not None:
+            self.journal.append((url, text_hash, fingerprint))
@@ -0,0 +1,892 @@
+import csv
+import html
+import json
+import logging
+import os
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime
+from typing import Any, Callable, Dict, List, Optional
+
+import requests
+
+from crawler.async_engine import AsyncCrawlEngine
+from crawler.canonicalizer import DEFAULT_STRIP_PARAMS, URLCanonicalizer
+from crawler.checkpoint import CrawlCheckpoint
+from crawler.dedup import DuplicateDetector
+from crawler.extractor import EXTRACTOR_BACKENDS, ExtractedPage, create_extractor, decode_content
+from crawler.frontier import HostFrontier
+from crawler.host_control import THROTTLE_STATUSES, AdaptiveHostController, parse_retry_after
+from crawler.http_cache import CachedPage, HttpCache, content_hash
+from crawler.http_session import HttpSession
+from crawler.metrics import MetricsServer
+from crawler.parse_pool import ParsePool
+from crawler.proxy_manager import ProxyManager
+from crawler.retry import RetryScheduler, classify_error, is_retryable, status_kind
+from crawler.robots import RobotsParser
+from crawler.seen_set import SEEN_SET_BACKENDS, create_seen_set
+from crawler.sinks import CSV_FIELDS, CSVSink, MultiSink, NDJSONSink, ParquetSink, ResultSink, csv_row, read_records
+from crawler.stats import CrawlerStats
+from crawler.tracing import PROFILE_MODES, PageProfiler
+from crawler.url_filter import URLFilter
+
+ENGINES = ("threaded", "asyncio")
+EXPORT_FORMATS = ("html", "json", "csv", "parquet", "timings")
+# The HTML report lists this many duplicate clusters with up to this many URLs
+# each, so memory stays bounded; the others are only counted
+REPORT_CLUSTERS = 100
+REPORT_CLUSTER_URLS = 20
+
+
+# Settings of one crawl. Any attribute can be passed to the constructor;
+# the class attributes are the defaults.
+class CrawlConfig:
+    start_url = ""
+    max_depth = 3
+    workers = 5
+    # Seconds between the starts of requests to the same host, so at most 1/delay
+    # requests per second to a host whatever its concurrency
+    delay = 1.0
+    user_agent = "EnhancedWebCrawler/1.0"
+    engine = "threaded"
+    pool_size = 10
+    keep_alive = True
+    # Requests in parallel per host; the most a host can reach with adaptive limits.
+    # More than one only helps once responses take longer than the delay
+    host_concurrency = 4
+    adaptive = True
+    # Requests in flight across all hosts; 0 for no limit
+    global_limit = 0
+    max_retries = 3
+    seen_backend = "exact"
+    bloom_error = 0.001
+    extractor = "auto"
+    parse_workers = 0
+    dedup = True
+    dedup_distance = 3
+    include_patterns = ()
+    exclude_patterns = ()
+    allowed_domains = ()
+    strip_params = DEFAULT_STRIP_PARAMS
+    sort_query = True
+    proxies = ()
+    proxy_check_url = None
+    proxy_cooldown = 30.0
+    # Checkpoints and resume need a state directory; None or "" disables them
+    state_dir = None
+    hot_window = 100000
+    checkpoint_interval = 30.0
+    # Results are written to <prefix>.ndjson etc.; by default in the state
+    # directory, or crawl_results/ without one
+    results_prefix = None
+    stream_csv = False
+    compress_results = False
+    stream_parquet = False
+    robots_cache = "robots_cache.sqlite"
+    # Hours
+    robots_ttl = 24.0
+    http_cache = "http_cache.sqlite"
+    # Local port serving the stats in Prometheus format at /metrics; 0 for none
+    metrics_port = 0
+    # Time each stage of a URL (robots, request, download, parse, ...); can also
+    # be switched while crawling through engine.stats.tracer.enabled
+    trace_stages = False
+    # Profile the first N URLs of the crawl; 0 for none
+    profile_pages = 0
+    profile_mode = "sampling"
+
+    def __init__(self, **settings):
+        for name, value in settings.items():
+            if not hasattr(CrawlConfig, name) or callable(getattr(CrawlConfig, name)):
+                raise TypeError(f"Unknown crawl setting: {name}")
+            setattr(self, name, value)
+
+    def validate(self) -> None:
+        if self.max_depth < 1 or self.workers < 1 or self.delay < 0 or self.pool_size < 1:
+            raise ValueError("Invalid depth, workers, delay or connections per host")
+        if self.host_concurrency < 1 or self.parse_workers < 0 or self.global_limit < 0 or self.max_retries < 0:
+            raise ValueError("Invalid requests per host, parse processes, total requests or retries")
+        if self.hot_window < 1 or self.checkpoint_interval <= 0 or self.robots_ttl <= 0:
+            raise ValueError("Invalid persistence settings")
+        if not 0 < self.bloom_error < 1:
+            raise ValueError("Invalid Bloom filter error rate")
+        if not 0 <= self.dedup_distance <= 15:
+            raise ValueError("Invalid near-duplicate distance")
+        if self.proxy_cooldown <= 0:
+            raise ValueError("Invalid proxy quarantine")
+        if not 0 <= self.metrics_port <= 65535:
+            raise ValueError("Invalid metrics port")
+        if self.profile_pages < 0 or self.profile_mode not in PROFILE_MODES:
+            raise ValueError("Invalid profile settings")
+        if self.profile_pages and self.profile_mode == "cprofile" and self.engine != "threaded":
+            raise ValueError("cProfile profiling needs the threaded engine; use sampling")
+        if self.engine not in ENGINES:
+            raise ValueError(f"Unknown engine: {self.engine}")
+        if self.seen_backend not in SEEN_SET_BACKENDS:
+            raise ValueError(f"Unknown seen-URL store: {self.seen_backend}")
+        if self.extractor not in EXTRACTOR_BACKENDS:
+            raise ValueError(f"Unknown HTML parser: {self.extractor}")
+
+
+# A crawl without any GUI. start() returns at once and the crawl runs on
+# background threads (or the asyncio engine's event loop); pause(), unpause()
+# and stop() control it, and the optional callbacks report pages, progress
+# and completion from those threads. The GUI and the command line are both
+# clients of this class.
+class CrawlEngine:
+    def __init__(self, config: Optional[CrawlConfig] = None,
+                 on_page: Optional[Callable[[Dict[str, Any]], None]] = None,
+                 on_progress: Optional[Callable[[Dict[str, Any]], None]] = None,
+                 on_complete: Optional[Callable[[Optional[str]], None]] = None,
+                 progress_interval: float = 1.0):
+        self.config = config or CrawlConfig()
+        self.on_page = on_page
+        self.on_progress = on_progress
+        self.on_complete = on_complete
+        self.progress_interval = progress_interval
+        self.logger = logging.getLogger(__name__)
+
+        # Page records are streamed to results_path as pages finish
+        self.results_sink: Optional[ResultSink] = None
+        self.results_path = None
+
+        self.stats = CrawlerStats()
+        self.tracer = self.stats.tracer
+        self.profiler: Optional[PageProfiler] = None
+        self.http_session = HttpSession(user_agent=self.config.user_agent, stats=self.stats)
+        self.robots_parser = RobotsParser(user_agent=self.config.user_agent, http_session=self.http_session)
+        self.proxy_manager = ProxyManager(http_session=self.http_session)
+        self.url_filter = URLFilter()
+        self.canonicalizer = URLCanonicalizer()
+        self.extractor = create_extractor()
+        self.parse_pool: Optional[ParsePool] = None
+        self.http_cache: Optional[HttpCache] = None
+        self.metrics_server: Optional[MetricsServer] = None
+        self.duplicates: Optional[DuplicateDetector] = None
+
+        self.frontier = HostFrontier()
+        self.host_control = AdaptiveHostController(self.frontier)
+        self.retries = RetryScheduler(self.frontier)
+        self.robots_parser.loaded_listener = self.frontier.robots_loaded
+        # Canonical URLs that have been queued at least once
+        self.seen_urls = create_seen_set("exact")
+        self.seen_lock = threading.Lock()
+        self.stop_requested = False
+        self.pause_requested = False
+        self.thread_pool = None
+        self.async_engine = None
+        self.checkpoint = None
+        self.crawling = False
+        self.finished = threading.Event()
+        self.error: Optional[str] = None
+        self.start_url = ""
+        self.max_workers = 5
+        self.max_depth = 3
+
+    def start(self, resume: bool = False) -> None:
+        # Raises ValueError for invalid settings and RuntimeError when an optional
+        # package needed by them is missing
+        config = self.config
+        config.validate()
+        if self.crawling:
+            raise RuntimeError("A crawl is already running")
+
+        url = config.start_url.strip()
+        if not url and not resume:
+            raise ValueError("No start URL")
+
+        if config.engine == "asyncio" and not AsyncCrawlEngine.is_available():
+            raise RuntimeError("The asyncio engine requires the 'aiohttp' package")
+
+        if config.stream_parquet and not ParquetSink.is_available():
+            raise RuntimeError("Parquet output requires the 'pyarrow' package")
+
+        proxies = [proxy.strip() for proxy in config.proxies if proxy.strip()]
+        if config.engine == "asyncio" and any(proxy.startswith("socks") for proxy in proxies):
+            raise ValueError("The asyncio engine supports HTTP proxies only")
+
+        # Kept between crawls, so a scraper sees one endpoint for the whole session
+        if self.metrics_server and self.metrics_server.port != config.metrics_port:
+            self.metrics_server.close()
+            self.metrics_server = None
+        if config.metrics_port and not self.metrics_server:
+            try:
+                self.metrics_server = MetricsServer(self.stats.prometheus, config.metrics_port)
+            except OSError as e:
+                raise RuntimeError(f"Cannot serve metrics on port {config.metrics_port}: {str(e)}")
+
+        if self.checkpoint:
+            self.checkpoint.close()
+            self.checkpoint = None
+        state_dir = (config.state_dir or "").strip()
+        if state_dir:
+            self.checkpoint = CrawlCheckpoint(state_dir)
+        self.frontier.set_store(self.checkpoint.store if self.checkpoint else None, hot_limit=config.hot_window)
+
+        state = None
+        if resume:
+            state = self.checkpoint.load_state() if self.checkpoint else None
+            if state is None:
+                raise ValueError("No saved crawl found in the state directory")
+            url = config.start_url = state["start_url"]
+            config.max_depth = state["max_depth"]
+            config.stream_csv = state["stream_csv"]
+            config.compress_results = state["compress_results"]
+            config.stream_parquet = state.get("stream_parquet", False)
+
+        self.stop_requested = False
+        self.pause_requested = False
+        self.error = None
+        self.finished.clear()
+        duplicates = None
+        if state:
+            self.seen_urls, duplicates = self.checkpoint.load_seen_set(state)
+            self.frontier.restore()
+        else:
+            self.seen_urls = create_seen_set(config.seen_backend, error_rate=config.bloom_error)
+            self.frontier.clear()
+            if self.checkpoint:
+                self.checkpoint.reset()
+        self.results_sink = self.open_results_sink(state)
+
+        self.stats.start_session()
+        self.tracer.enabled = config.trace_stages
+        if state:
+            self.stats.restore_counters(state["pages_crawled"], state["bytes_downloaded"], state["errors"])
+
+        self.max_workers = config.workers
+        self.max_depth = config.max_depth
+        self.canonicalizer.set_strip_params(config.strip_params)
+        self.canonicalizer.sort_query = config.sort_query
+        self.url_filter.clear_filters()
+        for pattern in config.include_patterns:
+            self.url_filter.add_include_pattern(pattern)
+        for pattern in config.exclude_patterns:
+            self.url_filter.add_exclude_pattern(pattern)
+        self.url_filter.set_allowed_domains(config.allowed_domains)
+        fingerprints = config.dedup
+        self.duplicates = None
+        if fingerprints:
+            self.duplicates = duplicates if duplicates is not None else DuplicateDetector(config.dedup_distance)
+        self.extractor = create_extractor(config.extractor, fingerprints)
+        if config.parse_workers:
+            self.parse_pool = ParsePool(config.parse_workers, config.extractor, fingerprints, stats=self.stats)
+        self.frontier.configure(
+            min_delay=config.delay,
+            # Adaptive control starts every host at one request and raises it from there
+            host_concurrency=1 if config.adaptive else config.host_concurrency,
+            global_limit=config.global_limit
+        )
+        self.host_control.configure(config.host_concurrency, enabled=config.adaptive)
+        self.retries.configure(config.max_retries)
+        self.http_session.configure(
+            user_agent=config.user_agent,
+            pool_maxsize=config.pool_size,
+            keep_alive=config.keep_alive
+        )
+        self.robots_parser.configure(
+            user_agent=config.user_agent,
+            cache_path=config.robots_cache or None,
+            ttl=config.robots_ttl * 3600
+        )
+        self.proxy_manager.stop_health_checks()
+        self.proxy_manager.configure(config.proxy_check_url or None, cooldown=config.proxy_cooldown)
+        self.proxy_manager.set_proxies(proxies)
+        self.http_session.proxy_manager = self.proxy_manager if proxies else None
+        self.proxy_manager.start_health_checks()
+        http_cache_path = (config.http_cache or "").strip()
+        if self.http_cache and self.http_cache.path != http_cache_path:
+            self.http_cache.close()
+            self.http_cache = None
+        if http_cache_path and not self.http_cache:
+            self.http_cache = HttpCache(http_cache_path)
+
+        self.start_url = url
+        self.crawling = True
+        self.profiler = None
+        if config.profile_pages:
+            self.profile(config.profile_pages, config.profile_mode)
+        # A resumed crawl continues from the restored frontier, whose hosts wait for their robots.txt
+        start_url = None if resume else url
+        if resume:
+            for key in self.frontier.host_keys():
+                self.robots_parser.prefetch(key)
+
+        if config.engine == "asyncio":
+            self.thread_pool = None
+            self.async_engine = AsyncCrawlEngine(self, concurrency=self.max_workers)
+            self.async_engine.start(start_url)
+        else:
+            self.async_engine = None
+            self.thread_pool = ThreadPoolExecutor(max_workers=self.max_workers)
+            threading.Thread(target=self.crawl_worker, args=(start_url,), daemon=True).start()
+
+        self.retries.start()
+        if self.checkpoint:
+            threading.Thread(target=self.checkpoint_loop, args=(config.checkpoint_interval,), daemon=True).start()
+        if self.on_progress:
+            threading.Thread(target=self.progress_loop, daemon=True).start()
+
+    def run(self, resume: bool = False) -> Optional[str]:
+        # Crawls to the end; returns the error that stopped the crawl, if any
+        self.start(resume)
+        self.wait()
+        return self.error
+
+    def wait(self, timeout: Optional[float] = None) -> bool:
+        return self.finished.wait(timeout)
+
+    def pause(self) -> None:
+        self.pause_requested = True
+
+    def unpause(self) -> None:
+        self.pause_requested = False
+
+    def stop(self) -> None:
+        # The crawl stops after the pages being fetched, then saves a checkpoint
+        self.stop_requested = True
+
+    def profile(self, pages: int, mode: str = "sampling", path: Optional[str] = None,
+                on_done: Optional[Callable[[Optional[str]], None]] = None) -> str:
+        # Profiles the next `pages` URLs of the running crawl; returns the file
+        # the profile will be written to, and calls on_done with it once written
+        # (None if writing failed)
+        if pages < 1 or mode not in PROFILE_MODES:
+            raise ValueError("Invalid profile settings")
+        if mode == "cprofile" and self.config.engine != "threaded":
+            raise ValueError("cProfile profiling needs the threaded engine; use sampling")
+        if not self.crawling:
+            raise RuntimeError("No crawl is running")
+        if self.profiler and not self.profiler.done.is_set():
+            raise RuntimeError("A profile is already being taken")
+        timestamp = datetime.now().strftime('%Y%m%d_%H%M%S')
+        path = path or f"profile_{timestamp}.{'prof' if mode == 'cprofile' else 'folded'}"
+        self.profiler = PageProfiler(pages, path, mode, on_done=on_done)
+        return path
+
+    def progress(self) -> Dict[str, Any]:
+        self.stats.update_proxies(self.proxy_manager.healthy_count(), len(self.proxy_manager))
+        self.stats.update_retry_queue(len(self.retries))
+        return self.stats.get_stats()
+
+    def open_results_sink(self, state: Optional[dict]) -> ResultSink:
+        if self.config.results_prefix:
+            prefix = self.config.results_prefix
+            os.makedirs(os.path.dirname(prefix) or ".", exist_ok=True)
+        elif self.checkpoint:
+            prefix = self.checkpoint.path("results")
+        else:
+            os.makedirs("crawl_results", exist_ok=True)
+            prefix = os.path.join("crawl_results", f"results_{datetime.now().strftime('%Y%m%d_%H%M%S')}_{os.getpid()}")
+
+        compress = self.config.compress_results
+        suffix = ".gz" if compress else ""
+        offsets = state["sink_offsets"] if state else {}
+
+        paths = [(NDJSONSink, f"{prefix}.ndjson{suffix}")]
+        if self.config.stream_csv:
+            paths.append((CSVSink, f"{prefix}.csv{suffix}"))
+        sinks = [sink_class(path, compress=compress, resume_offset=offsets.get(path)) for sink_class, path in paths]
+        if self.config.stream_parquet:
+            path = f"{prefix}.parquet"
+            sinks.append(ParquetSink(path, resume_offset=offsets.get(path)))
+
+        self.results_path = sinks[0].path
+        return MultiSink(sinks) if len(sinks) > 1 else sinks[0]
+
+    def crawl_worker(self, start_url: Optional[str]):
+        try:
+            if start_url:
+                self.enqueue_url(start_url, 0)
+
+            workers = [self.thread_pool.submit(self.fetch_loop) for _ in range(self.max_workers)]
+            for worker in workers:
+                worker.result()
+
+            self.crawl_completed()
+
+        except Exception as e:
+            self.logger.error(f"Crawl worker error: {str(e)}")
+            self.crawl_completed(error=str(e))
+
+    def fetch_loop(self):
+        while not self.stop_requested:
+            if self.pause_requested:
+                time.sleep(0.2)
+                continue
+
+            with self.tracer.span("queue_wait"):
+                item = self.frontier.get(timeout=0.2)
+            if item is None:
+                # No host being ready only means the crawl is done when no other
+                # worker is still processing a page that may add more links
+                if self.is_drained():
+                    return
+                continue
+
+            url, depth = item
+            try:
+                if not self.should_process(url, depth):
+                    continue
+
+                profiler = self.profiler
+                if profiler:
+                    profiler.run(self.process_url, url, depth)
+                else:
+                    self.process_url(url, depth)
+            finally:
+                self.task_done(url)
+
+    def enqueue_url(self, url: str, depth: int) -> bool:
+        if depth > self.max_depth:
+            return False
+
+        with self.tracer.span("filter"):
+            canonical_url = self.canonicalizer.canonicalize(url)
+            if canonical_url is None or not self.url_filter.should_crawl(canonical_url):
+                return False
+
+        # The frontier is updated under the same lock so checkpoints see both agree
+        with self.tracer.span("enqueue"), self.seen_lock:
+            if not self.seen_urls.add(canonical_url):
+                return False
+            new_host = self.frontier.put(canonical_url, depth)
+        if new_host:
+            self.robots_parser.prefetch(canonical_url)
+        return True
+
+    def task_done(self, url: str):
+        self.frontier.task_done(url)
+        profiler = self.profiler
+        if profiler:
+            profiler.page_done()
+
+    def is_drained(self) -> bool:
+        # Both are read under the frontier's lock, which the retry thread holds while
+        # moving a due URL from its heap into the frontier, so that URL is always seen
+        with self.frontier.condition:
+            return self.frontier.pending() == 0 and len(self.retries) == 0
+
+    def should_process(self, url: str, depth: int) -> bool:
+        # URL filters were applied when the URL was enqueued
+        return depth <= self.max_depth
+
+    def process_url(self, url: str, depth: int):
+        started = time.perf_counter()
+        try:
+            self.logger.info(f"Starting to process URL: {url} at depth {depth}")
+
+            # Hosts are scheduled once their robots.txt is in memory; otherwise (evicted
+            # from the cache) it is loaded here
+            with self.tracer.span("robots"):
+                allowed = self.robots_parser.cached_decision(url)
+                if allowed is None:
+                    allowed = self.robots_parser.can_fetch(url)
+                    if allowed:
+                        self.frontier.set_crawl_delay(url, self.robots_parser.get_crawl_delay(url))
+            if not allowed:
+                if not self.robots_unavailable(url, depth):
+                    self.logger.info(f"Skipping {url} - not allowed by robots.txt")
+                return
+
+            if self.logger.isEnabledFor(logging.DEBUG):
+                self.logger.debug(f"Current queue size: {self.frontier.qsize()}")
+                self.logger.debug(f"Seen URLs count: {len(self.seen_urls)}")
+
+            cached = self.cached_page(url)
+            self.logger.info(f"Making request to {url}")
+            try:
+                fetch_started = time.perf_counter()
+                response = self.http_session.get(url, headers=cached.conditional_headers() if cached else None)
+                fetch_time = time.perf_counter() - fetch_started
+                self.stats.record_fetch(url, fetch_time)
+                # requests times the response up to its headers; the body is read after that
+                headers_time = min(response.elapsed.total_seconds(), fetch_time)
+                self.tracer.add("request", headers_time)
+                self.tracer.add("download", fetch_time - headers_time)
+                self.host_control.record_response(url, response.status_code, response.elapsed.total_seconds(),
+                                                  response.headers.get("Retry-After"))
+                if response.status_code in THROTTLE_STATUSES:
+                    self.throttled(url, depth, response.status_code, response.headers.get("Retry-After"))
+                    return
+                response.raise_for_status()
+            except requests.RequestException as e:
+                if isinstance(e, requests.Timeout):
+                    self.host_control.record_timeout(url, self.http_session.timeout)
+                self.request_failed(url, depth, e)
+                return
+
+            self.logger.info(f"Successfully downloaded {url}, status code: {response.status_code}")
+
+            if response.status_code == 304 and cached:
+                content = b""
+                page = self.not_modified(url, cached)
+            else:
+                content = response.content
+                digest = content_hash(content) if self.http_cache else None
+                page = self.unchanged_page(cached, digest)
+                if page is None:
+                    parse_started = time.perf_counter()
+                    page = self.extract_page(url, content, response.encoding or response.apparent_encoding)
+                    self.stats.record_parse(time.perf_counter() - parse_started)
+                self.store_page(url, response.headers, content, digest, page, cached)
+
+            for next_url in self.handle_page(url, depth, content, page):
+                self.enqueue_url(next_url, depth + 1)
+
+            self.stats.update_queue_size(self.frontier.qsize())
+            self.stats.record_total(time.perf_counter() - started)
+
+        except Exception as e:
+            self.logger.error(f"Error processing {url}: {str(e)}")
+            self.logger.exception("Full traceback for processing error:")
+            self.stats.increment_errors(url)
+
+    def throttled(self, url: str, depth: int, status: int, retry_after: Optional[str]):
+        # The host asked for fewer requests; host control has already slowed it down
+        self.stats.increment_throttled()
+        self.stats.record_request_error(status_kind(status))
+        self.retry_later(url, depth, f"HTTP {status}", parse_retry_after(retry_after))
+
+    def request_failed(self, url: str, depth: int, error: Exception):
+        kind = classify_error(error)
+        self.stats.record_request_error(kind)
+        if is_retryable(error, kind):
+            self.retry_later(url, depth, f"{kind} error: {str(error)}")
+        else:
+            self.logger.error(f"Request error for {url} ({kind}): {str(error)}")
+            self.stats.increment_errors(url)
+
+    def robots_unavailable(self, url: str, depth: int) -> bool:
+        # robots.txt could not be read (5xx or unreachable): the host waits until it
+        # is fetched again and the URL goes back to the frontier then, not dropped
+        wait = self.robots_parser.unavailable_for(url)
+        if not wait:
+            return False
+        self.frontier.defer_host(url, wait)
+        self.retries.postpone(url, depth, wait)
+        self.logger.warning(f"robots.txt unavailable, will try {url} again in {wait:.0f}s")
+        return True
+
+    def retry_later(self, url: str, depth: int, reason: str, retry_after: Optional[float] = None):
+        if self.retries.schedule(url, depth, retry_after):
+            self.logger.warning(f"Will retry {url} after {reason}")
+            self.stats.increment_retries()
+        else:
+            self.logger.error(f"Giving up on {url} after {reason}")
+            self.stats.increment_errors(url)
+
+    def cached_page(self, url: str) -> Optional[CachedPage]:
+        if not self.http_cache:
+            return None
+        try:
+            with self.tracer.span("cache"):
+                return self.http_cache.get(url)
+        except Exception as e:
+            self.logger.error(f"Error reading HTTP cache for {url}: {str(e)}")
+            return None
+
+    def not_modified(self, url: str, cached: CachedPage) -> ExtractedPage:
+        self.logger.info(f"{url} not modified, reusing cached links")
+        self.stats.record_revalidation(True, cached.size)
+        return cached.page
+
+    def unchanged_page(self, cached: Optional[CachedPage], digest: Optional[str]) -> Optional[ExtractedPage]:
+        # The body is the same as last time even though the server sent it again
+        if cached and cached.content_hash == digest:
+            return cached.page
+        return None
+
+    def store_page(self, url: str, headers, content: bytes, digest: Optional[str], page: ExtractedPage,
+                   cached: Optional[CachedPage]):
+        if not self.http_cache:
+            return
+        if cached and cached.conditional_headers():
+            self.stats.record_revalidation(False, 0)
+        try:
+            with self.tracer.span("cache"):
+                self.http_cache.put(url, headers.get("ETag"), headers.get("Last-Modified"), digest, len(content), page)
+        except Exception as e:
+            self.logger.error(f"Error updating HTTP cache for {url}: {str(e)}")
+
+    def extract_page(self, url: str, content: bytes, encoding: Optional[str]) -> ExtractedPage:
+        if self.parse_pool:
+            # Decoded in the worker process, so both stages count as parsing
+            with self.tracer.span("parse"):
+                return self.parse_pool.parse(url, content, encoding)
+        with self.tracer.span("decode"):
+            text = decode_content(content, encoding)
+        with self.tracer.span("parse"):
+            return self.extractor.extract(url, text)
+
+    def handle_page(self, url: str, depth: int, content: bytes, page: ExtractedPage) -> List[str]:
+        self.stats.record_page(url, len(content))
+        self.stats.update_depth(depth)
+
+        self.logger.info(f"Found {len(page.links)} links on page {url}")
+
+        self.retries.forget(url)
+
+        duplicate_of = None
+        if self.duplicates is not None and page.text_hash:
+            with self.tracer.span("dedup"):
+                duplicate_of = self.duplicates.check(url, page.text_hash, page.simhash)
+
+        data = {
+            'url': url,
+            'title': page.title,
+            'timestamp': datetime.now().isoformat(),
+            'depth': depth,
+            'links': [{'text': link_text, 'href': href} for href, link_text, _ in page.links],
+            'duplicate_of': duplicate_of
+        }
+        with self.tracer.span("store"):
+            self.results_sink.write(data)
+            if self.on_page:
+                self.on_page(data)
+
+        if duplicate_of:
+            # Its links were already found on the original page
+            self.logger.info(f"{url} is a near-duplicate of {duplicate_of}, not following its links")
+            self.stats.increment_duplicates()
+            return []
+        return page.follow_urls()
+
+    def checkpoint_loop(self, interval: float):
+        next_checkpoint = time.time() + interval
+        while self.crawling:
+            time.sleep(0.5)
+            if self.crawling and time.time() >= next_checkpoint:
+                self.save_checkpoint()
+                next_checkpoint = time.time() + interval
+
+    def progress_loop(self):
+        while not self.finished.wait(self.progress_interval):
+            try:
+                self.on_progress(self.progress())
+            except Exception as e:
+                self.logger.error(f"Error in progress callback: {str(e)}")
+
+    def save_checkpoint(self):
+        if not self.checkpoint:
+            return
+
+        try:
+            stats = self.stats.get_stats()
+            state = {
+                'start_url': self.start_url,
+                'max_depth': self.max_depth,
+                'pages_crawled': stats['pages_crawled'],
+                'bytes_downloaded': stats['bytes_downloaded'],
+                'errors': stats['errors'],
+                'stream_csv': self.config.stream_csv,
+                'compress_results': self.config.compress_results,
+                'stream_parquet': self.config.stream_parquet,
+                'saved_at': datetime.now().isoformat()
+            }
+            self.checkpoint.save(self.frontier, self.seen_urls, self.seen_lock, state, self.results_sink, self.duplicates,
+                                 self.retries)
+        except Exception as e:
+            self.logger.error(f"Error saving checkpoint: {str(e)}")
+
+    def crawl_completed(self, error: Optional[str] = None):
+        if self.thread_pool:
+            self.thread_pool.shutdown(wait=True)
+        if self.parse_pool:
+            self.parse_pool.shutdown()
+            self.parse_pool = None
+        if self.http_cache:
+            self.http_cache.commit()
+        self.proxy_manager.stop_health_checks()
+        self.retries.stop()
+        self.crawling = False
+        self.save_checkpoint()
+        self.results_sink.close()
+        self.stats.stop_session()
+        if self.profiler:
+            self.profiler.stop()
+        self.error = error
+
+        try:
+            if self.on_progress:
+                self.on_progress(self.progress())
+            if self.on_complete:
+                self.on_complete(error)
+        finally:
+            self.finished.set()
+
+    def export(self, format_type: str = 'html', filename: Optional[str] = None) -> str:
+        # Streamed from the results file; returns the name of the file written
+        timestamp = datetime.now().strftime('%Y%m%d_%H%M%S')
+
+        try:
+            if format_type == 'html':
+                filename = filename or f'crawl_report_{timestamp}.html'
+                self._export_html(filename)
+            elif format_type == 'json':
+                filename = filename or f'crawl_data_{timestamp}.json'
+                with open(filename, 'w', encoding='utf-8') as f:
+                    f.write('[')
+                    for i, record in enumerate(read_records(self.results_path)):
+                        f.write(',\n' if i else '\n')
+                        f.write(json.dumps(record, indent=2, ensure_ascii=False))
+                    f.write('\n]\n')
+            elif format_type == 'csv':
+                filename = filename or f'crawl_data_{timestamp}.csv'
+                with open(filename, 'w', encoding='utf-8', newline='') as f:
+                    writer = csv.writer(f)
+                    writer.writerow(CSV_FIELDS)
+                    for record in read_records(self.results_path):
+                        writer.writerow(csv_row(record))
+            elif format_type == 'parquet':
+                filename = filename or f'crawl_data_{timestamp}.parquet'
+                sink = ParquetSink(filename)
+                for record in read_records(self.results_path):
+                    sink.write(record)
+                sink.close()
+            elif format_type == 'timings':
+                filename = filename or f'crawl_timings_{timestamp}.json'
+                with open(filename, 'w', encoding='utf-8') as f:
+                    json.dump(self.timings(), f, indent=2)
+            else:
+                raise ValueError(f"Unknown export format: {format_type}")
+
+            self.logger.info(f"Data exported to {filename}")
+            return filename
+
+        except Exception as e:
+            self.logger.error(f"Error exporting data: {str(e)}")
+            raise
+
+    def timings(self) -> Dict[str, Any]:
+        # Latency percentiles in seconds and the time traced in each stage
+        stats = self.stats.get_stats()
+        return {
+            'pages_crawled': stats['pages_crawled'],
+            'elapsed_time': stats['elapsed_time'],
+            'pages_per_second': stats['pages_per_second'],
+            'latency': {
+                name: {quantile: stats[f'{name}_{quantile}'] for quantile in ('p50', 'p95', 'p99')}
+                for name in ('fetch', 'parse', 'total')
+            },
+            'stages': stats['stages']
+        }
+
+    def _export_html(self, filename: str):
+        # Streamed from the results file page by page so memory stays flat
+        timings = self.timings()
+        latency_rows = "".join(
+            f"<tr><td>{name}</td>" + "".join(f"<td>{seconds * 1000:.1f} ms</td>" for seconds in quantiles.values()) + "</tr>"
+            for name, quantiles in timings['latency'].items()
+        )
+        stage_rows = "".join(
+            f"<tr><td>{row['stage']}</td><td>{row['count']}</td><td>{row['seconds']:.2f} s</td>"
+            f"<td>{row['mean'] * 1000:.2f} ms</td><td>{row['share'] * 100:.1f}%</td></tr>"
+            for row in timings['stages']
+        )
+        stages_table = f"""
+                <h3>Time by Stage</h3>
+                <table>
+                    <tr><th>Stage</th><th>Calls</th><th>Total</th><th>Mean</th><th>Share</th></tr>
+                    {stage_rows}
+                </table>""" if stage_rows else ""
+        with open(filename, 'w', encoding='utf-8') as f:
+            f.write(f"""
+        <!DOCTYPE html>
+        <html>
+        <head>
+            <title>Crawler Report - {datetime.now().strftime('%Y-%m-%d %H:%M:%S')}</title>
+            <style>
+                body {{ font-family: Arial, sans-serif; margin: 20px; }}
+                .stats {{ background: #f5f5f5; padding: 15px; border-radius: 5px; }}
+                .page {{ margin: 15px 0; padding: 10px; border: 1px solid #ddd; }}
+                .links {{ margin-left: 20px; }}
+                pre {{ background: #f8f8f8; padding: 10px; overflow-x: auto; }}
+                td, th {{ padding: 2px 10px; text-align: right; }}
+            </style>
+        </head>
+        <body>
+            <h1>Web Crawler Report</h1>
+
+            <div class="stats">
+                <h2>Crawling Statistics</h2>
+                <p>Pages Crawled: {self.stats.get_stats()['pages_crawled']}</p>
+                <p>Start Time: {self.stats.start_time}</p>
+                <p>Total Time: {time.time() - self.stats.start_time:.2f} seconds</p>
+                <h3>Latency</h3>
+                <table>
+                    <tr><th></th><th>p50</th><th>p95</th><th>p99</th></tr>
+                    {latency_rows}
+                </table>{stages_table}
+            </div>
+
+            <h2>Crawled Pages</h2>
+        """)
+
+            # Original URL -> [number of duplicates, first duplicates]
+            clusters = {}
+            unlisted = 0
+            for data in read_records(self.results_path):
+                original = data.get('duplicate_of')
+                if original:
+                    cluster = clusters.get(original)
+                    if cluster is None and len(clusters) < REPORT_CLUSTERS:
+                        cluster = clusters[original] = [0, []]
+                    if cluster is None:
+                        unlisted += 1
+                    else:
+                        cluster[0] += 1
+                        if len(cluster[1]) < REPORT_CLUSTER_URLS:
+                            cluster[1].append(data['url'])
+                f.write(f"""
+            <div class="page">
+                <h3><a href="{html.escape(data['url'])}">{html.escape(data['title'] or data['url'])}</a></h3>
+                <p>Depth: {data['depth']}</p>
+                <p>Crawled at: {data['timestamp']}</p>
+
+                <div class="links">
+                    <h4>Found Links ({len(data['links'])})</h4>
+                    <ul>
+            """)
+
+                for link in data['links'][:10]:
+                    f.write(f"""
+                    <li><a href="{html.escape(link['href'])}">{html.escape(link['text'] or link['href'])}</a></li>
+                """)
+
+                if len(data['links']) > 10:
+                    f.write(f"<li>... and {len(data['links']) - 10} more links</li>")
+
+                f.write("""
+                    </ul>
+                </div>
+            </div>
+            """)
+
+            if clusters:
+                f.write("""
+            <h2>Duplicate Clusters</h2>
+        """)
+                for original, (count, duplicates) in clusters.items():
+                    f.write(f"""
+            <div class="page">
+                <h3><a href="{html.escape(original)}">{html.escape(original)}</a></h3>
+                <p>{count} near-duplicate pages, links not followed</p>
+                <ul>
+            """)
+                    for url in duplicates:
+                        f.write(f'<li><a href="{html.escape(url)}">{html.escape(url)}</a></li>')
+                    if count > len(duplicates):
+                        f.write(f"<li>... and {count - len(duplicates)} more</li>")
+                    f.write("""
+                </ul>
+            </div>
+            """)
+                if unlisted:
+                    f.write(f"<p>... and {unlisted} near-duplicates of other pages</p>")
+
+            f.write("""
+        </body>
+        </html>
+        """)
@@ -0,0 +1,251 @@
+import logging
+from html.parser import HTMLParser
+from typing import List, Optional, Tuple
+from urllib.parse import urljoin
+
+from crawler.dedup import text_fingerprint
+
+# Imported on first use, as the GUI imports this module only for EXTRACTOR_BACKENDS
+etree = None
+
+
+def _import_lxml() -> bool:
+    global etree
+    if etree is None:
+        try:
+            from lxml import etree as lxml_etree
+        except ImportError:
+            return False
+        etree = lxml_etree
+    return True
+
+
+def decode_content(content: bytes, encoding: Optional[str]) -> str:
+    try:
+        return content.decode(encoding or 'utf-8', errors='replace')
+    except LookupError:
+        return content.decode('utf-8', errors='replace')
+
+
+class ExtractedPage:
+    def __init__(self, title: str, links: List[Tuple[str, str, bool]], nofollow: bool = False, noindex: bool = False,
+                 text_hash: Optional[str] = None, simhash: Optional[int] = None):
+        self.title = title
+        # (absolute href, anchor text, follow) for every <a href> on the page
+        self.links = links
+        self.nofollow = nofollow
+        self.noindex = noindex
+        # Fingerprints of the visible text, set when the extractor computes them
+        self.text_hash = text_hash
+        self.simhash = simhash
+
+    def follow_urls(self) -> List[str]:
+        if self.nofollow:
+            return []
+        return [href for href, _, follow in self.links if follow]
+
+
+# Elements whose content is not page text
+_INVISIBLE = {"script", "style", "noscript", "template"}
+
+
+class _PageCollector:
+    # Event handler shared by the streaming backends. Hrefs are kept raw until
+    # the end of the document so each one is resolved exactly once, against the
+    # <base href> if the page has one.
+    def __init__(self):
+        self.text_parts: List[str] = []
+        self.skip_text = 0
+        self.title_parts: List[str] = []
+        self.in_title = False
+        self.title_done = False
+        self.raw_links: List[Tuple[str, List[str], bool]] = []
+        self.anchor_text: Optional[List[str]] = None
+        self.base_href: Optional[str] = None
+        self.robots: List[str] = []
+
+    def start(self, tag: str, attrs) -> None:
+        if tag == "a":
+            href = attrs.get("href")
+            if href:
+                rel = (attrs.get("rel") or "").lower()
+                self.anchor_text = []
+                self.raw_links.append((href.strip(), self.anchor_text, "nofollow" not in rel))
+        elif tag == "title":
+            self.in_title = not self.title_done
+        elif tag in _INVISIBLE:
+            self.skip_text += 1
+        elif tag == "base":
+            if self.base_href is None and attrs.get("href"):
+                self.base_href = attrs["href"].strip()
+        elif tag == "meta":
+            if (attrs.get("name") or "").lower() == "robots":
+                self.robots.extend(d.strip() for d in (attrs.get("content") or "").lower().split(","))
+
+    def end(self, tag: str) -> None:
+        if tag == "a":
+            self.anchor_text = None
+        elif tag == "title" and self.in_title:
+            self.in_title = False
+            self.title_done = True
+        elif tag in _INVISIBLE and self.skip_text:
+            self.skip_text -= 1
+
+    def data(self, text: str) -> None:
+        if not self.skip_text:
+            self.text_parts.append(text)
+        if self.anchor_text is not None:
+            self.anchor_text.append(text)
+        if self.in_title:
+            self.title_parts.append(text)
+
+    def result(self, url: str, fingerprints: bool = False) -> ExtractedPage:
+        base = url
+        if self.base_href:
+            try:
+                base = urljoin(url, self.base_href)
+            except ValueError:
+                pass
+
+        links = []
+        for href, text, follow in self.raw_links:
+            try:
+                absolute = urljoin(base, href)
+            except ValueError:
+                continue
+            # Same text as BeautifulSoup's get_text(strip=True)
+            links.append((absolute, "".join(part.strip() for part in text), follow))
+
+        page = ExtractedPage(
+            title="".join(self.title_parts).strip(),
+            links=links,
+            nofollow="nofollow" in self.robots or "none" in self.robots,
+            noindex="noindex" in self.robots or "none" in self.robots
+        )
+        if fingerprints:
+            page.text_hash, page.simhash = text_fingerprint(" ".join(self.text_parts))
+        return page
+
+
+class _StdlibParser(HTMLParser):
+    def __init__(self, collector: _PageCollector):
+        super().__init__(convert_charrefs=True)
+        self.collector = collector
+
+    def handle_starttag(self, tag, attrs):
+        self.collector.start(tag, dict(attrs))
+
+    def handle_startendtag(self, tag, attrs):
+        self.collector.start(tag, dict(attrs))
+        self.collector.end(tag)
+
+    def handle_endtag(self, tag):
+        self.collector.end(tag)
+
+    def handle_data(self, data):
+        self.collector.data(data)
+
+
+class _LxmlTarget:
+    def __init__(self, collector: _PageCollector):
+        self.collector = collector
+
+    def start(self, tag, attrib):
+        self.collector.start(tag, attrib)
+
+    def end(self, tag):
+        self.collector.end(tag)
+
+    def data(self, data):
+        self.collector.data(data)
+
+    def comment(self, text):
+        pass
+
+    def close(self):
+        return self.collector
+
+
+class LinkExtractor:
+    name = "base"
+
+    def __init__(self, fingerprints: bool = False):
+        # Whether to compute the text fingerprints used for near-duplicate detection
+        self.fingerprints = fingerprints
+        self.logger = logging.getLogger(__name__)
+
+    def extract(self, url: str, text: str) -> ExtractedPage:
+        raise NotImplementedError
+
+
+class LxmlExtractor(LinkExtractor):
+    # libxml2's HTML parser feeding parse events straight into the collector,
+    # without building a tree
+    name = "lxml"
+
+    @staticmethod
+    def is_available() -> bool:
+        return _import_lxml()
+
+    def extract(self, url: str, text: str) -> ExtractedPage:
+        collector = _PageCollector()
+        parser = etree.HTMLParser(target=_LxmlTarget(collector), recover=True, no_network=True)
+        try:
+            parser.feed(text)
+            parser.close()
+        except etree.LxmlError as e:
+            self.logger.debug(f"lxml stopped early on {url}: {str(e)}")
+        return collector.result(url, self.fingerprints)
+
+
+class HTMLParserExtractor(LinkExtractor):
+    name = "htmlparser"
+
+    def extract(self, url: str, text: str) -> ExtractedPage:
+        collector = _PageCollector()
+        parser = _StdlibParser(collector)
+        parser.feed(text)
+        parser.close()
+        return collector.result(url, self.fingerprints)
+
+
+class SoupExtractor(LinkExtractor):
+    name = "soup"
+
+    def extract(self, url: str, text: str) -> ExtractedPage:
+        # Only this backend uses BeautifulSoup, so it is not imported until needed
+        from bs4 import BeautifulSoup
+
+        soup = BeautifulSoup(text, 'html.parser')
+        for element in soup.find_all(list(_INVISIBLE)):
+            element.decompose()
+        collector = _PageCollector()
+        collector.text_parts.extend(soup.stripped_strings)
+        for element in soup.find_all(['a', 'base', 'meta']):
+            attrs = dict(element.attrs)
+            if isinstance(attrs.get('rel'), list):
+                attrs['rel'] = " ".join(attrs['rel'])
+            collector.start(element.name, attrs)
+            if element.name == 'a' and collector.anchor_text is not None:
+                collector.anchor_text.extend(element.stripped_strings)
+                collector.end('a')
+        if soup.title and soup.title.string:
+            collector.title_parts.append(soup.title.string)
+        return collector.result(url, self.fingerprints)
+
+
+EXTRACTOR_BACKENDS = ("auto", "lxml", "htmlparser", "soup")
+
+
+def create_extractor(backend: str = "auto", fingerprints: bool = False) -> LinkExtractor:
+    if backend == "auto":
+        backend = "lxml" if LxmlExtractor.is_available() else "htmlparser"
+    if backend == "lxml":
+        if not LxmlExtractor.is_available():
+            raise ValueError("The lxml extractor requires the 'lxml' package")
+        return LxmlExtractor(fingerprints)
+    if backend == "htmlparser":
+        return HTMLParserExtractor(fingerprints)
+    if backend == "soup":
+        return SoupExtractor(fingerprints)
+    raise ValueError(f"Unknown extractor backend: {backend}")
@@ -0,0 +1,290 @@
+import heapq
+import logging
+import threading
+import time
+from collections import deque
+from typing import Deque, Dict, List, Optional, Tuple
+from urllib.parse import urlparse
+
+from crawler.frontier_store import SQLiteFrontierStore
+
+
+class HostQueue:
+    __slots__ = ("key", "urls", "spilled", "delay", "base_delay", "max_active", "active", "next_fetch", "scheduled",
+                 "delay_known", "serial", "robots_ready")
+
+    def __init__(self, key: str, delay: float, max_active: int):
+        self.key = key
+        self.urls: Deque[Tuple[str, int]] = deque()
+        # URLs of this host waiting in the disk store
+        self.spilled = 0
+        self.delay = delay
+        # Delay from the settings and robots.txt; adaptive control never goes below it
+        self.base_delay = delay
+        self.max_active = max_active
+        self.active = 0
+        self.next_fetch = 0.0
+        self.scheduled = False
+        self.delay_known = False
+        # robots.txt set a Crawl-delay, so requests go one at a time
+        self.serial = False
+        # The host is only scheduled once its robots.txt is in memory, so no worker waits for it
+        self.robots_ready = False
+
+
+class HostFrontier:
+    def __init__(self, min_delay: float = 0.0, host_concurrency: int = 1,
+                 store: Optional[SQLiteFrontierStore] = None, hot_limit: int = 100000, refill_batch: int = 500,
+                 global_limit: int = 0):
+        self.min_delay = min_delay
+        self.host_concurrency = host_concurrency
+        # Most requests in flight across all hosts; 0 for no limit
+        self.global_limit = global_limit
+        self.store = store
+        self.hot_limit = hot_limit
+        self.refill_batch = refill_batch
+        self.hosts: Dict[str, HostQueue] = {}
+        # Heap of (next_fetch, sequence, host key); a host is in it at most once
+        self.ready: List[Tuple[float, int, str]] = []
+        self.sequence = 0
+        self.size = 0
+        self.hot_size = 0
+        self.in_flight: Dict[str, int] = {}
+        self.condition = threading.Condition()
+        self.logger = logging.getLogger(__name__)
+
+    @staticmethod
+    def host_key(url: str) -> str:
+        parsed = urlparse(url)
+        return f"{parsed.scheme}://{parsed.netloc}".lower()
+
+    def configure(self, min_delay: float, host_concurrency: int, global_limit: int = 0) -> None:
+        with self.condition:
+            self.min_delay = min_delay
+            self.host_concurrency = host_concurrency
+            self.global_limit = global_limit
+
+    def set_store(self, store: Optional[SQLiteFrontierStore], hot_limit: int = 100000) -> None:
+        with self.condition:
+            self.store = store
+            self.hot_limit = hot_limit
+
+    def put(self, url: str, depth: int) -> bool:
+        # Returns True for the first URL of a host
+        with self.condition:
+            key = self.host_key(url)
+            new_host = key not in self.hosts
+            host = self._host(key)
+
+            # Once a host has spilled, its later URLs follow it to disk to keep them in order
+            if self.store is not None and (host.spilled or self.hot_size >= self.hot_limit):
+                self.store.push(host.key, url, depth)
+                host.spilled += 1
+            else:
+                host.urls.append((url, depth))
+                self.hot_size += 1
+            self.size += 1
+            self._schedule(host)
+            return new_host
+
+    def get(self, timeout: Optional[float] = None) -> Optional[Tuple[str, int]]:
+        deadline = None if timeout is None else time.monotonic() + timeout
+
+        with self.condition:
+            while True:
+                now = time.monotonic()
+                wait = None
+                if self.ready and (not self.global_limit or len(self.in_flight) < self.global_limit):
+                    next_fetch, _, key = self.ready[0]
+                    if next_fetch <= now:
+                        heapq.heappop(self.ready)
+                        host = self.hosts[key]
+                        if host.next_fetch > now:
+                            # Deferred after it was scheduled
+                            host.scheduled = False
+                            self._schedule(host)
+                            continue
+                        item = self._dispatch(host, now)
+                        if item is not None:
+                            return item
+                        continue
+                    wait = next_fetch - now
+
+                if deadline is not None:
+                    remaining = deadline - now
+                    if remaining <= 0:
+                        return None
+                    wait = remaining if wait is None else min(wait, remaining)
+
+                self.condition.wait(wait)
+
+    def robots_loaded(self, url: str, crawl_delay: Optional[float], retry_in: float = 0) -> None:
+        # robots.txt of the host is in memory: with its Crawl-delay, or None if it
+        # could not be read, in which case the host waits until it is tried again
+        with self.condition:
+            host = self.hosts.get(self.host_key(url))
+            if host is None:
+                return
+            if retry_in:
+                host.next_fetch = max(host.next_fetch, time.monotonic() + retry_in)
+            host.robots_ready = True
+            if crawl_delay is not None:
+                self.set_crawl_delay(url, crawl_delay)
+            self._schedule(host)
+
+    def host_keys(self) -> List[str]:
+        with self.condition:
+            return list(self.hosts)
+
+    def set_crawl_delay(self, url: str, crawl_delay: float) -> None:
+        with self.condition:
+            host = self.hosts.get(self.host_key(url))
+            if host is None or host.delay_known:
+                return
+
+            host.robots_ready = True
+            host.delay_known = True
+            host.delay = host.base_delay = max(self.min_delay, crawl_delay)
+            # The delay spaces out the starts of requests, which bounds the request rate
+            # whatever the concurrency; only hosts whose robots.txt asks for a
+            # Crawl-delay are kept to one request at a time
+            host.serial = crawl_delay > 0
+            host.max_active = 1 if host.serial else self.host_concurrency
+            self.logger.debug(f"Host {host.key}: delay={host.delay}s, max_active={host.max_active}")
+            self._schedule(host)
+
+    def adjust_host(self, url: str, max_active: int, delay: float) -> Tuple[int, float]:
+        # Sets the limits chosen by adaptive control, kept within those from robots.txt;
+        # returns the limits applied
+        with self.condition:
+            host = self.hosts.get(self.host_key(url))
+            if host is None:
+                return max_active, delay
+            host.delay = max(host.base_delay, delay)
+            host.max_active = 1 if host.serial else max(1, max_active)
+            self._schedule(host)
+            return host.max_active, host.delay
+
+    def defer_host(self, url: str, seconds: float) -> None:
+        # No request to the host before the given time, e.g. after a Retry-After
+        with self.condition:
+            host = self.hosts.get(self.host_key(url))
+            if host is not None:
+                host.next_fetch = max(host.next_fetch, time.monotonic() + seconds)
+
+    def host_limits(self) -> Dict[str, Tuple[int, int, int, float]]:
+        # Queued URLs, active requests, request limit and delay of every host
+        with self.condition:
+            return {key: (len(host.urls) + host.spilled, host.active, host.max_active, host.delay)
+                    for key, host in self.hosts.items()}
+
+    def task_done(self, url: str) -> None:
+        with self.condition:
+            host = self.hosts.get(self.host_key(url))
+            self.in_flight.pop(url, None)
+            if host is not None:
+                host.active -= 1
+                self._schedule(host)
+            if self.global_limit:
+                # A slot below the global limit is free again
+                self.condition.notify()
+
+    def qsize(self) -> int:
+        with self.condition:
+            return self.size
+
+    def pending(self) -> int:
+        with self.condition:
+            return self.size + len(self.in_flight)
+
+    def host_count(self) -> int:
+        with self.condition:
+            return len(self.hosts)
+
+    def clear(self) -> None:
+        with self.condition:
+            self._reset()
+            if self.store is not None:
+                self.store.clear()
+
+    def checkpoint(self, meta: Optional[Dict[str, str]] = None, extra: Optional[List[Tuple[str, int]]] = None) -> None:
+        # extra: URLs held outside the frontier, such as those waiting for a retry
+        if self.store is None:
+            return
+
+        with self.condition:
+            snapshot = [item for host in self.hosts.values() for item in host.urls]
+            # Pages being fetched right now are fetched again after a resume
+            snapshot.extend(self.in_flight.items())
+            snapshot.extend(extra or ())
+            self.store.save_snapshot(snapshot)
+            for key, value in (meta or {}).items():
+                self.store.set_meta(key, value)
+            self.store.commit()
+            self.logger.debug(f"Frontier checkpoint: {len(snapshot)} URLs in memory, {self.size} queued")
+
+    def restore(self) -> None:
+        if self.store is None:
+            return
+
+        with self.condition:
+            self._reset()
+            for key, count in self.store.host_counts().items():
+                self._host(key).spilled += count
+                self.size += count
+
+            for url, depth in self.store.load_snapshot():
+                self._host(self.host_key(url)).urls.append((url, depth))
+                self.hot_size += 1
+                self.size += 1
+
+            for host in self.hosts.values():
+                self._schedule(host)
+            self.logger.info(f"Frontier restored: {self.size} URLs across {len(self.hosts)} hosts")
+
+    def _reset(self) -> None:
+        self.hosts.clear()
+        self.ready.clear()
+        self.size = 0
+        self.hot_size = 0
+        self.in_flight.clear()
+
+    def _host(self, key: str) -> HostQueue:
+        host = self.hosts.get(key)
+        if host is None:
+            # Not scheduled until its robots.txt has been read, then given its limits
+            host = HostQueue(key, self.min_delay, 1)
+            self.hosts[key] = host
+        return host
+
+    def _dispatch(self, host: HostQueue, now: float) -> Optional[Tuple[str, int]]:
+        host.scheduled = False
+        if not host.urls and host.spilled:
+            items = self.store.pop(host.key, self.refill_batch)
+            if not items:
+                self.logger.warning(f"Disk frontier has no URLs left for {host.key}")
+                self.size -= host.spilled
+                host.spilled = 0
+            else:
+                host.urls.extend(items)
+                host.spilled = max(0, host.spilled - len(items))
+                self.hot_size += len(items)
+        if not host.urls:
+            return None
+
+        url, depth = host.urls.popleft()
+        self.size -= 1
+        self.hot_size -= 1
+        self.in_flight[url] = depth
+        host.active += 1
+        host.next_fetch = now + host.delay
+        self._schedule(host)
+        return url, depth
+
+    def _schedule(self, host: HostQueue) -> None:
+        if host.scheduled or not host.robots_ready or not (host.urls or host.spilled) or host.active >= host.max_active:
+            return
+        host.scheduled = True
+        self.sequence += 1
+        heapq.heappush(self.ready, (host.next_fetch, self.sequence, host.key))
+        self.condition.notify()
@@ -0,0 +1,67 @@
+import logging
+import sqlite3
+from typing import Dict, List, Optional, Tuple
+
+
+# Disk side of the crawl frontier. Nothing is committed between checkpoints,
+# so after a crash the database rolls back to exactly the state of the last
+# checkpoint, matching the seen set saved alongside it.
+class SQLiteFrontierStore:
+    def __init__(self, path: str):
+        self.path = path
+        self.connection = sqlite3.connect(path, check_same_thread=False)
+        self.connection.execute("PRAGMA synchronous=NORMAL")
+        self.connection.execute(
+            "CREATE TABLE IF NOT EXISTS queued ("
+            "id INTEGER PRIMARY KEY AUTOINCREMENT, host TEXT NOT NULL, url TEXT NOT NULL, depth INTEGER NOT NULL)"
+        )
+        self.connection.execute("CREATE INDEX IF NOT EXISTS queued_host ON queued (host, id)")
+        # URLs held in memory (hot window and in-flight) at the last checkpoint
+        self.connection.execute(
+            "CREATE TABLE IF NOT EXISTS snapshot (url TEXT NOT NULL, depth INTEGER NOT NULL)"
+        )
+        self.connection.execute("CREATE TABLE IF NOT EXISTS meta (key TEXT PRIMARY KEY, value TEXT NOT NULL)")
+        self.connection.commit()
+        self.logger = logging.getLogger(__name__)
+
+    def push(self, host: str, url: str, depth: int) -> None:
+        self.connection.execute("INSERT INTO queued (host, url, depth) VALUES (?, ?, ?)", (host, url, depth))
+
+    def pop(self, host: str, limit: int) -> List[Tuple[str, int]]:
+        rows = self.connection.execute(
+            "SELECT id, url, depth FROM queued WHERE host = ? ORDER BY id LIMIT ?", (host, limit)
+        ).fetchall()
+        if rows:
+            self.connection.execute("DELETE FROM queued WHERE host = ? AND id <= ?", (host, rows[-1][0]))
+        return [(url, depth) for _, url, depth in rows]
+
+    def host_counts(self) -> Dict[str, int]:
+        return dict(self.connection.execute("SELECT host, COUNT(*) FROM queued GROUP BY host"))
+
+    def save_snapshot(self, items: List[Tuple[str, int]]) -> None:
+        self.connection.execute("DELETE FROM snapshot")
+        self.connection.executemany("INSERT INTO snapshot (url, depth) VALUES (?, ?)", items)
+
+    def load_snapshot(self) -> List[Tuple[str, int]]:
+        items = self.connection.execute("SELECT url, depth FROM snapshot").fetchall()
+        self.connection.execute("DELETE FROM snapshot")
+        return items
+
+    def set_meta(self, key: str, value: str) -> None:
+        self.connection.execute("INSERT OR REPLACE INTO meta (key, value) VALUES (?, ?)", (key, value))
+
+    def get_meta(self, key: str) -> Optional[str]:
+        row = self.connection.execute("SELECT value FROM meta WHERE key = ?", (key,)).fetchone()
+        return row[0] if row else None
+
+    def commit(self) -> None:
+        self.connection.commit()
+
+    def clear(self) -> None:
+        self.connection.execute("DELETE FROM queued")
+        self.connection.execute("DELETE FROM snapshot")
+        self.connection.execute("DELETE FROM meta")
+        self.connection.commit()
+
+    def close(self) -> None:
+        self.connection.close()
@@ -0,0 +1,166 @@
+import logging
+import threading
+import time
+from datetime import datetime, timezone
+from email.utils import parsedate_to_datetime
+from typing import Any, Dict, List, Optional
+
+from crawler.frontier import HostFrontier
+
+# Responses telling the crawler to slow down
+THROTTLE_STATUSES = (429, 503)
+
+
+def parse_retry_after(value: Optional[str]) -> Optional[float]:
+    # Retry-After is either a number of seconds or an HTTP date
+    if not value:
+        return None
+    value = value.strip()
+    if value.isdigit():
+        return float(value)
+    try:
+        when = parsedate_to_datetime(value)
+    except (TypeError, ValueError):
+        return None
+    if when.tzinfo is None:
+        when = when.replace(tzinfo=timezone.utc)
+    return max(0.0, (when - datetime.now(timezone.utc)).total_seconds())
+
+
+class HostState:
+    __slots__ = ("key", "window", "slow_start", "delay", "latency", "baseline", "requests", "throttled",
+                 "last_decrease")
+
+    def __init__(self, key: str, window: float, delay: float):
+        self.key = key
+        # Allowed parallel requests; fractional so additive increase can grow it by less than one
+        self.window = window
+        self.slow_start = True
+        self.delay = delay
+        self.latency: Optional[float] = None
+        # Lowest smoothed latency seen, taken as the host's unloaded latency
+        self.baseline: Optional[float] = None
+        self.requests = 0
+        self.throttled = 0
+        self.last_decrease = 0.0
+
+
+# Per-host additive-increase/multiplicative-decrease control of the frontier's
+# request limits. Each good response adds to a host's window (one per response
+# during slow start, then one per window of responses); latency well above the
+# host's baseline, timeouts and 429/503 responses halve it, at most once per
+# round trip. A host still throttling at one request at a time gets a delay
+# that doubles on each 429/503 and shrinks again with good responses.
+# Retry-After keeps the host idle for as long as it asks.
+class AdaptiveHostController:
+    def __init__(self, frontier: HostFrontier, max_concurrency: int = 8, enabled: bool = True,
+                 decrease: float = 0.5, latency_factor: float = 2.0, rate_increase: float = 0.25,
+                 max_delay: float = 60, max_retry_after: float = 600, alpha: float = 0.3):
+        self.frontier = frontier
+        self.max_concurrency = max_concurrency
+        self.enabled = enabled
+        self.decrease = decrease
+        self.latency_factor = latency_factor
+        self.rate_increase = rate_increase
+        self.max_delay = max_delay
+        self.max_retry_after = max_retry_after
+        self.alpha = alpha
+        self.hosts: Dict[str, HostState] = {}
+        self.lock = threading.Lock()
+        self.logger = logging.getLogger(__name__)
+
+    def configure(self, max_concurrency: int, enabled: bool = True) -> None:
+        with self.lock:
+            self.max_concurrency = max_concurrency
+            self.enabled = enabled
+            self.hosts.clear()
+
+    def record_response(self, url: str, status: int, latency: float, retry_after: Optional[str] = None) -> None:
+        with self.lock:
+            host = self._host(url)
+            host.requests += 1
+            if status in THROTTLE_STATUSES:
+                host.throttled += 1
+                wait = parse_retry_after(retry_after)
+                if wait is not None:
+                    wait = min(wait, self.max_retry_after)
+                    self.frontier.defer_host(url, wait)
+                    self.logger.warning(f"{host.key} answered {status}, waiting {wait:.0f}s as asked by Retry-After")
+                else:
+                    self.logger.warning(f"{host.key} answered {status}, slowing down")
+                self._decrease(host, latency, throttled=True)
+                return
+
+            host.latency = latency if host.latency is None else self.alpha * latency + (1 - self.alpha) * host.latency
+            if host.baseline is None or host.latency < host.baseline:
+                host.baseline = host.latency
+            if host.latency > host.baseline * self.latency_factor and host.latency - host.baseline > 0.05:
+                self._decrease(host, latency)
+            else:
+                self._increase(host)
+
+    def record_timeout(self, url: str, elapsed: float) -> None:
+        with self.lock:
+            host = self._host(url)
+            host.requests += 1
+            self._decrease(host, elapsed)
+
+    def snapshot(self, limit: int = 20) -> List[Dict[str, Any]]:
+        # The busiest hosts, for display
+        queued = self.frontier.host_limits()
+        with self.lock:
+            rows = []
+            for key, (waiting, active, max_active, delay) in queued.items():
+                host = self.hosts.get(key)
+                rows.append({
+                    "host": key,
+                    "queued": waiting,
+                    "active": active,
+                    "limit": max_active,
+                    "delay": delay,
+                    "latency": host.latency if host else None,
+                    "requests": host.requests if host else 0,
+                    "throttled": host.throttled if host else 0
+                })
+        rows.sort(key=lambda row: (row["active"], row["queued"], row["requests"]), reverse=True)
+        return rows[:limit]
+
+    def _host(self, url: str) -> HostState:
+        key = self.frontier.host_key(url)
+        host = self.hosts.get(key)
+        if host is None:
+            host = HostState(key, 1.0, 0.0)
+            self.hosts[key] = host
+        return host
+
+    def _increase(self, host: HostState) -> None:
+        if not self.enabled:
+            return
+        if host.slow_start:
+            host.window += 1
+        else:
+            host.window += 1 / host.window
+        host.window = min(host.window, float(self.max_concurrency))
+        if host.delay:
+            # Additive increase of the request rate
+            rate = 1 / host.delay + self.rate_increase
+            host.delay = 1 / rate if 1 / rate > 0.01 else 0.0
+        self._apply(host)
+
+    def _decrease(self, host: HostState, latency: float, throttled: bool = False) -> None:
+        if not self.enabled:
+            return
+        host.slow_start = False
+        now = time.monotonic()
+        # Requests sent before the last decrease say nothing about the new limits
+        if now - latency < host.last_decrease:
+            return
+        host.last_decrease = now
+        if throttled and host.window < 2:
+            host.delay = min(self.max_delay, max(host.delay * 2, 0.5))
+        host.window = max(1.0, host.window * self.decrease)
+        self._apply(host)
+        self.logger.info(f"{host.key}: limit lowered to {int(host.window)} requests, delay {host.delay:.2f}s")
+
+    def _apply(self, host: HostState) -> None:
+        _, host.delay = self.frontier.adjust_host(host.key, int(host.window), host.delay)
@@ -0,0 +1,100 @@
+import hashlib
+import json
+import logging
+import sqlite3
+import threading
+from typing import Dict, Optional
+
+from crawler.extractor import ExtractedPage
+
+
+def content_hash(content: bytes) -> str:
+    return hashlib.blake2b(content, digest_size=16).hexdigest()
+
+
+class CachedPage:
+    def __init__(self, etag: Optional[str], last_modified: Optional[str], content_hash: str, size: int,
+                 page: ExtractedPage):
+        self.etag = etag
+        self.last_modified = last_modified
+        self.content_hash = content_hash
+        self.size = size
+        self.page = page
+
+    def conditional_headers(self) -> Dict[str, str]:
+        headers = {}
+        if self.etag:
+            headers["If-None-Match"] = self.etag
+        if self.last_modified:
+            headers["If-Modified-Since"] = self.last_modified
+        return headers
+
+
+# Validators and extracted links of previously fetched pages, keyed by
+# canonical URL. A recrawl sends conditional requests from it and reuses the
+# stored links when the server answers 304 or the body hash is unchanged.
+# Writes are committed in batches; close() commits the rest.
+class HttpCache:
+    def __init__(self, path: str, commit_every: int = 200):
+        self.path = path
+        self.commit_every = commit_every
+        self.uncommitted = 0
+        self.lock = threading.Lock()
+        self.connection = sqlite3.connect(path, check_same_thread=False)
+        self.connection.execute("PRAGMA journal_mode=WAL")
+        self.connection.execute("PRAGMA synchronous=NORMAL")
+        self.connection.execute(
+            "CREATE TABLE IF NOT EXISTS pages ("
+            "url TEXT PRIMARY KEY, etag TEXT, last_modified TEXT, content_hash TEXT NOT NULL, "
+            "size INTEGER NOT NULL, title TEXT NOT NULL, links TEXT NOT NULL, "
+            "nofollow INTEGER NOT NULL, noindex INTEGER NOT NULL, text_hash TEXT, simhash TEXT)"
+        )
+        self.connection.commit()
+        self.logger = logging.getLogger(__name__)
+
+    def get(self, url: str) -> Optional[CachedPage]:
+        with self.lock:
+            row = self.connection.execute(
+                "SELECT etag, last_modified, content_hash, size, title, links, nofollow, noindex, text_hash, simhash "
+                "FROM pages WHERE url = ?", (url,)
+            ).fetchone()
+        if row is None:
+            return None
+        etag, last_modified, digest, size, title, links, nofollow, noindex, text_hash, simhash = row
+        page = ExtractedPage(
+            title=title,
+            links=[tuple(link) for link in json.loads(links)],
+            nofollow=bool(nofollow),
+            noindex=bool(noindex),
+            text_hash=text_hash,
+            # Stored as hex, since SQLite integers are signed 64-bit
+            simhash=int(simhash, 16) if simhash else None
+        )
+        return CachedPage(etag, last_modified, digest, size, page)
+
+    def put(self, url: str, etag: Optional[str], last_modified: Optional[str], digest: str, size: int,
+            page: ExtractedPage) -> None:
+        links = json.dumps(page.links, ensure_ascii=False)
+        simhash = f"{page.simhash:016x}" if page.simhash is not None else None
+        with self.lock:
+            self.connection.execute(
+                "INSERT OR REPLACE INTO pages "
+                "(url, etag, last_modified, content_hash, size, title, links, nofollow, noindex, text_hash, simhash) "
+                "VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)",
+                (url, etag, last_modified, digest, size, page.title, links, int(page.nofollow), int(page.noindex),
+                 page.text_hash, simhash)
+            )
+            self.uncommitted += 1
+            if self.uncommitted >= self.commit_every:
+                self.connection.commit()
+                self.uncommitted = 0
+
+    def commit(self) -> None:
+        with self.lock:
+            self.connection.commit()
+            self.uncommitted = 0
+
+    def close(self) -> None:
+        with self.lock:
+            self.connection.commit()
+            self.connection.close()
@@ -0,0 +1,140 @@
+import logging
+import time
+from typing import Callable, Optional
+
+import requests
+from requests.adapters import HTTPAdapter
+from urllib3 import PoolManager
+from urllib3.connectionpool import HTTPConnectionPool, HTTPSConnectionPool
+
+try:
+    import brotli  # noqa: F401 - lets urllib3 decode brotli responses
+    ACCEPT_ENCODING = "gzip, deflate, br"
+except ImportError:
+    try:
+        import brotlicffi  # noqa: F401
+        ACCEPT_ENCODING = "gzip, deflate, br"
+    except ImportError:
+        ACCEPT_ENCODING = "gzip, deflate"
+
+# Responses through a proxy that count against it: rejected credentials, or
+# the proxy failing to reach the site (bad gateway, gateway timeout)
+PROXY_FAILURE_STATUSES = (407, 502, 504)
+
+
+class _CountingHTTPConnectionPool(HTTPConnectionPool):
+    connection_listener: Optional[Callable[[], None]] = None
+
+    def _new_conn(self):
+        if self.connection_listener:
+            self.connection_listener()
+        return super()._new_conn()
+
+
+class _CountingHTTPSConnectionPool(HTTPSConnectionPool):
+    connection_listener: Optional[Callable[[], None]] = None
+
+    def _new_conn(self):
+        if self.connection_listener:
+            self.connection_listener()
+        return super()._new_conn()
+
+
+class _CountingPoolManager(PoolManager):
+    def __init__(self, *args, connection_listener: Optional[Callable[[], None]] = None, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.connection_listener = connection_listener
+        self.pool_classes_by_scheme = {
+            "http": _CountingHTTPConnectionPool,
+            "https": _CountingHTTPSConnectionPool
+        }
+
+    def _new_pool(self, scheme, host, port, request_context=None):
+        pool = super()._new_pool(scheme, host, port, request_context)
+        pool.connection_listener = self.connection_listener
+        return pool
+
+
+class _CountingAdapter(HTTPAdapter):
+    def __init__(self, connection_listener: Optional[Callable[[], None]] = None, **kwargs):
+        # HTTPAdapter.__init__ builds the pool manager, so the listener must exist first
+        self.connection_listener = connection_listener
+        super().__init__(**kwargs)
+
+    def init_poolmanager(self, connections, maxsize, block=False, **pool_kwargs):
+        self._pool_connections = connections
+        self._pool_maxsize = maxsize
+        self._pool_block = block
+        self.poolmanager = _CountingPoolManager(
+            num_pools=connections,
+            maxsize=maxsize,
+            block=block,
+            connection_listener=self.connection_listener,
+            **pool_kwargs
+        )
+
+
+class HttpSession:
+    def __init__(self, user_agent: str = "PythonWebCrawler/1.0", pool_connections: int = 100,
+                 pool_maxsize: int = 10, keep_alive: bool = True, timeout: float = 10, stats=None):
+        self.timeout = timeout
+        self.stats = stats
+        # Set to a ProxyManager to route requests through its proxies
+        self.proxy_manager = None
+        self.session = requests.Session()
+        self.logger = logging.getLogger(__name__)
+        self.configure(user_agent, pool_connections, pool_maxsize, keep_alive)
+
+    def configure(self, user_agent: str, pool_connections: int = 100, pool_maxsize: int = 10,
+                  keep_alive: bool = True) -> None:
+        self.pool_connections = pool_connections
+        self.pool_maxsize = pool_maxsize
+        self.keep_alive = keep_alive
+
+        # Mounting replaces the previous adapters, which are closed along with their pools
+        for prefix in ("http://", "https://"):
+            old_adapter = self.session.adapters.get(prefix)
+            adapter = _CountingAdapter(
+                connection_listener=self._on_new_connection,
+                pool_connections=pool_connections,
+                pool_maxsize=pool_maxsize
+            )
+            self.session.mount(prefix, adapter)
+            if old_adapter:
+                old_adapter.close()
+
+        self.session.headers.update({
+            "User-Agent": user_agent,
+            "Accept-Encoding": ACCEPT_ENCODING,
+            "Connection": "keep-alive" if keep_alive else "close"
+        })
+        self.logger.debug(f"HTTP session configured: pool_maxsize={pool_maxsize}, keep_alive={keep_alive}")
+
+    def _on_new_connection(self) -> None:
+        if self.stats:
+            self.stats.increment_connections_opened()
+
+    def get(self, url: str, **kwargs) -> requests.Response:
+        kwargs.setdefault("timeout", self.timeout)
+        if self.stats:
+            self.stats.increment_http_requests()
+
+        # Requests that name their own proxies (e.g. proxy health checks) go as they are
+        proxy = self.proxy_manager.get_proxy() if self.proxy_manager and "proxies" not in kwargs else None
+        if proxy is None:
+            return self.session.get(url, **kwargs)
+
+        started = time.monotonic()
+        try:
+            response = self.session.get(url, proxies=proxy.proxies, **kwargs)
+        except (requests.ConnectionError, requests.Timeout):
+            self.proxy_manager.record_failure(proxy)
+            raise
+        if response.status_code in PROXY_FAILURE_STATUSES:
+            self.proxy_manager.record_failure(proxy)
+        else:
+            self.proxy_manager.record_success(proxy, time.monotonic() - started)
+        return response
+
+    def close(self) -> None:
+        self.session.close()
@@ -0,0 +1,254 @@
+import logging
+import math
+import threading
+import time
+from array import array
+from collections import deque
+from typing import Any, Callable, Dict, Iterable, List, Optional, Tuple
+
+# Histogram buckets grow by 2**(1/4), about 19% each, from 0.1 ms to about 2 minutes
+BUCKET_FACTOR = 2 ** 0.25
+BUCKET_MIN = 0.0001
+BUCKET_COUNT = 82
+QUANTILES = (0.5, 0.95, 0.99)
+
+
+class ThreadShards:
+    # One private shard per thread, created on the thread's first update. A
+    # shard is only written by its own thread, so updates take no lock; reads
+    # add up all shards and may miss an update in flight.
+    def __init__(self, factory: Callable[[], Any]):
+        self.factory = factory
+        self.local = threading.local()
+        self.shards: List[Any] = []
+        self.lock = threading.Lock()
+
+    def get(self) -> Any:
+        try:
+            return self.local.shard
+        except AttributeError:
+            shard = self.local.shard = self.factory()
+            with self.lock:
+                self.shards.append(shard)
+            return shard
+
+    def all(self) -> List[Any]:
+        with self.lock:
+            return list(self.shards)
+
+
+class ShardedCounter:
+    def __init__(self):
+        self.shards = ThreadShards(lambda: [0])
+        self.base = 0
+
+    def add(self, amount: int = 1) -> None:
+        self.shards.get()[0] += amount
+
+    def value(self) -> int:
+        return self.base + sum(shard[0] for shard in self.shards.all())
+
+    def set(self, value: int) -> None:
+        # Starts over with fresh shards, dropping those of finished threads; only
+        # meant for the start of a session, as updates made meanwhile can be lost
+        self.shards = ThreadShards(self.shards.factory)
+        self.base = value
+
+
+# Log-bucketed histogram: each bucket covers values up to BUCKET_FACTOR times
+# its lower bound, so a quantile is known to within about 10% at any scale.
+class Histogram:
+    def __init__(self):
+        self.shards = ThreadShards(lambda: [array('q', bytes(8 * BUCKET_COUNT)), 0.0])
+
+    @staticmethod
+    def bucket(value: float) -> int:
+        if value <= BUCKET_MIN:
+            return 0
+        return min(BUCKET_COUNT - 1, int(math.log(value / BUCKET_MIN, BUCKET_FACTOR)) + 1)
+
+    @staticmethod
+    def upper_bound(bucket: int) -> float:
+        return BUCKET_MIN * BUCKET_FACTOR ** bucket
+
+    def observe(self, value: float) -> None:
+        shard = self.shards.get()
+        shard[0][self.bucket(value)] += 1
+        shard[1] += value
+
+    def snapshot(self) -> Tuple[List[int], float]:
+        counts = [0] * BUCKET_COUNT
+        total = 0.0
+        for shard in self.shards.all():
+            for i, count in enumerate(shard[0]):
+                counts[i] += count
+            total += shard[1]
+        return counts, total
+
+    def reset(self) -> None:
+        self.shards = ThreadShards(self.shards.factory)
+
+    @classmethod
+    def quantiles(cls, counts: List[int], quantiles=QUANTILES) -> List[float]:
+        # Geometric middle of the bucket holding each quantile; 0 without samples
+        observed = sum(counts)
+        results = []
+        for quantile in quantiles:
+            if not observed:
+                results.append(0.0)
+                continue
+            rank = quantile * observed
+            seen = 0
+            for i, count in enumerate(counts):
+                seen += count
+                if seen >= rank and count:
+                    results.append(cls.upper_bound(i) / BUCKET_FACTOR ** 0.5)
+                    break
+        return results
+
+
+# Rate over the last `window` seconds of a counter, from totals sampled once a
+# second by the stats monitor rather than from the threads doing the counting
+class SlidingRate:
+    def __init__(self, window: float = 10):
+        self.window = window
+        self.samples = deque()
+
+    def sample(self, total: float, now: Optional[float] = None) -> None:
+        now = time.monotonic() if now is None else now
+        self.samples.append((now, total))
+        while len(self.samples) > 2 and now - self.samples[1][0] >= self.window:
+            self.samples.popleft()
+
+    def rate(self) -> float:
+        if len(self.samples) < 2:
+            return 0.0
+        (start, first), (end, last) = self.samples[0], self.samples[-1]
+        return (last - first) / (end - start) if end > start else 0.0
+
+    def clear(self) -> None:
+        self.samples.clear()
+
+
+# Pages, bytes, errors and fetch time per host, kept in per-thread dictionaries
+class HostMetrics:
+    def __init__(self):
+        self.shards = ThreadShards(dict)
+
+    def record(self, host: str, pages: int = 0, size: int = 0, errors: int = 0,
+               latency: Optional[float] = None) -> None:
+        shard = self.shards.get()
+        row = shard.get(host)
+        if row is None:
+            row = shard[host] = [0, 0, 0, 0.0, 0]
+        row[0] += pages
+        row[1] += size
+        row[2] += errors
+        if latency is not None:
+            row[3] += latency
+            row[4] += 1
+
+    def top(self, limit: int = 10, key: str = "pages") -> List[Dict[str, Any]]:
+        merged: Dict[str, list] = {}
+        for shard in self.shards.all():
+            for host, row in list(shard.items()):
+                total = merged.setdefault(host, [0, 0, 0, 0.0, 0])
+                for i, value in enumerate(row):
+                    total[i] += value
+        rows = [{
+            "host": host,
+            "pages": pages,
+            "bytes": size,
+            "errors": errors,
+            "latency": latency / fetches if fetches else None
+        } for host, (pages, size, errors, latency, fetches) in merged.items()]
+        rows.sort(key=lambda row: row[key] or 0, reverse=True)
+        return rows[:limit]
+
+    def reset(self) -> None:
+        self.shards = ThreadShards(dict)
+
+
+def _metric_name(name: str) -> str:
+    return "crawler_" + "".join(c if c.isalnum() else "_" for c in name)
+
+
+def prometheus_text(stats: Dict[str, Any], histograms: Dict[str, Tuple[List[int], float]],
+                    hosts: List[Dict[str, Any]], counters: Iterable[str] = (),
+                    stages: Iterable[Dict[str, Any]] = ()) -> str:
+    # Prometheus text exposition format: numeric stats as gauges, or as counters
+    # for those named in counters, latency histograms with a cumulative bucket
+    # at every doubling, per-host series and traced time per stage
+    counters = set(counters)
+    lines = []
+    for name, value in stats.items():
+        if isinstance(value, bool) or not isinstance(value, (int, float)):
+            continue
+        if name in counters:
+            metric = _metric_name(f"{name}_total")
+            lines.append(f"# TYPE {metric} counter")
+        else:
+            metric = _metric_name(name)
+            lines.append(f"# TYPE {metric} gauge")
+        lines.append(f"{metric} {value}")
+    for name, (counts, total) in histograms.items():
+        metric = _metric_name(f"{name}_seconds")
+        lines.append(f"# TYPE {metric} histogram")
+        cumulative = 0
+        for i, count in enumerate(counts):
+            cumulative += count
+            if i % 4 == 0:
+                lines.append(f'{metric}_bucket{{le="{Histogram.upper_bound(i):.6g}"}} {cumulative}')
+        lines.append(f'{metric}_bucket{{le="+Inf"}} {cumulative}')
+        lines.append(f"{metric}_sum {total}")
+        lines.append(f"{metric}_count {cumulative}")
+    for field in ("pages", "bytes", "errors"):
+        metric = _metric_name(f"host_{field}")
+        lines.append(f"# TYPE {metric} gauge")
+        for row in hosts:
+            host = row["host"].replace("\\", "\\\\").replace('"', '\\"')
+            lines.append(f'{metric}{{host="{host}"}} {row[field]}')
+    stages = list(stages)
+    if stages:
+        lines.append("# TYPE crawler_stage_seconds_total counter")
+        for row in stages:
+            lines.append(f'crawler_stage_seconds_total{{stage="{row["stage"]}"}} {row["seconds"]}')
+        lines.append("# TYPE crawler_stage_calls_total counter")
+        for row in stages:
+            lines.append(f'crawler_stage_calls_total{{stage="{row["stage"]}"}} {row["count"]}')
+    return "\n".join(lines) + "\n"
+
+
+# Serves /metrics in Prometheus text format on a local port from a daemon thread
+class MetricsServer:
+    def __init__(self, render: Callable[[], str], port: int, host: str = "127.0.0.1"):
+        # Imported when a port is set; the module is otherwise light enough for the GUI's startup
+        from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+        self.logger = logging.getLogger(__name__)
+        render_metrics = render
+
+        class Handler(BaseHTTPRequestHandler):
+            def do_GET(self):
+                if self.path.split("?")[0] != "/metrics":
+                    self.send_error(404)
+                    return
+                body = render_metrics().encode("utf-8")
+                self.send_response(200)
+                self.send_header("Content-Type", "text/plain; version=0.0.4; charset=utf-8")
+                self.send_header("Content-Length", str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+            def log_message(self, format, *args):
+                pass
+
+        self.server = ThreadingHTTPServer((host, port), Handler)
+        self.server.daemon_threads = True
+        self.port = self.server.server_address[1]
+        threading.Thread(target=self.server.serve_forever, daemon=True).start()
+        self.logger.info(f"Serving metrics on http://{host}:{self.port}/metrics")
+
+    def close(self) -> None:
+        self.server.shutdown()
+        self.server.server_close()
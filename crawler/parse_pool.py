@@ -0,0 +1,133 @@
+import logging
+import multiprocessing
+import queue
+import threading
+from concurrent.futures import Future, InvalidStateError, ProcessPoolExecutor
+from typing import List, Optional, Tuple
+
+from crawler.extractor import ExtractedPage, create_extractor, decode_content
+
+_extractor = None
+
+
+def _init_worker(backend: str, fingerprints: bool) -> None:
+    global _extractor
+    _extractor = create_extractor(backend, fingerprints)
+
+
+def _parse_batch(batch: List[Tuple[str, bytes, str]]) -> List[Tuple[Optional[ExtractedPage], Optional[str]]]:
+    results = []
+    for url, content, encoding in batch:
+        try:
+            results.append((_extractor.extract(url, decode_content(content, encoding)), None))
+        except Exception as e:
+            results.append((None, f"{type(e).__name__}: {str(e)}"))
+    return results
+
+
+# Parses pages in worker processes so HTML parsing is not limited to one core
+# by the GIL. Fetch workers submit raw bytes and get a Future for the
+# ExtractedPage. Submissions are sent to the pool in batches: a batch goes out
+# as soon as a pool slot is free, so batches only grow while every process is
+# busy and an idle pool adds no waiting.
+class ParsePool:
+    def __init__(self, workers: int, backend: str = "auto", fingerprints: bool = False, batch_size: int = 32,
+                 stats=None):
+        self.workers = workers
+        self.batch_size = batch_size
+        self.stats = stats
+        self.executor = ProcessPoolExecutor(
+            max_workers=workers,
+            mp_context=multiprocessing.get_context("spawn"),
+            initializer=_init_worker,
+            initargs=(backend, fingerprints)
+        )
+        self.queue: "queue.Queue" = queue.Queue()
+        # Two batches per process, so the next batch is ready when one finishes
+        self.slots = threading.Semaphore(workers * 2)
+        self.pending = 0
+        self.lock = threading.Lock()
+        self.logger = logging.getLogger(__name__)
+        self.thread = threading.Thread(target=self._batch_loop, daemon=True)
+        self.thread.start()
+
+    def submit(self, url: str, content: bytes, encoding: Optional[str]) -> Future:
+        future = Future()
+        self._add_pending(1)
+        self.queue.put((url, content, encoding, future))
+        return future
+
+    def parse(self, url: str, content: bytes, encoding: Optional[str]) -> ExtractedPage:
+        return self.submit(url, content, encoding).result()
+
+    def shutdown(self) -> None:
+        self.queue.put(None)
+        self.thread.join()
+        self.executor.shutdown(wait=True)
+
+    def _add_pending(self, count: int) -> None:
+        with self.lock:
+            self.pending += count
+            if self.stats:
+                self.stats.update_parse_queue(self.pending)
+
+    def _batch_loop(self) -> None:
+        stopping = False
+        while not stopping:
+            item = self.queue.get()
+            if item is None:
+                break
+            self.slots.acquire()
+
+            batch = [item]
+            while len(batch) < self.batch_size:
+                try:
+                    item = self.queue.get_nowait()
+                except queue.Empty:
+                    break
+                if item is None:
+                    stopping = True
+                    break
+                batch.append(item)
+
+            futures = [future for _, _, _, future in batch]
+            try:
+                result = self.executor.submit(_parse_batch, [(url, content, encoding) for url, content, encoding, _ in batch])
+            except RuntimeError as e:
+                self._deliver_error(futures, e)
+                continue
+            result.add_done_callback(lambda done, futures=futures: self._deliver(done, futures))
+
+        # Wait for the batches already sent to the pool
+        for _ in range(self.workers * 2):
+            self.slots.acquire()
+
+    def _deliver(self, done: Future, futures: List[Future]) -> None:
+        try:
+            results = done.result()
+        except Exception as e:
+            self.logger.error(f"Parse batch failed: {str(e)}")
+            self._deliver_error(futures, e)
+            return
+
+        for future, (page, error) in zip(futures, results):
+            self._resolve(future, page, RuntimeError(error) if error else None)
+        self.slots.release()
+        self._add_pending(-len(futures))
+
+    def _deliver_error(self, futures: List[Future], error: Exception) -> None:
+        for future in futures:
+            self._resolve(future, None, error)
+        self.slots.release()
+        self._add_pending(-len(futures))
+
+    @staticmethod
+    def _resolve(future: Future, page: Optional[ExtractedPage], error: Optional[Exception]) -> None:
+        # The caller may have cancelled the future, e.g. an asyncio task stopped mid-crawl
+        try:
+            if error:
+                future.set_exception(error)
+            else:
+                future.set_result(page)
+        except InvalidStateError:
+            pass
@@ -1,50 +1,183 @@
-import requests
-from typing import Optional, Dict, List
-import random
 import logging
-from queue import Queue
+import random
+import threading
 import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import Dict, Iterable, List, Optional
+
+from crawler.http_session import HttpSession
+
+CLOSED = "closed"
+OPEN = "open"
+HALF_OPEN = "half-open"
+# A trial request that never reports back frees the proxy for another trial after this long
+TRIAL_TIMEOUT = 60
+
+
+# Health of one proxy. Latency and error rate are exponentially weighted moving
+# averages, so recent requests count most. The circuit breaker opens after
+# consecutive failures, quarantining the proxy for a cooldown that doubles each
+# time a trial request after it fails again.
+class Proxy:
+    def __init__(self, url: str):
+        self.url = url
+        self.proxies = {"http": url, "https": url}
+        self.latency: Optional[float] = None
+        self.error_rate = 0.0
+        self.failures = 0
+        self.requests = 0
+        self.state = CLOSED
+        self.open_until = 0.0
+        self.cooldown = 0.0
+
+    def weight(self) -> float:
+        # Fast, reliable proxies are picked most; an unmeasured one gets an average chance
+        latency = self.latency if self.latency is not None else 1.0
+        return max(1.0 - self.error_rate, 0.05) / max(latency, 0.05)
 
 
 class ProxyManager:
-    def __init__(self):
-        self.proxies: List[Dict[str, str]] = []
-        self.active_proxies = Queue()
+    def __init__(self, http_session: Optional[HttpSession] = None, check_url: Optional[str] = None,
+                 alpha: float = 0.3, failure_threshold: int = 3, cooldown: float = 30,
+                 max_cooldown: float = 600, check_workers: int = 16, check_timeout: float = 5):
+        self.http_session = http_session or HttpSession()
+        self.check_url = check_url
+        self.alpha = alpha
+        self.failure_threshold = failure_threshold
+        self.base_cooldown = cooldown
+        self.max_cooldown = max_cooldown
+        self.check_workers = check_workers
+        self.check_timeout = check_timeout
+        self.proxies: List[Proxy] = []
+        self.lock = threading.Lock()
+        self.checks_stopped: Optional[threading.Event] = None
         self.logger = logging.getLogger(__name__)
 
+    def configure(self, check_url: Optional[str], cooldown: float = 30) -> None:
+        self.check_url = check_url
+        self.base_cooldown = cooldown
+
     def add_proxy(self, proxy: str, proxy_type: str = "http") -> None:
-        proxy_dict = {
-            "http": f"{proxy_type}://{proxy}",
-            "https": f"{proxy_type}://{proxy}"
-        }
-        self.proxies.append(proxy_dict)
-        self.active_proxies.put(proxy_dict)
-
-    def get_proxy(self) -> Optional[Dict[str, str]]:
-        if self.active_proxies.empty():
-            # Refill the queue if empty
+        # "host:port" uses proxy_type; "socks5://host:port" keeps its own scheme
+        url = proxy if "://" in proxy else f"{proxy_type}://{proxy}"
+        with self.lock:
+            if all(existing.url != url for existing in self.proxies):
+                self.proxies.append(Proxy(url))
+
+    def set_proxies(self, proxies: Iterable[str], proxy_type: str = "http") -> None:
+        with self.lock:
+            self.proxies = []
+        for proxy in proxies:
+            if proxy.strip():
+                self.add_proxy(proxy.strip(), proxy_type)
+
+    def remove_proxy(self, proxy: Proxy) -> None:
+        with self.lock:
+            if proxy in self.proxies:
+                self.proxies.remove(proxy)
+
+    def __len__(self) -> int:
+        return len(self.proxies)
+
+    def get_proxy(self) -> Optional[Proxy]:
+        # Weighted random pick among healthy proxies. A quarantined proxy whose
+        # cooldown has passed is handed out for a single trial request.
+        now = time.monotonic()
+        with self.lock:
+            if not self.proxies:
+                return None
+            healthy = []
             for proxy in self.proxies:
-                self.active_proxies.put(proxy)
+                if proxy.state != CLOSED and now >= proxy.open_until:
+                    self._start_trial(proxy, now)
+                    return proxy
+                if proxy.state == CLOSED:
+                    healthy.append(proxy)
+            if healthy:
+                return random.choices(healthy, weights=[proxy.weight() for proxy in healthy])[0]
+            # Everything is quarantined: use the proxy that comes back first rather than
+            # fetching directly, which would expose the crawler's own address
+            return min(self.proxies, key=lambda proxy: proxy.open_until)
+
+    @staticmethod
+    def _start_trial(proxy: Proxy, now: float) -> None:
+        proxy.state = HALF_OPEN
+        proxy.open_until = now + TRIAL_TIMEOUT
 
-        if not self.active_proxies.empty():
-            return self.active_proxies.get()
-        return None
+    def record_success(self, proxy: Proxy, latency: float) -> None:
+        with self.lock:
+            proxy.requests += 1
+            proxy.latency = latency if proxy.latency is None else self.alpha * latency + (1 - self.alpha) * proxy.latency
+            proxy.error_rate = (1 - self.alpha) * proxy.error_rate
+            proxy.failures = 0
+            if proxy.state != CLOSED:
+                self.logger.info(f"Proxy {proxy.url} recovered")
+                proxy.state = CLOSED
+                proxy.cooldown = 0.0
 
-    def return_proxy(self, proxy: Dict[str, str]) -> None:
-        self.active_proxies.put(proxy)
+    def record_failure(self, proxy: Proxy, quarantine: bool = False) -> None:
+        # quarantine opens the breaker at once, for failures that are not transient
+        with self.lock:
+            proxy.requests += 1
+            proxy.error_rate = self.alpha + (1 - self.alpha) * proxy.error_rate
+            proxy.failures += 1
+            if proxy.state == HALF_OPEN or (proxy.state == CLOSED and (quarantine or proxy.failures >= self.failure_threshold)):
+                proxy.cooldown = min(proxy.cooldown * 2 if proxy.cooldown else self.base_cooldown, self.max_cooldown)
+                proxy.open_until = time.monotonic() + proxy.cooldown
+                proxy.state = OPEN
+                self.logger.warning(f"Proxy {proxy.url} quarantined for {proxy.cooldown:.0f}s after {proxy.failures} failures")
 
-    def test_proxy(self, proxy: Dict[str, str]) -> bool:
+    def healthy_count(self) -> int:
+        with self.lock:
+            return sum(1 for proxy in self.proxies if proxy.state == CLOSED)
+
+    def test_proxy(self, proxy: Proxy) -> bool:
+        started = time.monotonic()
         try:
-            response = requests.get(
-                "http://www.google.com",
-                proxies=proxy,
-                timeout=10
-            )
-            return response.status_code == 200
+            response = self.http_session.get(self.check_url, proxies=proxy.proxies, timeout=self.check_timeout)
+            if response.status_code == 200:
+                self.record_success(proxy, time.monotonic() - started)
+                return True
+            self.logger.warning(f"Proxy test for {proxy.url} returned HTTP {response.status_code}")
         except Exception as e:
-            self.logger.warning(f"Proxy test failed: {str(e)}")
-            return False
+            self.logger.warning(f"Proxy test failed for {proxy.url}: {str(e)}")
+        # The check URL is expected to always answer, so one failed check is enough
+        self.record_failure(proxy, quarantine=True)
+        return False
+
+    def check_proxies(self, proxies: Optional[List[Proxy]] = None) -> Dict[str, bool]:
+        # Tests the proxies concurrently against the check URL
+        if not self.check_url:
+            return {}
+        with self.lock:
+            proxies = list(self.proxies if proxies is None else proxies)
+        if not proxies:
+            return {}
+        with ThreadPoolExecutor(max_workers=min(self.check_workers, len(proxies))) as executor:
+            results = list(executor.map(self.test_proxy, proxies))
+        return {proxy.url: result for proxy, result in zip(proxies, results)}
+
+    def start_health_checks(self, interval: float = 10) -> None:
+        # Checks every proxy once, then probes quarantined proxies as their cooldowns
+        # expire so they return to service without risking crawl requests
+        if not self.check_url or not self.proxies or self.checks_stopped:
+            return
+        self.checks_stopped = threading.Event()
+        threading.Thread(target=self._health_loop, args=(interval, self.checks_stopped), daemon=True).start()
+
+    def stop_health_checks(self) -> None:
+        if self.checks_stopped:
+            self.checks_stopped.set()
+            self.checks_stopped = None
 
-    def remove_proxy(self, proxy: Dict[str, str]) -> None:
-        if proxy in self.proxies:
-            self.proxies.remove(proxy)
+    def _health_loop(self, interval: float, stopped: threading.Event) -> None:
+        results = self.check_proxies()
+        self.logger.info(f"Proxy check: {sum(results.values())} of {len(results)} proxies healthy")
+        while not stopped.wait(interval):
+            now = time.monotonic()
+            with self.lock:
+                due = [proxy for proxy in self.proxies if proxy.state != CLOSED and now >= proxy.open_until]
+                for proxy in due:
+                    self._start_trial(proxy, now)
+            if due:
+                self.check_proxies(due)
@@ -0,0 +1,153 @@
+import heapq
+import logging
+import random
+import socket
+import ssl
+import threading
+import time
+from typing import Dict, List, Optional, Tuple
+
+from crawler.frontier import HostFrontier
+
+ERROR_KINDS = ("dns", "connect", "timeout", "tls", "http_4xx", "http_5xx", "other")
+# Kinds that may succeed on a later attempt; a failed TLS handshake or a 404 will not
+RETRYABLE_KINDS = frozenset(("dns", "connect", "timeout", "http_5xx"))
+RETRYABLE_STATUSES = frozenset((408, 429))
+
+
+def _error_chain(error: BaseException) -> List[BaseException]:
+    chain = []
+    while error is not None and error not in chain:
+        chain.append(error)
+        error = error.__cause__ or error.__context__
+    return chain
+
+
+def _status_of(error: BaseException) -> Optional[int]:
+    # requests' HTTPError carries the response, aiohttp's ClientResponseError the status
+    response = getattr(error, "response", None)
+    status = getattr(response, "status_code", None) or getattr(error, "status", None)
+    return status if isinstance(status, int) and status >= 400 else None
+
+
+def status_kind(status: int) -> str:
+    return "http_5xx" if status >= 500 else "http_4xx"
+
+
+def classify_error(error: BaseException) -> str:
+    # Looks through the whole exception chain, since HTTP libraries wrap the
+    # socket and ssl errors that tell the kinds apart
+    chain = _error_chain(error)
+    if any(isinstance(e, (ssl.SSLError, ssl.CertificateError)) for e in chain):
+        return "tls"
+    if any(isinstance(e, socket.gaierror) for e in chain):
+        return "dns"
+    if any(isinstance(e, TimeoutError) or type(e).__name__.endswith("Timeout") for e in chain):
+        return "timeout"
+    for e in chain:
+        status = _status_of(e)
+        if status:
+            return status_kind(status)
+    if any(isinstance(e, OSError) for e in chain) or type(error).__name__ in ("ChunkedEncodingError", "ServerDisconnectedError"):
+        return "connect"
+    return "other"
+
+
+def is_retryable(error: BaseException, kind: str) -> bool:
+    if kind in RETRYABLE_KINDS:
+        return True
+    return any(_status_of(e) in RETRYABLE_STATUSES for e in _error_chain(error))
+
+
+# Failed URLs waiting for another attempt, in a heap ordered by due time. A
+# background thread puts each URL back into the frontier when it is due, so no
+# worker waits on a retry. The frontier's lock guards the heap as well, so a
+# checkpoint of the frontier sees every URL either queued, in flight or here.
+class RetryScheduler:
+    def __init__(self, frontier: HostFrontier, max_retries: int = 3, base_delay: float = 1.0,
+                 max_delay: float = 300, max_retry_after: float = 600):
+        self.frontier = frontier
+        self.max_retries = max_retries
+        self.base_delay = base_delay
+        self.max_delay = max_delay
+        self.max_retry_after = max_retry_after
+        self.lock = frontier.condition
+        self.heap: List[Tuple[float, int, str, int]] = []
+        self.sequence = 0
+        self.attempts: Dict[str, int] = {}
+        self.wakeup = threading.Event()
+        self.stopped: Optional[threading.Event] = None
+        self.logger = logging.getLogger(__name__)
+
+    def configure(self, max_retries: int) -> None:
+        with self.lock:
+            self.max_retries = max_retries
+            self.heap.clear()
+            self.attempts.clear()
+
+    def backoff(self, attempt: int) -> float:
+        # Exponential backoff with "equal jitter": half fixed, half random
+        delay = min(self.max_delay, self.base_delay * 2 ** attempt)
+        return delay / 2 + random.uniform(0, delay / 2)
+
+    def schedule(self, url: str, depth: int, retry_after: Optional[float] = None) -> bool:
+        # Returns False once the URL has used up its retries
+        with self.lock:
+            attempt = self.attempts.get(url, 0)
+            if attempt >= self.max_retries:
+                self.attempts.pop(url, None)
+                return False
+            self.attempts[url] = attempt + 1
+            delay = min(retry_after, self.max_retry_after) if retry_after is not None else self.backoff(attempt)
+            self._push(url, depth, delay)
+            self.logger.debug(f"Retry {attempt + 1} of {url} in {delay:.1f}s")
+            return True
+
+    def postpone(self, url: str, depth: int, delay: float) -> None:
+        # Puts the URL back after the delay without counting an attempt, for
+        # waits that say nothing about the URL itself, such as robots.txt being unavailable
+        with self.lock:
+            self._push(url, depth, delay)
+
+    def _push(self, url: str, depth: int, delay: float) -> None:
+        self.sequence += 1
+        heapq.heappush(self.heap, (time.monotonic() + delay, self.sequence, url, depth))
+        if self.heap[0][2] == url:
+            self.wakeup.set()
+
+    def forget(self, url: str) -> None:
+        # The URL succeeded; later failures start counting again
+        if self.attempts:
+            with self.lock:
+                self.attempts.pop(url, None)
+
+    def items(self) -> List[Tuple[str, int]]:
+        with self.lock:
+            return [(url, depth) for _, _, url, depth in self.heap]
+
+    def __len__(self) -> int:
+        with self.lock:
+            return len(self.heap)
+
+    def start(self) -> None:
+        self.stop()
+        self.stopped = threading.Event()
+        threading.Thread(target=self._run, args=(self.stopped,), daemon=True).start()
+
+    def stop(self) -> None:
+        if self.stopped:
+            self.stopped.set()
+            self.wakeup.set()
+            self.stopped = None
+
+    def _run(self, stopped: threading.Event) -> None:
+        while not stopped.is_set():
+            # Cleared before looking at the heap, so a retry scheduled meanwhile is not missed
+            self.wakeup.clear()
+            now = time.monotonic()
+            with self.lock:
+                while self.heap and self.heap[0][0] <= now:
+                    _, _, url, depth = heapq.heappop(self.heap)
+                    self.frontier.put(url, depth)
+                wait = self.heap[0][0] - now if self.heap else None
+            self.wakeup.wait(wait)
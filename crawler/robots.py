@@ -1,105 +1,262 @@
 import urllib.robotparser
 import urllib.parse
 import requests
-from urllib.parse import urljoin
 import logging
-from typing import Optional, Dict
+import re
+import threading
+import time
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+from typing import Callable, Dict, Optional
+
+from crawler.http_session import HttpSession
+from crawler.robots_cache import RobotsCache
+
+DEFAULT_TTL = 24 * 3600
+# A robots.txt that could not be read (5xx or unreachable) is retried after this long
+ERROR_TTL = 600
+MAX_ROBOTS_SIZE = 500 * 1024
+
+_MAX_AGE = re.compile(r"max-age=(\d+)")
+
+
+class _RobotsRules:
+    def __init__(self, parser: urllib.robotparser.RobotFileParser, expires_at: float, temporary: bool = False):
+        self.parser = parser
+        self.expires_at = expires_at
+        # Disallowed only because robots.txt could not be read
+        self.temporary = temporary
+
 
 class RobotsParser:
-    def __init__(self, user_agent: str = "PythonWebCrawler/1.0"):
+    def __init__(self, user_agent: str = "PythonWebCrawler/1.0", http_session: Optional[HttpSession] = None,
+                 cache_path: Optional[str] = None, ttl: float = DEFAULT_TTL, max_entries: int = 10000,
+                 prefetch_workers: int = 4):
         self.user_agent = user_agent
-        self.parsers: Dict[str, Optional[urllib.robotparser.RobotFileParser]] = {}
+        self.http_session = http_session or HttpSession(user_agent=user_agent)
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self.cache = RobotsCache(cache_path) if cache_path else None
+        # Parsed rule sets by scheme://host, least recently used first
+        self.rules: "OrderedDict[str, _RobotsRules]" = OrderedDict()
+        self.loading: Dict[str, threading.Event] = {}
+        self.lock = threading.Lock()
+        self.prefetch_pool = ThreadPoolExecutor(max_workers=prefetch_workers, thread_name_prefix="robots")
+        # Hosts submitted to the prefetch pool and not loaded yet
+        self.queued = set()
+        # Called with the host key, its Crawl-delay (None if robots.txt could not be
+        # read) and the seconds until it is tried again, once rules are in memory
+        self.loaded_listener: Optional[Callable[[str, Optional[float], float], None]] = None
         self.logger = logging.getLogger(__name__)
-        self.logger.setLevel(logging.DEBUG)
+
+    def configure(self, user_agent: str, cache_path: Optional[str], ttl: float = DEFAULT_TTL) -> None:
+        self.user_agent = user_agent
+        self.ttl = ttl
+        if cache_path != (self.cache.path if self.cache else None):
+            if self.cache:
+                self.cache.close()
+            self.cache = RobotsCache(cache_path) if cache_path else None
+            with self.lock:
+                self.rules.clear()
+
+    @staticmethod
+    def robots_key(url: str) -> Optional[str]:
+        parsed_url = urllib.parse.urlparse(url)
+        if not parsed_url.netloc:
+            return None
+        return f"{parsed_url.scheme}://{parsed_url.netloc}".lower()
 
     def can_fetch(self, url: str) -> bool:
         try:
             self.logger.debug(f"Checking if can fetch URL: {url}")
 
-            # Parse URL
-            try:
-                parsed_url = urllib.parse.urlparse(url)
-                domain = parsed_url.netloc
-                if not domain:
-                    self.logger.warning(f"Invalid URL format: {url}")
-                    return False
-            except Exception as e:
-                self.logger.error(f"Error parsing URL {url}: {str(e)}")
+            key = self.robots_key(url)
+            if key is None:
+                self.logger.warning(f"Invalid URL format: {url}")
                 return False
 
-            self.logger.debug(f"Parsed domain: {domain}")
-
-            # Initialize parser if needed
-            if domain not in self.parsers:
-                self.logger.debug(f"Initializing parser for domain: {domain}")
-                self._init_parser(domain, url)
-
-            # Get parser instance
-            parser = self.parsers.get(domain)
-            if parser is None:
-                self.logger.debug(f"No parser available for {domain}, allowing crawl")
-                return True
+            rules = self._rules(key)
+            if rules.temporary:
+                self.logger.debug(f"robots.txt for {key} is unavailable, not fetching {url} yet")
+                return False
 
-            # Check if URL can be fetched
-            try:
-                can_fetch = parser.can_fetch(self.user_agent, url)
-                self.logger.debug(f"Robots.txt decision for {url}: {can_fetch}")
-                return can_fetch
-            except Exception as e:
-                self.logger.error(f"Error checking can_fetch for {url}: {str(e)}")
-                return True
+            can_fetch = rules.parser.can_fetch(self.user_agent, url)
+            self.logger.debug(f"Robots.txt decision for {url}: {can_fetch}")
+            return can_fetch
 
         except Exception as e:
             self.logger.error(f"Error in can_fetch for {url}: {str(e)}")
             self.logger.exception("Full traceback:")
             return True
 
-    def _init_parser(self, domain: str, url: str) -> None:
+    def cached_decision(self, url: str) -> Optional[bool]:
+        # Answers from memory without blocking; None means robots.txt still has to be
+        # loaded. Expired rules still answer while they are refreshed in the background.
+        key = self.robots_key(url)
+        with self.lock:
+            rules = self.rules.get(key)
+        if rules is None:
+            return None
+        if rules.expires_at <= time.time():
+            self._submit(key)
+        return not rules.temporary and rules.parser.can_fetch(self.user_agent, url)
+
+    def unavailable_for(self, url: str) -> float:
+        # Seconds until a robots.txt that could not be read is fetched again; 0 once it was read
+        with self.lock:
+            rules = self.rules.get(self.robots_key(url))
+        if rules is None or not rules.temporary:
+            return 0
+        return self._retry_in(rules)
+
+    @staticmethod
+    def _retry_in(rules: _RobotsRules) -> float:
+        return max(1.0, rules.expires_at - time.time())
+
+    def get_crawl_delay(self, url: str) -> float:
         try:
-            self.logger.debug(f"Initializing robots parser for domain: {domain}")
+            key = self.robots_key(url)
+            if key is None:
+                return 0
+            return self._crawl_delay(self._rules(key))
 
-            # Create robots.txt URL
-            robots_url = urljoin(f"https://{domain}", "/robots.txt")
-            self.logger.debug(f"Fetching robots.txt from: {robots_url}")
+        except Exception as e:
+            self.logger.error(f"Error getting crawl delay for {url}: {str(e)}")
+            self.logger.exception("Full traceback for crawl delay error:")
+            return 0
 
-            # Create parser instance
-            parser = urllib.robotparser.RobotFileParser(robots_url)
+    def prefetch(self, url: str) -> None:
+        # Loads robots.txt for a new host in the background and tells the listener,
+        # so the frontier only hands out the host's URLs once its rules are known
+        key = self.robots_key(url)
+        if key is None:
+            return
+        with self.lock:
+            rules = self.rules.get(key)
+        if rules is not None and rules.expires_at > time.time():
+            self._notify(key, rules)
+        else:
+            self._submit(key)
 
-            try:
-                # Fetch robots.txt
-                response = requests.get(robots_url, timeout=10)
-                if response.status_code == 200:
-                    self.logger.debug("Successfully fetched robots.txt")
-                    parser.parse(response.text.splitlines())
-                    self.parsers[domain] = parser
-                else:
-                    self.logger.debug(f"No robots.txt found (status code: {response.status_code})")
-                    self.parsers[domain] = None
-            except requests.RequestException as e:
-                self.logger.warning(f"Error fetching robots.txt from {robots_url}: {str(e)}")
-                self.parsers[domain] = None
+    def _submit(self, key: str) -> None:
+        with self.lock:
+            if key in self.queued or key in self.loading:
+                return
+            self.queued.add(key)
+        self.prefetch_pool.submit(self._prefetch, key)
 
+    def _prefetch(self, key: str) -> None:
+        try:
+            rules = self._rules(key)
         except Exception as e:
-            self.logger.error(f"Error initializing parser for {domain}: {str(e)}")
-            self.logger.exception("Full traceback:")
-            self.parsers[domain] = None
+            self.logger.error(f"Error prefetching robots.txt for {key}: {str(e)}")
+            # Workers load it themselves then
+            if self.loaded_listener:
+                self.loaded_listener(key, 0, 0)
+            return
+        finally:
+            with self.lock:
+                self.queued.discard(key)
+        self._notify(key, rules)
+
+    def _notify(self, key: str, rules: _RobotsRules) -> None:
+        if not self.loaded_listener:
+            return
+        if rules.temporary:
+            # The delay of a host whose robots.txt is unavailable is only known once it is read
+            self.loaded_listener(key, None, self._retry_in(rules))
+        else:
+            self.loaded_listener(key, self._crawl_delay(rules), 0)
+
+    def _crawl_delay(self, rules: _RobotsRules) -> float:
+        delay = rules.parser.crawl_delay(self.user_agent)
+        return delay if delay is not None else 0
+
+    def _rules(self, key: str) -> _RobotsRules:
+        while True:
+            with self.lock:
+                rules = self.rules.get(key)
+                if rules is not None and rules.expires_at > time.time():
+                    self.rules.move_to_end(key)
+                    return rules
+                event = self.loading.get(key)
+                if event is None:
+                    event = threading.Event()
+                    self.loading[key] = event
+                    break
+            # Another thread is already loading robots.txt for this host
+            event.wait()
 
-    def get_crawl_delay(self, url: str) -> float:
         try:
-            parsed_url = urllib.parse.urlparse(url)
-            domain = parsed_url.netloc
+            rules = self._load(key)
+            with self.lock:
+                self.rules[key] = rules
+                self.rules.move_to_end(key)
+                while len(self.rules) > self.max_entries:
+                    self.rules.popitem(last=False)
+        finally:
+            with self.lock:
+                del self.loading[key]
+            event.set()
+        return rules
 
-            if domain not in self.parsers:
-                self._init_parser(domain, url)
+    def _load(self, key: str) -> _RobotsRules:
+        now = time.time()
+        cached = self.cache.get(key) if self.cache else None
+        if cached and cached[4] > now:
+            self.logger.debug(f"Using cached robots.txt for {key}")
+            return self._build(cached[0], cached[1], cached[4])
 
-            parser = self.parsers.get(domain)
-            if not parser:
-                return 0
+        robots_url = f"{key}/robots.txt"
+        headers = {}
+        if cached and 200 <= cached[0] < 300:
+            if cached[2]:
+                headers["If-None-Match"] = cached[2]
+            if cached[3]:
+                headers["If-Modified-Since"] = cached[3]
 
-            delay = parser.crawl_delay(self.user_agent)
-            return delay if delay is not None else 0
+        self.logger.debug(f"Fetching robots.txt from: {robots_url}")
+        ttl = ERROR_TTL
+        try:
+            response = self.http_session.get(robots_url, headers=headers, timeout=10)
+            if response.status_code == 304 and headers:
+                self.logger.debug(f"robots.txt for {key} not modified")
+                status, body, etag, last_modified = cached[:4]
+            else:
+                status = response.status_code
+                body = response.text[:MAX_ROBOTS_SIZE] if 200 <= status < 300 else ""
+                etag = response.headers.get("ETag")
+                last_modified = response.headers.get("Last-Modified")
+            if status < 500:
+                ttl = self._response_ttl(response)
+        except requests.RequestException as e:
+            self.logger.warning(f"Error fetching robots.txt from {robots_url}: {str(e)}")
+            status, body, etag, last_modified = 0, "", None, None
 
-        except Exception as e:
-            self.logger.error(f"Error getting crawl delay for {url}: {str(e)}")
-            self.logger.exception("Full traceback for crawl delay error:")
-            return 0
\ No newline at end of file
+        expires_at = now + ttl
+        if self.cache:
+            try:
+                self.cache.put(key, status, body, etag, last_modified, expires_at)
+            except Exception as e:
+                self.logger.error(f"Error caching robots.txt for {key}: {str(e)}")
+        return self._build(status, body, expires_at)
+
+    def _response_ttl(self, response: requests.Response) -> float:
+        match = _MAX_AGE.search(response.headers.get("Cache-Control", ""))
+        if match:
+            return min(int(match.group(1)), self.ttl)
+        return self.ttl
+
+    @staticmethod
+    def _build(status: int, body: str, expires_at: float) -> _RobotsRules:
+        parser = urllib.robotparser.RobotFileParser()
+        if 200 <= status < 300:
+            parser.parse(body.splitlines())
+            return _RobotsRules(parser, expires_at)
+        if status == 0 or status >= 500:
+            # Server error or unreachable: disallow everything until it is retried
+            parser.disallow_all = True
+            return _RobotsRules(parser, expires_at, temporary=True)
+        # No robots.txt (4xx, including 401 and 403) allows everything
+        parser.allow_all = True
+        return _RobotsRules(parser, expires_at)
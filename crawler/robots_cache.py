@@ -0,0 +1,41 @@
+import logging
+import sqlite3
+import threading
+from typing import Optional, Tuple
+
+
+# On-disk robots.txt cache shared between crawls, one row per scheme://host.
+# The body is kept rather than the parsed rules so an expired entry can be
+# revalidated with its ETag/Last-Modified and reused on a 304.
+class RobotsCache:
+    def __init__(self, path: str):
+        self.path = path
+        self.lock = threading.Lock()
+        self.connection = sqlite3.connect(path, check_same_thread=False)
+        self.connection.execute(
+            "CREATE TABLE IF NOT EXISTS robots ("
+            "key TEXT PRIMARY KEY, status INTEGER NOT NULL, body TEXT NOT NULL, "
+            "etag TEXT, last_modified TEXT, expires_at REAL NOT NULL)"
+        )
+        self.connection.commit()
+        self.logger = logging.getLogger(__name__)
+
+    def get(self, key: str) -> Optional[Tuple[int, str, Optional[str], Optional[str], float]]:
+        with self.lock:
+            return self.connection.execute(
+                "SELECT status, body, etag, last_modified, expires_at FROM robots WHERE key = ?", (key,)
+            ).fetchone()
+
+    def put(self, key: str, status: int, body: str, etag: Optional[str], last_modified: Optional[str],
+            expires_at: float) -> None:
+        with self.lock:
+            self.connection.execute(
+                "INSERT OR REPLACE INTO robots (key, status, body, etag, last_modified, expires_at) "
+                "VALUES (?, ?, ?, ?, ?, ?)",
+                (key, status, body, etag, last_modified, expires_at)
+            )
+            self.connection.commit()
+
+    def close(self) -> None:
+        with self.lock:
+            self.connection.close()
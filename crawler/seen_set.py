@@ -0,0 +1,223 @@
+import hashlib
+import heapq
+import math
+from array import array
+from bisect import bisect_left
+from typing import List, Optional, Set
+
+
+def url_fingerprint(url: str) -> int:
+    return int.from_bytes(hashlib.blake2b(url.encode("utf-8"), digest_size=8).digest(), "little")
+
+
+class _SeenSet:
+    # A checkpoint copies the set under the crawl's locks and writes the copy
+    # after releasing them; URLs added meanwhile are journaled so the checkpoint
+    # can store them alongside the copy.
+    journal: Optional[List[str]] = None
+
+    def start_journal(self) -> None:
+        self.journal = []
+
+    def stop_journal(self) -> List[str]:
+        journal, self.journal = self.journal or [], None
+        return journal
+
+    def __getstate__(self):
+        state = self.__dict__.copy()
+        state.pop("journal", None)
+        return state
+
+
+class ExactSeenSet(_SeenSet):
+    def __init__(self):
+        self.urls: Set[str] = set()
+
+    def add(self, url: str) -> bool:
+        if url in self.urls:
+            return False
+        self.urls.add(url)
+        if self.journal is not None:
+            self.journal.append(url)
+        return True
+
+    def __contains__(self, url: str) -> bool:
+        return url in self.urls
+
+    def __len__(self) -> int:
+        return len(self.urls)
+
+    def clear(self) -> None:
+        self.urls.clear()
+
+    def snapshot(self) -> "ExactSeenSet":
+        copy = ExactSeenSet()
+        copy.urls = self.urls.copy()
+        return copy
+
+
+class FingerprintSeenSet(_SeenSet):
+    # Stores 64-bit URL fingerprints (8 bytes per URL) in sorted arrays. New
+    # fingerprints collect in a small set and are flushed into a sorted run;
+    # runs of similar size are merged like a binary counter, so a lookup only
+    # bisects O(log n) arrays. Two URLs sharing a fingerprint is possible but
+    # expected only once in roughly 2**32 URLs.
+    def __init__(self, buffer_size: int = 65536):
+        self.buffer_size = buffer_size
+        self.runs: List[array] = []
+        self.buffer: Set[int] = set()
+        self.count = 0
+
+    def add(self, url: str) -> bool:
+        fingerprint = url_fingerprint(url)
+        if self._contains_fingerprint(fingerprint):
+            return False
+        self.buffer.add(fingerprint)
+        self.count += 1
+        if len(self.buffer) >= self.buffer_size:
+            self._flush()
+        if self.journal is not None:
+            self.journal.append(url)
+        return True
+
+    def __contains__(self, url: str) -> bool:
+        return self._contains_fingerprint(url_fingerprint(url))
+
+    def __len__(self) -> int:
+        return self.count
+
+    def clear(self) -> None:
+        self.runs = []
+        self.buffer = set()
+        self.count = 0
+
+    def snapshot(self) -> "FingerprintSeenSet":
+        # Runs are never changed once built, so the copy shares them
+        copy = FingerprintSeenSet(self.buffer_size)
+        copy.runs = list(self.runs)
+        copy.buffer = set(self.buffer)
+        copy.count = self.count
+        return copy
+
+    def _contains_fingerprint(self, fingerprint: int) -> bool:
+        if fingerprint in self.buffer:
+            return True
+        for run in self.runs:
+            i = bisect_left(run, fingerprint)
+            if i < len(run) and run[i] == fingerprint:
+                return True
+        return False
+
+    def _flush(self) -> None:
+        run = array("Q", sorted(self.buffer))
+        self.buffer = set()
+        while self.runs and len(self.runs[-1]) <= len(run):
+            run = array("Q", heapq.merge(self.runs.pop(), run))
+        self.runs.append(run)
+
+
+class _BloomFilter:
+    def __init__(self, capacity: int, error_rate: float):
+        self.capacity = capacity
+        self.num_bits = max(8, int(math.ceil(-capacity * math.log(error_rate) / (math.log(2) ** 2))))
+        self.num_hashes = max(1, int(round(self.num_bits / capacity * math.log(2))))
+        self.bits = bytearray((self.num_bits + 7) // 8)
+        self.count = 0
+
+    def contains(self, h1: int, h2: int) -> bool:
+        bits = self.bits
+        num_bits = self.num_bits
+        for i in range(self.num_hashes):
+            position = (h1 + i * h2) % num_bits
+            if not bits[position >> 3] & (1 << (position & 7)):
+                return False
+        return True
+
+    def add(self, h1: int, h2: int) -> None:
+        bits = self.bits
+        num_bits = self.num_bits
+        for i in range(self.num_hashes):
+            position = (h1 + i * h2) % num_bits
+            bits[position >> 3] |= 1 << (position & 7)
+        self.count += 1
+
+    def copy(self) -> "_BloomFilter":
+        bloom = _BloomFilter.__new__(_BloomFilter)
+        bloom.__dict__.update(self.__dict__)
+        bloom.bits = bytearray(self.bits)
+        return bloom
+
+
+class BloomSeenSet(_SeenSet):
+    # Scalable Bloom filter: when a filter reaches capacity a larger one with
+    # a tighter error rate is added, so the compound false-positive rate stays
+    # below error_rate however many URLs are added. A false positive means a
+    # new URL is wrongly treated as already seen and is skipped.
+    def __init__(self, error_rate: float = 0.001, initial_capacity: int = 1000000,
+                 growth: int = 2, tightening: float = 0.5):
+        if not 0 < error_rate < 1:
+            raise ValueError("error_rate must be between 0 and 1")
+        self.error_rate = error_rate
+        self.initial_capacity = initial_capacity
+        self.growth = growth
+        self.tightening = tightening
+        self.filters: List[_BloomFilter] = []
+        self.count = 0
+        self.clear()
+
+    def add(self, url: str) -> bool:
+        h1, h2 = self._hashes(url)
+        for bloom in self.filters:
+            if bloom.contains(h1, h2):
+                return False
+
+        bloom = self.filters[-1]
+        if bloom.count >= bloom.capacity:
+            bloom = _BloomFilter(
+                bloom.capacity * self.growth,
+                self.error_rate * (1 - self.tightening) * self.tightening ** len(self.filters)
+            )
+            self.filters.append(bloom)
+        bloom.add(h1, h2)
+        self.count += 1
+        if self.journal is not None:
+            self.journal.append(url)
+        return True
+
+    def __contains__(self, url: str) -> bool:
+        h1, h2 = self._hashes(url)
+        return any(bloom.contains(h1, h2) for bloom in self.filters)
+
+    def __len__(self) -> int:
+        return self.count
+
+    def clear(self) -> None:
+        self.filters = [_BloomFilter(self.initial_capacity, self.error_rate * (1 - self.tightening))]
+        self.count = 0
+
+    def snapshot(self) -> "BloomSeenSet":
+        copy = BloomSeenSet.__new__(BloomSeenSet)
+        copy.__dict__.update(self.__getstate__())
+        copy.filters = [bloom.copy() for bloom in self.filters]
+        return copy
+
+    @staticmethod
+    def _hashes(url: str):
+        digest = hashlib.blake2b(url.encode("utf-8"), digest_size=16).digest()
+        # Double hashing. h2 is forced odd only so it is never 0, which would put
+        # every probe on one bit; as num_bits is not a power of two, probes can still
+        # repeat when h2 shares a factor with it, which costs a little accuracy
+        return int.from_bytes(digest[:8], "little"), int.from_bytes(digest[8:], "little") | 1
+
+
+SEEN_SET_BACKENDS = ("exact", "fingerprint", "bloom")
+
+
+def create_seen_set(backend: str = "exact", error_rate: float = 0.001, initial_capacity: int = 1000000):
+    if backend == "exact":
+        return ExactSeenSet()
+    if backend == "fingerprint":
+        return FingerprintSeenSet()
+    if backend == "bloom":
+        return BloomSeenSet(error_rate=error_rate, initial_capacity=initial_capacity)
+    raise ValueError(f"Unknown seen-set backend: {backend}")
@@ -0,0 +1,327 @@
+import csv
+import glob
+import gzip
+import io
+import json
+import logging
+import os
+import threading
+from datetime import datetime
+from typing import Any, Dict, Iterator, List, Optional
+
+# pyarrow is slow to import and only needed for Parquet, so it is imported on first use
+pa = None
+pq = None
+
+
+def _import_pyarrow() -> bool:
+    global pa, pq
+    if pa is None:
+        try:
+            import pyarrow
+            import pyarrow.parquet
+        except ImportError:
+            return False
+        pa, pq = pyarrow, pyarrow.parquet
+    return True
+
+DEFAULT_BUFFER_SIZE = 1024 * 1024
+DEFAULT_ROW_GROUP_SIZE = 100000
+CSV_FIELDS = ['url', 'title', 'timestamp', 'depth', 'num_links', 'duplicate_of']
+
+
+def csv_row(record: Dict[str, Any]) -> List[Any]:
+    return [record['url'], record['title'], record['timestamp'], record['depth'], len(record['links']),
+            record.get('duplicate_of') or '']
+
+
+class ResultSink:
+    def write(self, record: Dict[str, Any]) -> None:
+        raise NotImplementedError
+
+    def flush(self) -> None:
+        pass
+
+    def checkpoint(self) -> Dict[str, Any]:
+        # Returns the file offsets that make up a consistent state of the sink
+        return {}
+
+    def close(self) -> None:
+        pass
+
+
+class FileSink(ResultSink):
+    def __init__(self, path: str, compress: bool = False, buffer_size: int = DEFAULT_BUFFER_SIZE,
+                 resume_offset: Optional[int] = None):
+        self.path = path
+        self.compress = compress
+        self.buffer_size = buffer_size
+        self.count = 0
+        self.lock = threading.Lock()
+        self.logger = logging.getLogger(__name__)
+
+        append = resume_offset is not None and os.path.exists(path)
+        if append:
+            # Drop anything written after the checkpoint being resumed from
+            with open(path, "r+b") as f:
+                f.truncate(resume_offset)
+        self.raw = open(path, "ab" if append else "wb", buffering=buffer_size)
+        self._open_text()
+        if not append:
+            self.write_header()
+
+    def _open_text(self) -> None:
+        self.gzip = gzip.GzipFile(fileobj=self.raw, mode="wb") if self.compress else None
+        self.text = io.TextIOWrapper(self.gzip or self.raw, encoding="utf-8", newline="")
+
+    def write_header(self) -> None:
+        pass
+
+    def write(self, record: Dict[str, Any]) -> None:
+        line = self.format_record(record)
+        with self.lock:
+            self.text.write(line)
+            self.count += 1
+
+    def format_record(self, record: Dict[str, Any]) -> str:
+        raise NotImplementedError
+
+    def flush(self) -> None:
+        with self.lock:
+            self.text.flush()
+            if self.gzip:
+                self.gzip.flush()
+            self.raw.flush()
+
+    def checkpoint(self) -> Dict[str, int]:
+        with self.lock:
+            self.text.flush()
+            if self.gzip:
+                # End the gzip member so the file can be cut at this offset on resume
+                self.text.detach()
+                self.gzip.close()
+                self.raw.flush()
+                offset = self.raw.tell()
+                self._open_text()
+            else:
+                self.raw.flush()
+                offset = self.raw.tell()
+        return {self.path: offset}
+
+    def close(self) -> None:
+        with self.lock:
+            self.text.close()
+            if self.gzip:
+                self.raw.close()
+
+
+class NDJSONSink(FileSink):
+    def format_record(self, record: Dict[str, Any]) -> str:
+        return json.dumps(record, ensure_ascii=False) + "\n"
+
+
+class CSVSink(FileSink):
+    def write_header(self) -> None:
+        csv.writer(self.text).writerow(CSV_FIELDS)
+
+    def format_record(self, record: Dict[str, Any]) -> str:
+        row = io.StringIO()
+        csv.writer(row).writerow(csv_row(record))
+        return row.getvalue()
+
+
+class MultiSink(ResultSink):
+    def __init__(self, sinks: List[ResultSink]):
+        self.sinks = sinks
+
+    def write(self, record: Dict[str, Any]) -> None:
+        for sink in self.sinks:
+            sink.write(record)
+
+    def flush(self) -> None:
+        for sink in self.sinks:
+            sink.flush()
+
+    def checkpoint(self) -> Dict[str, Any]:
+        offsets = {}
+        for sink in self.sinks:
+            offsets.update(sink.checkpoint())
+        return offsets
+
+    def close(self) -> None:
+        for sink in self.sinks:
+            sink.close()
+
+
+class _ParquetTable:
+    # One Parquet dataset directory. Rows collect in columns and each full row
+    # group is written as its own part file, so parts stay large however often
+    # the crawl checkpoints. A checkpoint saves the rows not yet in a part to
+    # _pending-<part>.parquet, which dataset scans skip, and returns the number
+    # of parts and pending rows; rows are only ever added, so a part rolled after
+    # the checkpoint starts with the same pending rows.
+    def __init__(self, directory: str, schema, row_group_size: int, compression: str,
+                 resume: Optional[List[int]] = None):
+        self.directory = directory
+        self.schema = schema
+        self.row_group_size = row_group_size
+        self.compression = compression
+        self.columns: Dict[str, list] = {name: [] for name in schema.names}
+        self.logger = logging.getLogger(__name__)
+        os.makedirs(directory, exist_ok=True)
+
+        self.parts, pending = resume or (0, 0)
+        pending_rows = None
+        if pending:
+            source = self._path(f"_pending-{self.parts:05d}")
+            if not os.path.exists(source):
+                source = self._path(f"part-{self.parts:05d}")
+            if os.path.exists(source):
+                pending_rows = pq.read_table(source).slice(0, pending)
+            else:
+                self.logger.warning(f"{pending} rows of {directory} written before the checkpoint are missing")
+
+        # Drop anything written after the checkpoint being resumed from
+        self.rows = 0
+        for path in glob.glob(os.path.join(directory, "*.parquet")):
+            name = os.path.basename(path)
+            if name.startswith("part-") and int(name[5:-8]) < self.parts:
+                self.rows += pq.read_metadata(path).num_rows
+            else:
+                os.remove(path)
+        if pending_rows is not None:
+            for name, column in zip(pending_rows.column_names, pending_rows.columns):
+                self.columns[name] = column.to_pylist()
+
+    def __len__(self) -> int:
+        # Rows written so far, in parts or pending
+        return self.rows + self.pending()
+
+    def pending(self) -> int:
+        return len(self.columns[self.schema.names[0]])
+
+    def added(self) -> None:
+        if self.pending() >= self.row_group_size:
+            self._write(f"part-{self.parts:05d}")
+            self.parts += 1
+            self.rows += self.pending()
+            for column in self.columns.values():
+                column.clear()
+            self._remove_pending()
+
+    def checkpoint(self) -> List[int]:
+        if self.pending():
+            self._write(f"_pending-{self.parts:05d}")
+        self._remove_pending(keep=self.parts if self.pending() else None)
+        return [self.parts, self.pending()]
+
+    def close(self) -> None:
+        if self.pending():
+            self._write(f"part-{self.parts:05d}")
+            self.parts += 1
+            self.rows += self.pending()
+            for column in self.columns.values():
+                column.clear()
+        self._remove_pending()
+
+    def _path(self, name: str) -> str:
+        return os.path.join(self.directory, f"{name}.parquet")
+
+    def _write(self, name: str) -> None:
+        # Written under a hidden name first, so a part on disk is always complete
+        temporary = self._path(f".{name}")
+        pq.write_table(pa.Table.from_pydict(self.columns, schema=self.schema), temporary,
+                       compression=self.compression)
+        os.replace(temporary, self._path(name))
+
+    def _remove_pending(self, keep: Optional[int] = None) -> None:
+        for path in glob.glob(os.path.join(self.directory, "_pending-*.parquet")):
+            if keep is None or path != self._path(f"_pending-{keep:05d}"):
+                os.remove(path)
+
+
+# Writes pages and links as two Parquet datasets, <path>/pages and <path>/links.
+# Links are normalized into (source_id, target_url, anchor_text) rows that refer
+# to the page_id of the page they were found on. Each table is written in part
+# files of one full row group, with URLs dictionary-encoded; the last, partial
+# part is written when the sink is closed.
+class ParquetSink(ResultSink):
+    def __init__(self, path: str, row_group_size: int = DEFAULT_ROW_GROUP_SIZE,
+                 resume_offset: Optional[Dict[str, List[int]]] = None, compression: str = "zstd"):
+        if not _import_pyarrow():
+            raise RuntimeError("Parquet output requires the 'pyarrow' package")
+        self.path = path
+        self.row_group_size = row_group_size
+        self.compression = compression
+        self.lock = threading.Lock()
+        self.logger = logging.getLogger(__name__)
+
+        url_type = pa.dictionary(pa.int32(), pa.string())
+        pages_schema = pa.schema([
+            ("page_id", pa.int64()),
+            ("url", url_type),
+            ("title", pa.string()),
+            ("timestamp", pa.timestamp("us")),
+            ("depth", pa.int32()),
+            ("num_links", pa.int32()),
+            ("duplicate_of", url_type)
+        ])
+        links_schema = pa.schema([
+            ("source_id", pa.int64()),
+            ("target_url", url_type),
+            ("anchor_text", pa.string())
+        ])
+
+        resume_offset = resume_offset or {}
+        self.pages = _ParquetTable(os.path.join(path, "pages"), pages_schema, row_group_size, compression,
+                                   resume_offset.get("pages"))
+        self.links = _ParquetTable(os.path.join(path, "links"), links_schema, row_group_size, compression,
+                                   resume_offset.get("links"))
+        self.next_id = len(self.pages)
+
+    @staticmethod
+    def is_available() -> bool:
+        return _import_pyarrow()
+
+    def write(self, record: Dict[str, Any]) -> None:
+        with self.lock:
+            page_id = self.next_id
+            self.next_id += 1
+            pages = self.pages.columns
+            pages["page_id"].append(page_id)
+            pages["url"].append(record['url'])
+            pages["title"].append(record['title'])
+            pages["timestamp"].append(datetime.fromisoformat(record['timestamp']))
+            pages["depth"].append(record['depth'])
+            pages["num_links"].append(len(record['links']))
+            pages["duplicate_of"].append(record.get('duplicate_of'))
+            links = self.links.columns
+            for link in record['links']:
+                links["source_id"].append(page_id)
+                links["target_url"].append(link['href'])
+                links["anchor_text"].append(link['text'])
+
+            self.pages.added()
+            self.links.added()
+
+    def checkpoint(self) -> Dict[str, Any]:
+        with self.lock:
+            return {self.path: {"pages": self.pages.checkpoint(), "links": self.links.checkpoint()}}
+
+    def close(self) -> None:
+        with self.lock:
+            self.pages.close()
+            self.links.close()
+
+
+def open_results(path: str):
+    if path.endswith(".gz"):
+        return gzip.open(path, "rt", encoding="utf-8")
+    return open(path, encoding="utf-8")
+
+
+def read_records(path: str) -> Iterator[Dict[str, Any]]:
+    with open_results(path) as f:
+        for line in f:
+            if line.strip():
+                yield json.loads(line)
@@ -1,37 +1,81 @@
 import time
-from typing import Dict, Any
-import psutil
+from typing import Dict, Any, List, Optional
 import threading
 from collections import deque
 import logging
 
+from crawler.frontier import HostFrontier
+from crawler.metrics import Histogram, HostMetrics, ShardedCounter, SlidingRate, prometheus_text
+from crawler.retry import ERROR_KINDS
+from crawler.tracing import StageTracer
 
+# Seconds of history behind pages_per_second and bytes_per_second
+RATE_WINDOW = 10
+TOP_HOSTS = 10
+
+
+# Counters updated on every page are sharded per thread, so fetch workers never
+# wait on each other to count; the shards are added up when stats are read.
+# Gauges and rarely updated counters share one lock.
 class CrawlerStats:
     def __init__(self):
         self.start_time = None
-        self.pages_crawled = 0
-        self.bytes_downloaded = 0
-        self.errors = 0
+        self.counters = {name: ShardedCounter() for name in (
+            "pages_crawled", "bytes_downloaded", "errors", "http_requests", "connections_opened", "duplicates",
+            "throttled", "retries"
+        )}
+        # Fetch is the request and download, parse the link extraction, and total
+        # everything from taking the URL off the queue to queueing its links
+        self.latency = {name: Histogram() for name in ("fetch", "parse", "total")}
+        self.hosts = HostMetrics()
+        self.tracer = StageTracer()
+        self.page_rate = SlidingRate(RATE_WINDOW)
+        self.byte_rate = SlidingRate(RATE_WINDOW)
         self.current_depth = 0
         self.urls_in_queue = 0
+        self.parse_queue = 0
+        self.revalidations = 0
+        self.not_modified = 0
+        self.bytes_saved = 0
+        self.healthy_proxies = 0
+        self.total_proxies = 0
+        # Failed requests by kind, counting every attempt of a retried URL
+        self.error_kinds = dict.fromkeys(ERROR_KINDS, 0)
+        self.retry_queue = 0
         self.memory_usage = deque(maxlen=100)  # Store last 100 measurements
-        self.crawl_speed = deque(maxlen=10)  # Pages per minute, last 10 measurements
         self.active = False
         self.lock = threading.Lock()
         self.logger = logging.getLogger(__name__)
 
     def start_session(self) -> None:
         self.start_time = time.time()
-        self.pages_crawled = 0
-        self.bytes_downloaded = 0
-        self.errors = 0
+        for counter in self.counters.values():
+            counter.set(0)
+        for histogram in self.latency.values():
+            histogram.reset()
+        self.hosts.reset()
+        self.tracer.reset()
+        self.page_rate.clear()
+        self.byte_rate.clear()
+        with self.lock:
+            self.revalidations = 0
+            self.not_modified = 0
+            self.bytes_saved = 0
+            self.error_kinds = dict.fromkeys(ERROR_KINDS, 0)
         self.active = True
         self._start_monitoring()
 
+    def restore_counters(self, pages_crawled: int, bytes_downloaded: int, errors: int) -> None:
+        self.counters["pages_crawled"].set(pages_crawled)
+        self.counters["bytes_downloaded"].set(bytes_downloaded)
+        self.counters["errors"].set(errors)
+
     def stop_session(self) -> None:
         self.active = False
 
     def _start_monitoring(self) -> None:
+        # Imported with the first crawl rather than at startup
+        import psutil
 
         def monitor():
             while self.active:
@@ -42,12 +86,10 @@ class CrawlerStats:
                     with self.lock:
                         self.memory_usage.append(mem_info.rss / 1024 / 1024)  # MB
 
-                    # Calculate crawl speed
-                    if self.start_time and self.pages_crawled > 0:
-                        elapsed_minutes = (time.time() - self.start_time) / 60
-                        speed = self.pages_crawled / elapsed_minutes if elapsed_minutes > 0 else 0
-                        with self.lock:
-                            self.crawl_speed.append(speed)
+                    # Sample the totals behind the sliding-window rates
+                    now = time.monotonic()
+                    self.page_rate.sample(self.counters["pages_crawled"].value(), now)
+                    self.byte_rate.sample(self.counters["bytes_downloaded"].value(), now)
 
                     time.sleep(1)  # Update every second
                 except Exception as e:
@@ -56,38 +98,134 @@ class CrawlerStats:
         threading.Thread(target=monitor, daemon=True).start()
 
     def increment_pages(self) -> None:
-        with self.lock:
-            self.pages_crawled += 1
+        self.counters["pages_crawled"].add()
 
     def add_bytes_downloaded(self, bytes_count: int) -> None:
-        with self.lock:
-            self.bytes_downloaded += bytes_count
+        self.counters["bytes_downloaded"].add(bytes_count)
 
-    def increment_errors(self) -> None:
-        with self.lock:
-            self.errors += 1
+    def record_page(self, url: str, size: int) -> None:
+        self.counters["pages_crawled"].add()
+        self.counters["bytes_downloaded"].add(size)
+        self.hosts.record(HostFrontier.host_key(url), pages=1, size=size)
+
+    def increment_errors(self, url: Optional[str] = None) -> None:
+        self.counters["errors"].add()
+        if url:
+            self.hosts.record(HostFrontier.host_key(url), errors=1)
+
+    def record_fetch(self, url: str, seconds: float) -> None:
+        self.latency["fetch"].observe(seconds)
+        self.hosts.record(HostFrontier.host_key(url), latency=seconds)
+
+    def record_parse(self, seconds: float) -> None:
+        self.latency["parse"].observe(seconds)
+
+    def record_total(self, seconds: float) -> None:
+        self.latency["total"].observe(seconds)
+
+    def increment_http_requests(self) -> None:
+        self.counters["http_requests"].add()
+
+    def increment_connections_opened(self) -> None:
+        self.counters["connections_opened"].add()
 
     def update_queue_size(self, size: int) -> None:
         with self.lock:
             self.urls_in_queue = size
 
+    def record_request_error(self, kind: str) -> None:
+        with self.lock:
+            self.error_kinds[kind] = self.error_kinds.get(kind, 0) + 1
+
+    def increment_retries(self) -> None:
+        self.counters["retries"].add()
+
+    def update_retry_queue(self, size: int) -> None:
+        with self.lock:
+            self.retry_queue = size
+
+    def increment_throttled(self) -> None:
+        self.counters["throttled"].add()
+
+    def increment_duplicates(self) -> None:
+        self.counters["duplicates"].add()
+
+    def record_revalidation(self, not_modified: bool, bytes_saved: int) -> None:
+        with self.lock:
+            self.revalidations += 1
+            if not_modified:
+                self.not_modified += 1
+                self.bytes_saved += bytes_saved
+
+    def update_parse_queue(self, size: int) -> None:
+        with self.lock:
+            self.parse_queue = size
+
+    def update_proxies(self, healthy: int, total: int) -> None:
+        with self.lock:
+            self.healthy_proxies = healthy
+            self.total_proxies = total
+
     def update_depth(self, depth: int) -> None:
         with self.lock:
             self.current_depth = depth
 
+    def top_hosts(self, limit: int = TOP_HOSTS, key: str = "pages") -> List[Dict[str, Any]]:
+        return self.hosts.top(limit, key)
+
     def get_stats(self) -> Dict[str, Any]:
+        counts = {name: counter.value() for name, counter in self.counters.items()}
+        elapsed_time = time.time() - self.start_time if self.start_time else 0
+        pages_per_second = self.page_rate.rate()
+        bytes_per_second = self.byte_rate.rate()
+        if len(self.page_rate.samples) < 2 and elapsed_time > 0:
+            # Too early for the window; the average since the start
+            pages_per_second = counts["pages_crawled"] / elapsed_time
+            bytes_per_second = counts["bytes_downloaded"] / elapsed_time
+        reuse_ratio = 0.0
+        if counts["http_requests"]:
+            reuse_ratio = max(0.0, 1 - counts["connections_opened"] / counts["http_requests"])
+        latency = {}
+        for name, histogram in self.latency.items():
+            counts_by_bucket, _ = histogram.snapshot()
+            for label, value in zip(("p50", "p95", "p99"), Histogram.quantiles(counts_by_bucket)):
+                latency[f"{name}_{label}"] = value
+
         with self.lock:
-            elapsed_time = time.time() - self.start_time if self.start_time else 0
-            avg_speed = sum(self.crawl_speed) / len(self.crawl_speed) if self.crawl_speed else 0
             current_memory = self.memory_usage[-1] if self.memory_usage else 0
 
             return {
-                "pages_crawled": self.pages_crawled,
-                "errors": self.errors,
+                "pages_crawled": counts["pages_crawled"],
+                "errors": counts["errors"],
                 "elapsed_time": elapsed_time,
-                "bytes_downloaded": self.bytes_downloaded,
+                "bytes_downloaded": counts["bytes_downloaded"],
                 "current_depth": self.current_depth,
                 "urls_in_queue": self.urls_in_queue,
-                "crawl_speed": avg_speed,
-                "memory_usage": current_memory
+                "parse_queue": self.parse_queue,
+                "throttled": counts["throttled"],
+                "retries": counts["retries"],
+                "retry_queue": self.retry_queue,
+                **{f"errors_{kind}": count for kind, count in self.error_kinds.items()},
+                "healthy_proxies": self.healthy_proxies,
+                "total_proxies": self.total_proxies,
+                "crawl_speed": pages_per_second * 60,
+                "pages_per_second": pages_per_second,
+                "bytes_per_second": bytes_per_second,
+                **latency,
+                "memory_usage": current_memory,
+                "http_requests": counts["http_requests"],
+                "connections_opened": counts["connections_opened"],
+                "connection_reuse_ratio": reuse_ratio,
+                "duplicates": counts["duplicates"],
+                "not_modified": self.not_modified,
+                "revalidation_hit_rate": self.not_modified / self.revalidations if self.revalidations else 0.0,
+                "bytes_saved": self.bytes_saved,
+                "top_hosts": self.top_hosts(),
+                "stages": self.tracer.breakdown()
             }
+
+    def prometheus(self) -> str:
+        stats = self.get_stats()
+        histograms = {f"{name}_latency": histogram.snapshot() for name, histogram in self.latency.items()}
+        return prometheus_text(stats, histograms, self.top_hosts(limit=100), counters=self.counters,
+                               stages=stats["stages"])
@@ -0,0 +1,211 @@
+import logging
+import os
+import re
+import sys
+import threading
+import time
+from collections import Counter
+from typing import Any, Callable, Dict, List, Optional
+
+from crawler.metrics import ThreadShards
+
+# Stages of a URL in the order they happen. "request" covers DNS, connecting and
+# waiting for the response headers, "download" reading the body; "queue_wait" is
+# the time fetch workers spend waiting for a host to become ready.
+STAGES = ("queue_wait", "robots", "cache", "request", "download", "decode", "parse", "dedup", "store", "filter",
+          "enqueue")
+PROFILE_MODES = ("sampling", "cprofile")
+
+
+class _Span:
+    __slots__ = ("tracer", "stage", "started")
+
+    def __init__(self, tracer: "StageTracer", stage: str):
+        self.tracer = tracer
+        self.stage = stage
+
+    def __enter__(self):
+        self.started = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc_info):
+        self.tracer.add(self.stage, time.perf_counter() - self.started)
+        return False
+
+
+class _NullSpan:
+    __slots__ = ()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        return False
+
+
+_NULL_SPAN = _NullSpan()
+
+
+# Time spent in each stage of the crawl. Spans are a shared do-nothing object
+# while tracing is off, so instrumented code costs one method call per stage;
+# while it is on, each thread adds its times to its own shard.
+class StageTracer:
+    def __init__(self, enabled: bool = False):
+        self.enabled = enabled
+        self.shards = ThreadShards(dict)
+
+    def span(self, stage: str):
+        if not self.enabled:
+            return _NULL_SPAN
+        return _Span(self, stage)
+
+    def add(self, stage: str, seconds: float) -> None:
+        if not self.enabled:
+            return
+        shard = self.shards.get()
+        row = shard.get(stage)
+        if row is None:
+            row = shard[stage] = [0, 0.0]
+        row[0] += 1
+        row[1] += seconds
+
+    def reset(self) -> None:
+        self.shards = ThreadShards(dict)
+
+    def breakdown(self) -> List[Dict[str, Any]]:
+        # One row per stage seen, in STAGES order: calls, total and mean seconds,
+        # and the share of all traced time
+        merged: Dict[str, list] = {}
+        for shard in self.shards.all():
+            for stage, (count, seconds) in list(shard.items()):
+                total = merged.setdefault(stage, [0, 0.0])
+                total[0] += count
+                total[1] += seconds
+        traced = sum(seconds for _, seconds in merged.values())
+        order = {stage: i for i, stage in enumerate(STAGES)}
+        return [{
+            "stage": stage,
+            "count": count,
+            "seconds": seconds,
+            "mean": seconds / count if count else 0.0,
+            "share": seconds / traced if traced else 0.0
+        } for stage, (count, seconds) in sorted(merged.items(), key=lambda item: order.get(item[0], len(order)))]
+
+
+# Profiles the next `pages` URLs and writes the result to path, then calls
+# on_done with the path, or None if nothing could be written. "sampling" takes the stacks of every thread each
+# interval and writes them in collapsed form ("thread;file:function;... count",
+# as read by flamegraph.pl and speedscope); it works with both engines and
+# costs little. "cprofile" runs each URL under cProfile in the worker that
+# fetches it and writes pstats data; it needs URLs processed one per call, so
+# only the threaded engine supports it.
+class PageProfiler:
+    def __init__(self, pages: int, path: str, mode: str = "sampling", interval: float = 0.005,
+                 on_done: Optional[Callable[[str], None]] = None):
+        if mode not in PROFILE_MODES:
+            raise ValueError(f"Unknown profile mode: {mode}")
+        self.pages = pages
+        self.path = path
+        self.mode = mode
+        self.interval = interval
+        self.on_done = on_done
+        self.claimed = 0
+        self.completed = 0
+        self.stats = None
+        self.written = False
+        self.samples: Counter = Counter()
+        self.lock = threading.Lock()
+        self.done = threading.Event()
+        self.logger = logging.getLogger(__name__)
+        self.sampler = None
+        if mode == "sampling":
+            self.sampler = threading.Thread(target=self._sample_loop, daemon=True)
+            self.sampler.start()
+
+    def run(self, function: Callable, *args) -> Any:
+        if self.mode != "cprofile" or self.done.is_set():
+            return function(*args)
+        import cProfile
+        import pstats
+
+        with self.lock:
+            claimed = self.claimed < self.pages
+            if claimed:
+                self.claimed += 1
+        if not claimed:
+            return function(*args)
+
+        profile = cProfile.Profile()
+        try:
+            profile.enable()
+        except ValueError:
+            # Python 3.12+ allows one active cProfile at a time; another worker has it
+            with self.lock:
+                self.claimed -= 1
+            return function(*args)
+        try:
+            return function(*args)
+        finally:
+            profile.disable()
+            with self.lock:
+                if self.stats is None:
+                    self.stats = pstats.Stats(profile)
+                else:
+                    self.stats.add(profile)
+            self._count()
+
+    def page_done(self) -> None:
+        # Called for every URL finished; cProfile mode counts the URLs it ran instead
+        if self.mode == "sampling":
+            self._count()
+
+    def _count(self) -> None:
+        with self.lock:
+            self.completed += 1
+            finished = self.completed == self.pages
+        if finished:
+            self.stop()
+
+    def stop(self) -> None:
+        # Writes what was collected, also when the crawl ends before all the pages
+        with self.lock:
+            if self.done.is_set():
+                return
+            self.done.set()
+        if self.sampler and self.sampler is not threading.current_thread():
+            self.sampler.join()
+        try:
+            self._write()
+            self.written = True
+            self.logger.info(f"Profile of {self.completed} pages written to {self.path}")
+        except Exception as e:
+            self.logger.error(f"Error writing profile: {str(e)}")
+        if self.on_done:
+            self.on_done(self.path if self.written else None)
+
+    def _write(self) -> None:
+        os.makedirs(os.path.dirname(self.path) or ".", exist_ok=True)
+        if self.mode == "cprofile":
+            if self.stats is None:
+                raise RuntimeError("no pages were profiled")
+            self.stats.dump_stats(self.path)
+            return
+        with open(self.path, "w", encoding="utf-8") as f:
+            for stack, count in self.samples.most_common():
+                f.write(f"{stack} {count}\n")
+
+    def _sample_loop(self) -> None:
+        own_id = threading.get_ident()
+        while not self.done.wait(self.interval):
+            # Workers of one pool share a root, e.g. ThreadPoolExecutor-0_3 goes under ThreadPoolExecutor-0
+            names = {thread.ident: re.sub(r"_\d+$", "", thread.name) for thread in threading.enumerate()}
+            for thread_id, frame in sys._current_frames().items():
+                if thread_id == own_id:
+                    continue
+                stack = []
+                while frame is not None:
+                    code = frame.f_code
+                    stack.append(f"{os.path.basename(code.co_filename)}:{code.co_name}")
+                    frame = frame.f_back
+                stack.append(names.get(thread_id, str(thread_id)).replace(" ", "_"))
+                self.samples[";".join(reversed(stack))] += 1
@@ -1,43 +1,114 @@
 import re
-from typing import List, Pattern
-from urllib.parse import urlparse
+from functools import lru_cache
+from typing import Iterable, List, Optional, Pattern
 import logging
 
+# scheme://[userinfo@]host[:port] at the start of an absolute URL
+_AUTHORITY = re.compile(r"[a-zA-Z][a-zA-Z0-9+.\-]*://(?:[^/?#@]*@)?(\[[^\]]*\]|[^/?#:]*)(:[0-9]*)?")
+# Global inline flags such as (?i) are only valid at the start of a whole pattern
+_GLOBAL_FLAGS = re.compile(r"^\(\?([aiLmsux]+)\)")
+# Group numbers shift once patterns are merged, so these would point at the wrong group
+_BACKREFERENCE = re.compile(r"\\[1-9]|\(\?P=|\(\?\(")
+
+
+def _scoped(pattern: str) -> str:
+    match = _GLOBAL_FLAGS.match(pattern)
+    if match:
+        return f"(?{match.group(1)}:{pattern[match.end():]})"
+    return f"(?:{pattern})"
+
+
+class _PatternSet:
+    # All patterns merged into one alternation, so a URL is scanned once. Patterns
+    # that cannot be combined (e.g. backreferences) make the set fall back to
+    # searching them one by one.
+    def __init__(self, patterns: List[Pattern]):
+        self.patterns = patterns
+        self.combined: Optional[Pattern] = None
+        if len(patterns) > 1 and not any(_BACKREFERENCE.search(p.pattern) for p in patterns):
+            try:
+                self.combined = re.compile("|".join(_scoped(p.pattern) for p in patterns))
+            except re.error:
+                self.combined = None
+
+    def __bool__(self) -> bool:
+        return bool(self.patterns)
+
+    def search(self, url: str) -> bool:
+        if self.combined is not None:
+            return self.combined.search(url) is not None
+        return any(pattern.search(url) for pattern in self.patterns)
+
 
 class URLFilter:
-    def __init__(self):
+    def __init__(self, cache_size: int = 65536):
         self.include_patterns: List[Pattern] = []
         self.exclude_patterns: List[Pattern] = []
         self.allowed_domains: List[str] = []
+        self.cache_size = cache_size
         self.logger = logging.getLogger(__name__)
+        self._compile()
 
     def add_include_pattern(self, pattern: str) -> None:
         try:
             self.include_patterns.append(re.compile(pattern))
+            self._compile()
         except re.error as e:
             self.logger.error(f"Invalid include pattern '{pattern}': {str(e)}")
 
     def add_exclude_pattern(self, pattern: str) -> None:
         try:
             self.exclude_patterns.append(re.compile(pattern))
+            self._compile()
         except re.error as e:
             self.logger.error(f"Invalid exclude pattern '{pattern}': {str(e)}")
 
     def add_allowed_domain(self, domain: str) -> None:
-        self.allowed_domains.append(domain.lower())
+        # "example.com" allows that host only; "*.example.com" allows its subdomains
+        domain = domain.strip().lower()
+        if domain:
+            self.allowed_domains.append(domain)
+            self._compile()
+
+    def set_allowed_domains(self, domains: Iterable[str]) -> None:
+        self.allowed_domains = [domain.strip().lower() for domain in domains if domain.strip()]
+        self._compile()
 
     def should_crawl(self, url: str) -> bool:
-        try:
-            domain = urlparse(url).netloc.lower()
-            if self.allowed_domains and domain not in self.allowed_domains:
-                return False
+        return self._decide(url)
 
-            for pattern in self.exclude_patterns:
-                if pattern.search(url):
+    def clear_filters(self) -> None:
+        self.include_patterns = []
+        self.exclude_patterns = []
+        self.allowed_domains = []
+        self._compile()
+
+    def _compile(self) -> None:
+        exact = set()
+        suffixes = set()
+        for domain in self.allowed_domains:
+            if domain.startswith("*."):
+                suffixes.add(domain[2:])
+            else:
+                exact.add(domain)
+        self.exact_domains = frozenset(exact)
+        self.domain_suffixes = frozenset(suffixes)
+        self.includes = _PatternSet(list(self.include_patterns))
+        self.excludes = _PatternSet(list(self.exclude_patterns))
+        # A fresh cache, since earlier decisions were made under the old rules
+        self._decide = lru_cache(maxsize=self.cache_size)(self._evaluate)
+
+    def _evaluate(self, url: str) -> bool:
+        try:
+            if self.exact_domains or self.domain_suffixes:
+                if not self._domain_allowed(url):
                     return False
 
-            if self.include_patterns:
-                return any(pattern.search(url) for pattern in self.include_patterns)
+            if self.excludes and self.excludes.search(url):
+                return False
+
+            if self.includes:
+                return self.includes.search(url)
 
             return True
 
@@ -45,7 +116,17 @@ class URLFilter:
             self.logger.error(f"Error filtering URL {url}: {str(e)}")
             return False
 
-    def clear_filters(self) -> None:
-        self.include_patterns = []
-        self.exclude_patterns = []
-        self.allowed_domains = []
+    def _domain_allowed(self, url: str) -> bool:
+        match = _AUTHORITY.match(url)
+        if not match:
+            return False
+        host = match.group(1).lower()
+        if host in self.exact_domains or (match.group(2) and host + match.group(2) in self.exact_domains):
+            return True
+        # Walk up the labels: a.b.example.com -> b.example.com -> example.com -> com
+        dot = host.find(".")
+        while dot != -1:
+            if host[dot + 1:] in self.domain_suffixes:
+                return True
+            dot = host.find(".", dot + 1)
+        return False
@@ -1,24 +1,85 @@
 import tkinter as tk
 from tkinter import ttk, scrolledtext
+import itertools
 import time
-from typing import Dict, Any
+from collections import deque
+from typing import Dict, Any, List, Tuple
 import logging
 
-class LogHandler(logging.Handler):
-    def __init__(self, text_widget):
+LOG_LEVELS = ("DEBUG", "INFO", "WARNING", "ERROR")
+
+
+# Collects log records from any thread without touching Tk. Records go into a
+# bounded deque, whose appends are atomic, so emit() skips the handler lock;
+# when the deque is full the oldest records are dropped. Each kept record gets
+# a sequence number, so the reader counts drops from the gaps. Call sites
+# logging more than `burst` records a second are sampled: the rest of that
+# second is suppressed and the count is attached to the site's next record.
+# The counters are updated without a lock, so under contention they are
+# approximate.
+class QueueLogHandler(logging.Handler):
+    def __init__(self, capacity: int = 10000, burst: int = 20):
         super().__init__()
-        self.text_widget = text_widget
+        self.records = deque(maxlen=capacity)
+        self.burst = burst
+        self.sequence = itertools.count()
+        # (logger name, line number) -> [window start, records in window, suppressed]
+        self.sites: Dict[Tuple[str, int], list] = {}
+        self.suppressed = 0
+
+    def handle(self, record):
+        result = self.filter(record)
+        if isinstance(result, logging.LogRecord):
+            record = result
+        if result:
+            self.emit(record)
+        return result
 
     def emit(self, record):
-        msg = self.format(record)
-        self.text_widget.insert(tk.END, msg + '\n')
-        self.text_widget.see(tk.END)
+        # Warnings and errors are never sampled
+        if record.levelno < logging.WARNING and not self._sample(record):
+            return
+        self.records.append((next(self.sequence), record))
+
+    def _sample(self, record) -> bool:
+        now = int(record.created)
+        site = self.sites.get((record.name, record.lineno))
+        if site is None or site[0] != now:
+            if site is not None and site[2]:
+                record.suppressed = site[2]
+            self.sites[(record.name, record.lineno)] = [now, 1, 0]
+            return True
+        site[1] += 1
+        if site[1] <= self.burst:
+            return True
+        site[2] += 1
+        self.suppressed += 1
+        return False
+
+    def drain(self, limit: int) -> List[Tuple[int, logging.LogRecord]]:
+        # Up to `limit` of the oldest (sequence number, record) pairs
+        batch = []
+        while len(batch) < limit:
+            try:
+                batch.append(self.records.popleft())
+            except IndexError:
+                break
+        return batch
+
 
 class Dashboard(ttk.Frame):
-    def __init__(self, parent):
+    def __init__(self, parent, max_log_lines: int = 2000, log_interval: int = 250, log_batch: int = 500):
         super().__init__(parent)
+        # The log view keeps the last max_log_lines lines and takes up to log_batch
+        # records every log_interval milliseconds
+        self.max_log_lines = max_log_lines
+        self.log_interval = log_interval
+        self.log_batch = log_batch
+        self.next_sequence = 0
+        self.dropped = 0
         self.setup_ui()
         self.update_interval = 1000
+        self.after(self.log_interval, self.drain_logs)
 
     def setup_ui(self):
         self.paned = ttk.PanedWindow(self, orient=tk.VERTICAL)
@@ -30,12 +91,30 @@ class Dashboard(ttk.Frame):
         self.labels: Dict[str, tk.StringVar] = {
             "Pages Crawled": tk.StringVar(value="0"),
             "Crawl Speed": tk.StringVar(value="0 pages/min"),
+            "Throughput (10s)": tk.StringVar(value="0.0 pages/s, 0 B/s"),
             "Memory Usage": tk.StringVar(value="0 MB"),
             "Queue Size": tk.StringVar(value="0"),
             "Current Depth": tk.StringVar(value="0"),
             "Errors": tk.StringVar(value="0"),
             "Elapsed Time": tk.StringVar(value="00:00:00"),
-            "Downloaded": tk.StringVar(value="0 KB")
+            "Downloaded": tk.StringVar(value="0 KB"),
+            "Connection Reuse": tk.StringVar(value="0%"),
+            "Parse Queue": tk.StringVar(value="0"),
+            "Near-Duplicates": tk.StringVar(value="0"),
+            "304 Hit Rate": tk.StringVar(value="0%"),
+            "Bytes Saved": tk.StringVar(value="0 B"),
+            "Healthy Proxies": tk.StringVar(value="-"),
+            "Throttled (429/503)": tk.StringVar(value="0"),
+            "Retries (Waiting)": tk.StringVar(value="0 (0)"),
+            "DNS Errors": tk.StringVar(value="0"),
+            "Connect Errors": tk.StringVar(value="0"),
+            "Timeouts": tk.StringVar(value="0"),
+            "TLS Errors": tk.StringVar(value="0"),
+            "HTTP 4xx": tk.StringVar(value="0"),
+            "HTTP 5xx": tk.StringVar(value="0"),
+            "Fetch p50/p95/p99": tk.StringVar(value="-"),
+            "Parse p50/p95/p99": tk.StringVar(value="-"),
+            "Page p50/p95/p99": tk.StringVar(value="-")
         }
 
         for i, (label_text, var) in enumerate(self.labels.items()):
@@ -46,13 +125,61 @@ class Dashboard(ttk.Frame):
                 row=i//2, column=i%2*2+1, sticky="w", padx=5, pady=2
             )
 
+        # Request limits of the busiest hosts, as set by adaptive host control
+        self.hosts_frame = ttk.LabelFrame(self.paned, text="Hosts", padding="5")
+        self.paned.add(self.hosts_frame, weight=1)
+
+        columns = ("queued", "active", "limit", "delay", "latency", "throttled")
+        self.hosts_tree = ttk.Treeview(self.hosts_frame, columns=columns, height=6)
+        self.hosts_tree.heading("#0", text="Host")
+        self.hosts_tree.column("#0", width=250)
+        for column, heading in zip(columns, ("Queued", "Active", "Limit", "Delay", "Latency", "429/503")):
+            self.hosts_tree.heading(column, text=heading)
+            self.hosts_tree.column(column, width=70, anchor="e")
+        self.hosts_tree.pack(side=tk.LEFT, fill=tk.BOTH, expand=True, padx=5, pady=5)
+
+        # Hosts with the most pages crawled
+        columns = ("pages", "bytes", "errors", "latency")
+        self.top_hosts_tree = ttk.Treeview(self.hosts_frame, columns=columns, height=6)
+        self.top_hosts_tree.heading("#0", text="Top Host")
+        self.top_hosts_tree.column("#0", width=200)
+        for column, heading in zip(columns, ("Pages", "Downloaded", "Errors", "Avg Fetch")):
+            self.top_hosts_tree.heading(column, text=heading)
+            self.top_hosts_tree.column(column, width=80, anchor="e")
+        self.top_hosts_tree.pack(side=tk.LEFT, fill=tk.BOTH, expand=True, padx=5, pady=5)
+
+        # Filled while "Trace Stages" is on
+        self.stages_frame = ttk.LabelFrame(self.paned, text="Time by Stage", padding="5")
+        self.paned.add(self.stages_frame, weight=1)
+
+        columns = ("calls", "total", "mean", "share")
+        self.stages_tree = ttk.Treeview(self.stages_frame, columns=columns, height=6)
+        self.stages_tree.heading("#0", text="Stage")
+        self.stages_tree.column("#0", width=150)
+        for column, heading in zip(columns, ("Calls", "Total", "Mean", "Share")):
+            self.stages_tree.heading(column, text=heading)
+            self.stages_tree.column(column, width=90, anchor="e")
+        self.stages_tree.pack(fill=tk.BOTH, expand=True, padx=5, pady=5)
+
         self.log_frame = ttk.LabelFrame(self.paned, text="Crawler Logs", padding="5")
         self.paned.add(self.log_frame, weight=2)
 
+        log_controls = ttk.Frame(self.log_frame)
+        log_controls.pack(fill=tk.X, padx=5)
+        # Sets the root logger's level, so records below it are not even created
+        ttk.Label(log_controls, text="Level:").pack(side=tk.LEFT)
+        self.log_level_var = tk.StringVar(value=logging.getLevelName(logging.getLogger().getEffectiveLevel()))
+        level_box = ttk.Combobox(log_controls, textvariable=self.log_level_var, values=LOG_LEVELS,
+                                 state="readonly", width=10)
+        level_box.pack(side=tk.LEFT, padx=5)
+        level_box.bind("<<ComboboxSelected>>", self.set_log_level)
+        self.log_status_var = tk.StringVar(value="")
+        ttk.Label(log_controls, textvariable=self.log_status_var).pack(side=tk.RIGHT)
+
         self.log_text = scrolledtext.ScrolledText(self.log_frame, height=10, wrap=tk.WORD)
         self.log_text.pack(fill=tk.BOTH, expand=True, padx=5, pady=5)
 
-        self.log_handler = LogHandler(self.log_text)
+        self.log_handler = QueueLogHandler()
         self.log_handler.setFormatter(
             logging.Formatter('%(asctime)s - %(levelname)s - %(message)s')
         )
@@ -63,13 +190,68 @@ class Dashboard(ttk.Frame):
         self.log_text.tag_configure("INFO", foreground="black")
         self.log_text.tag_configure("DEBUG", foreground="gray")
 
+    def set_log_level(self, event=None) -> None:
+        logging.getLogger().setLevel(self.log_level_var.get())
+
+    def drain_logs(self) -> None:
+        # Runs on the Tk thread: inserts a batch of records with one call and
+        # trims the widget to the last max_log_lines lines
+        batch = self.log_handler.drain(self.log_batch)
+        if batch:
+            chunks = []
+            for sequence, record in batch:
+                self.dropped += sequence - self.next_sequence
+                self.next_sequence = sequence + 1
+                line = self.log_handler.format(record)
+                suppressed = getattr(record, "suppressed", 0)
+                if suppressed:
+                    line += f" (+{suppressed} similar suppressed)"
+                chunks.extend((line + "\n", record.levelname))
+
+            follow = self.log_text.yview()[1] >= 1.0
+            self.log_text.insert(tk.END, *chunks)
+            lines = int(self.log_text.index("end-1c").split(".")[0]) - 1
+            if lines > self.max_log_lines:
+                self.log_text.delete("1.0", f"{lines - self.max_log_lines + 1}.0")
+            if follow:
+                self.log_text.see(tk.END)
+
+        self.log_status_var.set(
+            f"Queued: {len(self.log_handler.records)}  Dropped: {self.dropped}  Sampled out: {self.log_handler.suppressed}"
+        )
+        self.after(self.log_interval, self.drain_logs)
+
     def update_stats(self, stats: Dict[str, Any]) -> None:
         self.labels["Pages Crawled"].set(str(stats["pages_crawled"]))
         self.labels["Crawl Speed"].set(f"{stats['crawl_speed']:.1f} pages/min")
+        self.labels["Throughput (10s)"].set(
+            f"{stats['pages_per_second']:.1f} pages/s, {self._format_bytes(int(stats['bytes_per_second']))}/s"
+        )
+        for label, name in (("Fetch", "fetch"), ("Parse", "parse"), ("Page", "total")):
+            self.labels[f"{label} p50/p95/p99"].set(
+                "/".join(f"{stats[f'{name}_{q}'] * 1000:.1f}" for q in ("p50", "p95", "p99")) + " ms"
+            )
         self.labels["Memory Usage"].set(f"{stats['memory_usage']:.1f} MB")
         self.labels["Queue Size"].set(str(stats["urls_in_queue"]))
         self.labels["Current Depth"].set(str(stats["current_depth"]))
         self.labels["Errors"].set(str(stats["errors"]))
+        self.labels["Connection Reuse"].set(f"{stats['connection_reuse_ratio'] * 100:.0f}%")
+        self.labels["Parse Queue"].set(str(stats["parse_queue"]))
+        self.labels["Near-Duplicates"].set(str(stats["duplicates"]))
+        self.labels["304 Hit Rate"].set(f"{stats['revalidation_hit_rate'] * 100:.0f}%")
+        self.labels["Bytes Saved"].set(self._format_bytes(stats["bytes_saved"]))
+        self.labels["Throttled (429/503)"].set(str(stats["throttled"]))
+        self.labels["Retries (Waiting)"].set(f"{stats['retries']} ({stats['retry_queue']})")
+        self.labels["DNS Errors"].set(str(stats["errors_dns"]))
+        self.labels["Connect Errors"].set(str(stats["errors_connect"]))
+        self.labels["Timeouts"].set(str(stats["errors_timeout"]))
+        self.labels["TLS Errors"].set(str(stats["errors_tls"]))
+        self.labels["HTTP 4xx"].set(str(stats["errors_http_4xx"]))
+        self.labels["HTTP 5xx"].set(str(stats["errors_http_5xx"]))
+        if stats["total_proxies"]:
+            self.labels["Healthy Proxies"].set(f"{stats['healthy_proxies']}/{stats['total_proxies']}")
+        else:
+            self.labels["Healthy Proxies"].set("-")
 
         elapsed = stats["elapsed_time"]
         hours = int(elapsed // 3600)
@@ -77,11 +259,36 @@ class Dashboard(ttk.Frame):
         seconds = int(elapsed % 60)
         self.labels["Elapsed Time"].set(f"{hours:02d}:{minutes:02d}:{seconds:02d}")
 
-        bytes_downloaded = stats["bytes_downloaded"]
-        if bytes_downloaded < 1024:
-            size_str = f"{bytes_downloaded} B"
-        elif bytes_downloaded < 1024 * 1024:
-            size_str = f"{bytes_downloaded/1024:.1f} KB"
-        else:
-            size_str = f"{bytes_downloaded/1024/1024:.1f} MB"
-        self.labels["Downloaded"].set(size_str)
\ No newline at end of file
+        self.labels["Downloaded"].set(self._format_bytes(stats["bytes_downloaded"]))
+
+    def update_hosts(self, hosts: List[Dict[str, Any]]) -> None:
+        self.hosts_tree.delete(*self.hosts_tree.get_children())
+        for host in hosts:
+            latency = f"{host['latency'] * 1000:.0f} ms" if host["latency"] is not None else "-"
+            self.hosts_tree.insert("", tk.END, text=host["host"], values=(
+                host["queued"], host["active"], host["limit"], f"{host['delay']:.2f}s", latency, host["throttled"]
+            ))
+
+    def update_top_hosts(self, hosts: List[Dict[str, Any]]) -> None:
+        self.top_hosts_tree.delete(*self.top_hosts_tree.get_children())
+        for host in hosts:
+            latency = f"{host['latency'] * 1000:.0f} ms" if host["latency"] is not None else "-"
+            self.top_hosts_tree.insert("", tk.END, text=host["host"], values=(
+                host["pages"], self._format_bytes(host["bytes"]), host["errors"], latency
+            ))
+
+    def update_stages(self, stages: List[Dict[str, Any]]) -> None:
+        self.stages_tree.delete(*self.stages_tree.get_children())
+        for stage in stages:
+            self.stages_tree.insert("", tk.END, text=stage["stage"], values=(
+                stage["count"], f"{stage['seconds']:.2f} s", f"{stage['mean'] * 1000:.2f} ms",
+                f"{stage['share'] * 100:.1f}%"
+            ))
+
+    @staticmethod
+    def _format_bytes(count: int) -> str:
+        if count < 1024:
+            return f"{count} B"
+        elif count < 1024 * 1024:
+            return f"{count/1024:.1f} KB"
+        return f"{count/1024/1024:.1f} MB"
\ No newline at end of file
@@ -0,0 +1,102 @@
+from array import array
+from typing import Dict, Iterable, Optional, Tuple
+
+# (seconds per point, points kept): an hour of raw samples, a day of
+# 10-second means and a week of 1-minute means
+DEFAULT_LEVELS = ((1, 3600), (10, 8640), (60, 10080))
+
+
+class _Ring:
+    # Timestamps and one column per series in preallocated arrays, overwriting
+    # the oldest point once full
+    def __init__(self, names: Tuple[str, ...], capacity: int):
+        self.capacity = capacity
+        self.times = array('d', bytes(8 * capacity))
+        self.columns = {name: array('d', bytes(8 * capacity)) for name in names}
+        self.start = 0
+        self.count = 0
+
+    def append(self, timestamp: float, values: Dict[str, float]) -> None:
+        index = (self.start + self.count) % self.capacity
+        if self.count == self.capacity:
+            self.start = (self.start + 1) % self.capacity
+        else:
+            self.count += 1
+        self.times[index] = timestamp
+        for name, column in self.columns.items():
+            column[index] = values[name]
+
+    def since(self, timestamp: float) -> Tuple[array, Dict[str, array]]:
+        # Points at or after timestamp, oldest first
+        low, high = 0, self.count
+        while low < high:
+            middle = (low + high) // 2
+            if self.times[(self.start + middle) % self.capacity] < timestamp:
+                low = middle + 1
+            else:
+                high = middle
+        return self._slice(self.times, low), {name: self._slice(column, low) for name, column in self.columns.items()}
+
+    def _slice(self, data: array, first: int) -> array:
+        begin = (self.start + first) % self.capacity
+        end = begin + self.count - first
+        if end <= self.capacity:
+            return data[begin:end]
+        return data[begin:] + data[:end - self.capacity]
+
+
+# History of several series sampled together, kept at several resolutions.
+# Every sample goes into the raw ring; each coarser ring gets the mean of its
+# interval once the interval is complete. Memory is fixed at creation, so an
+# overnight crawl costs no more than a short one.
+class TimeSeriesHistory:
+    def __init__(self, names: Iterable[str], levels: Tuple[Tuple[int, int], ...] = DEFAULT_LEVELS):
+        self.names = tuple(names)
+        self.levels = [(resolution, _Ring(self.names, capacity)) for resolution, capacity in levels]
+        # Interval number, sample count and sums of the rollup being filled at each level
+        self.pending: list = [None] * len(self.levels)
+
+    def __len__(self) -> int:
+        return self.levels[0][1].count
+
+    def add(self, timestamp: float, values: Dict[str, float]) -> None:
+        self.levels[0][1].append(timestamp, values)
+        for level, (resolution, ring) in enumerate(self.levels[1:], 1):
+            interval = int(timestamp // resolution)
+            pending = self.pending[level]
+            if pending is not None and pending[0] != interval:
+                count = pending[1]
+                ring.append((pending[0] + 0.5) * resolution,
+                            {name: total / count for name, total in pending[2].items()})
+                pending = None
+            if pending is None:
+                pending = self.pending[level] = [interval, 0, dict.fromkeys(self.names, 0.0)]
+            pending[1] += 1
+            sums = pending[2]
+            for name in self.names:
+                sums[name] += values[name]
+
+    def window(self, span: float, max_points: int = 720) -> Tuple[array, Dict[str, array]]:
+        # The last `span` seconds at the finest resolution that needs at most
+        # about max_points points, or that still holds everything recorded
+        latest = self.latest()
+        if latest is None:
+            return array('d'), {name: array('d') for name in self.names}
+        ring = self.levels[-1][1]
+        for resolution, level_ring in self.levels:
+            complete = level_ring.count < level_ring.capacity and level_ring.count <= max_points
+            if complete or span / resolution <= max_points:
+                ring = level_ring
+                break
+        times, columns = ring.since(latest - span)
+        step = -(-len(times) // max_points)
+        if step > 1:
+            times = times[::step]
+            columns = {name: column[::step] for name, column in columns.items()}
+        return times, columns
+
+    def latest(self) -> Optional[float]:
+        raw = self.levels[0][1]
+        if not raw.count:
+            return None
+        return raw.times[(raw.start + raw.count - 1) % raw.capacity]
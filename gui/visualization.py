@@ -1,71 +1,155 @@
 import tkinter as tk
 from tkinter import ttk
-import matplotlib
-
-matplotlib.use('TkAgg')
-from matplotlib.figure import Figure
-from matplotlib.backends.backend_tkagg import FigureCanvasTkAgg
 from typing import Dict, Any
 import time
-from collections import deque
-
 
+from gui.timeseries import TimeSeriesHistory
+
+# (stat, title, y label)
+SERIES = (
+    ("crawl_speed", "Crawl Speed", "Pages/min"),
+    ("memory_usage", "Memory Usage", "MB"),
+    ("urls_in_queue", "URLs in Queue", "Count")
+)
+# (label, seconds shown, seconds per x unit, x label)
+RANGES = (
+    ("5 min", 300, 60, "Minutes"),
+    ("1 hour", 3600, 60, "Minutes"),
+    ("24 hours", 86400, 3600, "Hours"),
+    ("7 days", 604800, 3600, "Hours")
+)
+
+
+# Live charts of the crawl. Samples go into a multi-resolution history from the
+# start, whether or not the charts are shown. matplotlib takes most of the
+# application's startup time, so it is imported and the figure built only when
+# the tab is first shown, and nothing is drawn while the tab is hidden.
+#
+# The lines are animated artists: a full draw renders only the axes, which are
+# saved as backgrounds, and each update restores the backgrounds and blits the
+# lines on top. Axes limits leave headroom, so a full draw is only needed when
+# the data leaves them, the range changes or the window is resized.
 class CrawlerVisualization(ttk.Frame):
     def __init__(self, parent):
         super().__init__(parent)
-        self.setup_plots()
+        self.canvas = None
+        self.backgrounds = None
+        self.limits = None
+        self.history = TimeSeriesHistory(name for name, _, _ in SERIES)
+        self.start_time = time.time()
 
-        self.timestamps = deque(maxlen=100)
-        self.crawl_speeds = deque(maxlen=100)
-        self.memory_usage = deque(maxlen=100)
-        self.urls_queue = deque(maxlen=100)
+        controls = ttk.Frame(self)
+        controls.pack(fill=tk.X, padx=5, pady=5)
+        ttk.Label(controls, text="Range:").pack(side=tk.LEFT)
+        self.range_var = tk.StringVar(value=RANGES[0][0])
+        range_box = ttk.Combobox(controls, textvariable=self.range_var, values=[r[0] for r in RANGES],
+                                 state="readonly", width=10)
+        range_box.pack(side=tk.LEFT, padx=5)
+        range_box.bind("<<ComboboxSelected>>", self.change_range)
 
-        self.start_time = time.time()
+        self.bind("<Map>", self.on_show)
 
-    def setup_plots(self):
-        self.figure = Figure(figsize=(10, 6), dpi=100)
-        self.figure.subplots_adjust(hspace=0.4)
+    def on_show(self, event=None):
+        if self.canvas is None:
+            self.setup_plots()
+        self.redraw()
 
-        self.speed_plot = self.figure.add_subplot(311)
-        self.speed_plot.set_title('Crawl Speed')
-        self.speed_plot.set_ylabel('Pages/min')
-        self.speed_line, = self.speed_plot.plot([], [])
+    def setup_plots(self):
+        import matplotlib
 
-        self.memory_plot = self.figure.add_subplot(312)
-        self.memory_plot.set_title('Memory Usage')
-        self.memory_plot.set_ylabel('MB')
-        self.memory_line, = self.memory_plot.plot([], [])
+        matplotlib.use('TkAgg')
+        from matplotlib.figure import Figure
+        from matplotlib.backends.backend_tkagg import FigureCanvasTkAgg
 
-        self.queue_plot = self.figure.add_subplot(313)
-        self.queue_plot.set_title('URLs in Queue')
-        self.queue_plot.set_ylabel('Count')
-        self.queue_line, = self.queue_plot.plot([], [])
+        self.figure = Figure(figsize=(10, 6), dpi=100)
+        self.figure.subplots_adjust(hspace=0.5)
+
+        self.plots = []
+        self.lines = []
+        for i, (_, title, ylabel) in enumerate(SERIES):
+            plot = self.figure.add_subplot(len(SERIES), 1, i + 1)
+            plot.set_title(title)
+            plot.set_ylabel(ylabel)
+            line, = plot.plot([], [], animated=True)
+            self.plots.append(plot)
+            self.lines.append(line)
 
         self.canvas = FigureCanvasTkAgg(self.figure, master=self)
-        self.canvas.draw()
+        self.canvas.mpl_connect("draw_event", self.on_draw)
         self.canvas.get_tk_widget().pack(fill=tk.BOTH, expand=True)
 
-    def update_plots(self, stats: Dict[str, Any]) -> None:
-        current_time = time.time() - self.start_time
-        self.timestamps.append(current_time)
-
-        self.crawl_speeds.append(stats['crawl_speed'])
-        self.memory_usage.append(stats['memory_usage'])
-        self.urls_queue.append(stats['urls_in_queue'])
+    def on_draw(self, event=None):
+        # After every full draw (including resizes), save the axes without the lines
+        self.backgrounds = [self.canvas.copy_from_bbox(plot.bbox) for plot in self.plots]
+        self.blit()
 
-        self.speed_line.set_data(list(self.timestamps), list(self.crawl_speeds))
-        self.memory_line.set_data(list(self.timestamps), list(self.memory_usage))
-        self.queue_line.set_data(list(self.timestamps), list(self.urls_queue))
-
-        for plot in [self.speed_plot, self.memory_plot, self.queue_plot]:
-            plot.relim()
-            plot.autoscale_view()
-
-        self.canvas.draw()
+    def update_plots(self, stats: Dict[str, Any]) -> None:
+        self.history.add(time.time() - self.start_time, {name: stats[name] for name, _, _ in SERIES})
+        self.redraw()
+
+    def change_range(self, event=None):
+        self.limits = None
+        self.redraw()
+
+    def current_range(self):
+        for label, span, unit, xlabel in RANGES:
+            if label == self.range_var.get():
+                return span, unit, xlabel
+        return RANGES[0][1:]
+
+    def redraw(self) -> None:
+        if self.canvas is None or not self.winfo_viewable():
+            return
+
+        span, unit, xlabel = self.current_range()
+        times, columns = self.history.window(span)
+        x = [t / unit for t in times]
+        for line, (name, _, _) in zip(self.lines, SERIES):
+            line.set_data(x, columns[name])
+
+        limits = self.fit_limits(x, columns, span / unit)
+        if limits != self.limits or self.backgrounds is None:
+            self.limits = limits
+            _, (xmin, xmax), tops = limits
+            for plot, top in zip(self.plots, tops):
+                plot.set_xlim(xmin, xmax)
+                plot.set_ylim(0, top)
+            self.plots[-1].set_xlabel(xlabel)
+            # Calls on_draw, which saves the backgrounds and blits the lines
+            self.canvas.draw()
+        else:
+            self.blit()
+
+    def fit_limits(self, x, columns, width):
+        # Keeps the current limits while the data fits in them. The x axis jumps
+        # ahead by a fifth of the range at a time; a y axis grows to 1.5 times its
+        # data and shrinks once the data falls under a quarter of it.
+        previous = self.limits
+        if previous and previous[0] == width and (not x or previous[1][0] <= x[0] and x[-1] <= previous[1][1]):
+            xlim = previous[1]
+        else:
+            right = (x[-1] if x else 0) + width * 0.2
+            xlim = (right - width * 1.2, right)
+
+        tops = []
+        for i, (name, _, _) in enumerate(SERIES):
+            peak = max(columns[name], default=0)
+            top = previous[2][i] if previous else 0
+            if peak > top or peak < top / 4 or not top:
+                top = max(peak * 1.5, 1)
+            tops.append(top)
+        return width, xlim, tuple(tops)
+
+    def blit(self) -> None:
+        if self.backgrounds is None:
+            return
+        for plot, line, background in zip(self.plots, self.lines, self.backgrounds):
+            self.canvas.restore_region(background)
+            plot.draw_artist(line)
+            self.canvas.blit(plot.bbox)
 
     def reset(self):
-        self.timestamps.clear()
-        self.crawl_speeds.clear()
-        self.memory_usage.clear()
-        self.urls_queue.clear()
+        self.history = TimeSeriesHistory(name for name, _, _ in SERIES)
         self.start_time = time.time()
+        self.limits = None
+        self.redraw()
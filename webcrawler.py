@@ -1,56 +1,39 @@
 import tkinter as tk
 from tkinter import ttk, messagebox
-import threading
-import queue
-import os
 import logging
 from typing import Optional
-from concurrent.futures import ThreadPoolExecutor
-import time
-import requests
-from bs4 import BeautifulSoup
-from urllib.parse import urljoin
-import json
-from datetime import datetime
-import pandas as pd
-import html
-
-
-from crawler.robots import RobotsParser
-from crawler.proxy_manager import ProxyManager
-from crawler.url_filter import URLFilter
-from crawler.stats import CrawlerStats
+
+
+from crawler.canonicalizer import DEFAULT_STRIP_PARAMS
+from crawler.seen_set import SEEN_SET_BACKENDS
+from crawler.extractor import EXTRACTOR_BACKENDS
+from crawler.sinks import ParquetSink
+from crawler.tracing import PROFILE_MODES
 from gui.dashboard import Dashboard
 from gui.visualization import CrawlerVisualization
 
+# The Tkinter client of CrawlEngine: builds a CrawlConfig from the form and
+# shows the engine's progress. Engine callbacks run on crawl threads, so they
+# are handed to the Tk event loop with root.after. The engine, and with it the
+# HTTP stack, is imported on the first crawl so the window opens quickly.
 class EnhancedWebCrawler:
     def __init__(self, root):
         self.root = root
         self.root.title("Web Crawler")
         self.root.geometry("1200x800")
 
-        self.user_agent_var = tk.StringVar(value="WebCrawler/1.0")
-        self.crawled_data = []
-
         self.setup_logging()
 
-        self.robots_parser = RobotsParser(user_agent=self.user_agent_var.get())
-        self.proxy_manager = ProxyManager()
-        self.url_filter = URLFilter()
-        self.stats = CrawlerStats()
-
-        self.crawl_queue = queue.Queue()
-        self.visited_urls = set()
-        self.stop_requested = False
-        self.pause_requested = False
-        self.thread_pool = None
-        self.max_workers = 5
+        self.engine = None
+        self.include_patterns = []
+        self.exclude_patterns = []
 
         self.setup_ui()
 
     def setup_logging(self):
+        # DEBUG logs several lines per URL; the Dashboard's level control can switch to it
         logging.basicConfig(
-            level=logging.DEBUG,
+            level=logging.INFO,
             format='%(asctime)s - %(levelname)s - %(name)s - %(message)s'
         )
         self.logger = logging.getLogger(__name__)
@@ -68,6 +51,10 @@ class EnhancedWebCrawler:
 
         self.setup_filter_frame()
 
+        self.setup_proxy_frame()
+
+        self.setup_persistence_frame()
+
         self.setup_control_frame()
 
         self.setup_status_frame()
@@ -98,7 +85,7 @@ class EnhancedWebCrawler:
         self.workers_var = tk.StringVar(value="5")
         ttk.Entry(settings_frame, textvariable=self.workers_var, width=10).grid(row=0, column=3, sticky="w", padx=5)
 
-        ttk.Label(settings_frame, text="Rate Limit (seconds):").grid(row=1, column=0, sticky="w", padx=5)
+        ttk.Label(settings_frame, text="Delay per Host (seconds):").grid(row=1, column=0, sticky="w", padx=5)
         self.rate_limit_var = tk.StringVar(value="1")
         ttk.Entry(settings_frame, textvariable=self.rate_limit_var, width=10).grid(row=1, column=1, sticky="w", padx=5)
 
@@ -106,6 +93,64 @@ class EnhancedWebCrawler:
         self.user_agent_var = tk.StringVar(value="EnhancedWebCrawler/1.0")
         ttk.Entry(settings_frame, textvariable=self.user_agent_var, width=40).grid(row=1, column=3, columnspan=2, sticky="w", padx=5)
 
+        ttk.Label(settings_frame, text="Engine:").grid(row=2, column=0, sticky="w", padx=5)
+        self.engine_var = tk.StringVar(value="threaded")
+        ttk.Combobox(settings_frame, textvariable=self.engine_var, values=("threaded", "asyncio"),
+                     state="readonly", width=10).grid(row=2, column=1, sticky="w", padx=5)
+
+        ttk.Label(settings_frame, text="Connections per Host:").grid(row=2, column=2, sticky="w", padx=5)
+        self.pool_size_var = tk.StringVar(value="10")
+        ttk.Entry(settings_frame, textvariable=self.pool_size_var, width=10).grid(row=2, column=3, sticky="w", padx=5)
+
+        self.keep_alive_var = tk.BooleanVar(value=True)
+        ttk.Checkbutton(settings_frame, text="Keep-Alive", variable=self.keep_alive_var).grid(row=2, column=4, sticky="w", padx=5)
+
+        ttk.Label(settings_frame, text="Requests per Host:").grid(row=3, column=0, sticky="w", padx=5)
+        self.host_concurrency_var = tk.StringVar(value="4")
+        ttk.Entry(settings_frame, textvariable=self.host_concurrency_var, width=10).grid(row=3, column=1, sticky="w", padx=5)
+
+        ttk.Label(settings_frame, text="Seen-URL Store:").grid(row=3, column=2, sticky="w", padx=5)
+        self.seen_backend_var = tk.StringVar(value="exact")
+        ttk.Combobox(settings_frame, textvariable=self.seen_backend_var, values=SEEN_SET_BACKENDS,
+                     state="readonly", width=10).grid(row=3, column=3, sticky="w", padx=5)
+
+        ttk.Label(settings_frame, text="Bloom Error Rate:").grid(row=3, column=4, sticky="w", padx=5)
+        self.bloom_error_var = tk.StringVar(value="0.001")
+        ttk.Entry(settings_frame, textvariable=self.bloom_error_var, width=10).grid(row=3, column=5, sticky="w", padx=5)
+
+        ttk.Label(settings_frame, text="HTML Parser:").grid(row=4, column=0, sticky="w", padx=5)
+        self.extractor_var = tk.StringVar(value="auto")
+        ttk.Combobox(settings_frame, textvariable=self.extractor_var, values=EXTRACTOR_BACKENDS,
+                     state="readonly", width=10).grid(row=4, column=1, sticky="w", padx=5)
+
+        # 0 parses in the fetch workers; more moves parsing to separate processes
+        ttk.Label(settings_frame, text="Parse Processes:").grid(row=4, column=2, sticky="w", padx=5)
+        self.parse_workers_var = tk.StringVar(value="0")
+        ttk.Entry(settings_frame, textvariable=self.parse_workers_var, width=10).grid(row=4, column=3, sticky="w", padx=5)
+
+        # Links of pages whose text is within this many SimHash bits of an earlier page are not followed
+        ttk.Label(settings_frame, text="Near-Duplicate Bits:").grid(row=5, column=0, sticky="w", padx=5)
+        self.dedup_distance_var = tk.StringVar(value="3")
+        ttk.Entry(settings_frame, textvariable=self.dedup_distance_var, width=10).grid(row=5, column=1, sticky="w", padx=5)
+
+        self.dedup_var = tk.BooleanVar(value=True)
+        ttk.Checkbutton(settings_frame, text="Skip Near-Duplicates", variable=self.dedup_var).grid(row=5, column=2, sticky="w", padx=5)
+
+        # With adaptive limits, "Requests per Host" is the most a host can reach; requests
+        # still start at most once per "Delay per Host" seconds, so parallel requests only
+        # add up where responses are slower than that
+        self.adaptive_var = tk.BooleanVar(value=True)
+        ttk.Checkbutton(settings_frame, text="Adaptive Host Limits", variable=self.adaptive_var).grid(row=6, column=0, sticky="w", padx=5)
+
+        ttk.Label(settings_frame, text="Max Total Requests:").grid(row=6, column=2, sticky="w", padx=5)
+        self.global_limit_var = tk.StringVar(value="0")
+        ttk.Entry(settings_frame, textvariable=self.global_limit_var, width=10).grid(row=6, column=3, sticky="w", padx=5)
+
+        # Timeouts, connection errors, 5xx and 429 responses are retried with backoff
+        ttk.Label(settings_frame, text="Max Retries:").grid(row=6, column=4, sticky="w", padx=5)
+        self.max_retries_var = tk.StringVar(value="3")
+        ttk.Entry(settings_frame, textvariable=self.max_retries_var, width=10).grid(row=6, column=5, sticky="w", padx=5)
+
     def setup_filter_frame(self):
         filter_frame = ttk.LabelFrame(self.main_frame, text="URL Filters", padding="5")
         filter_frame.pack(fill=tk.X, padx=5, pady=5)
@@ -120,6 +165,78 @@ class EnhancedWebCrawler:
         ttk.Entry(filter_frame, textvariable=self.exclude_pattern_var, width=40).grid(row=1, column=1, sticky="ew", padx=5)
         ttk.Button(filter_frame, text="Add Exclude", command=self.add_exclude_pattern).grid(row=1, column=2, padx=5)
 
+        ttk.Label(filter_frame, text="Strip Query Params:").grid(row=2, column=0, sticky="w", padx=5)
+        self.strip_params_var = tk.StringVar(value=", ".join(DEFAULT_STRIP_PARAMS))
+        ttk.Entry(filter_frame, textvariable=self.strip_params_var, width=40).grid(row=2, column=1, sticky="ew", padx=5)
+
+        self.sort_query_var = tk.BooleanVar(value=True)
+        ttk.Checkbutton(filter_frame, text="Sort Query Params", variable=self.sort_query_var).grid(row=2, column=2, sticky="w", padx=5)
+
+        ttk.Label(filter_frame, text="Allowed Domains:").grid(row=3, column=0, sticky="w", padx=5)
+        self.allowed_domains_var = tk.StringVar()
+        ttk.Entry(filter_frame, textvariable=self.allowed_domains_var, width=40).grid(row=3, column=1, sticky="ew", padx=5)
+        ttk.Label(filter_frame, text="e.g. example.com, *.example.org").grid(row=3, column=2, sticky="w", padx=5)
+
+    def setup_proxy_frame(self):
+        proxy_frame = ttk.LabelFrame(self.main_frame, text="Proxies", padding="5")
+        proxy_frame.pack(fill=tk.X, padx=5, pady=5)
+
+        ttk.Label(proxy_frame, text="Proxies:").grid(row=0, column=0, sticky="w", padx=5)
+        self.proxies_var = tk.StringVar()
+        ttk.Entry(proxy_frame, textvariable=self.proxies_var, width=40).grid(row=0, column=1, columnspan=3, sticky="ew", padx=5)
+        ttk.Label(proxy_frame, text="e.g. 10.0.0.1:3128, socks5://10.0.0.2:1080").grid(row=0, column=4, sticky="w", padx=5)
+
+        # Proxies are tested against this URL before the crawl and while quarantined
+        ttk.Label(proxy_frame, text="Check URL:").grid(row=1, column=0, sticky="w", padx=5)
+        self.proxy_check_url_var = tk.StringVar()
+        ttk.Entry(proxy_frame, textvariable=self.proxy_check_url_var, width=25).grid(row=1, column=1, sticky="w", padx=5)
+
+        ttk.Label(proxy_frame, text="Quarantine (seconds):").grid(row=1, column=2, sticky="w", padx=5)
+        self.proxy_cooldown_var = tk.StringVar(value="30")
+        ttk.Entry(proxy_frame, textvariable=self.proxy_cooldown_var, width=10).grid(row=1, column=3, sticky="w", padx=5)
+
+    def setup_persistence_frame(self):
+        persistence_frame = ttk.LabelFrame(self.main_frame, text="Persistence", padding="5")
+        persistence_frame.pack(fill=tk.X, padx=5, pady=5)
+
+        ttk.Label(persistence_frame, text="State Directory:").grid(row=0, column=0, sticky="w", padx=5)
+        self.state_dir_var = tk.StringVar(value="crawl_state")
+        ttk.Entry(persistence_frame, textvariable=self.state_dir_var, width=40).grid(row=0, column=1, columnspan=3, sticky="ew", padx=5)
+
+        ttk.Label(persistence_frame, text="URLs in Memory:").grid(row=1, column=0, sticky="w", padx=5)
+        self.hot_window_var = tk.StringVar(value="100000")
+        ttk.Entry(persistence_frame, textvariable=self.hot_window_var, width=10).grid(row=1, column=1, sticky="w", padx=5)
+
+        ttk.Label(persistence_frame, text="Checkpoint Interval (seconds):").grid(row=1, column=2, sticky="w", padx=5)
+        self.checkpoint_interval_var = tk.StringVar(value="30")
+        ttk.Entry(persistence_frame, textvariable=self.checkpoint_interval_var, width=10).grid(row=1, column=3, sticky="w", padx=5)
+
+        ttk.Label(persistence_frame, text="Results:").grid(row=2, column=0, sticky="w", padx=5)
+        self.stream_csv_var = tk.BooleanVar(value=False)
+        ttk.Checkbutton(persistence_frame, text="Also Write CSV", variable=self.stream_csv_var).grid(row=2, column=1, sticky="w", padx=5)
+        self.compress_results_var = tk.BooleanVar(value=False)
+        ttk.Checkbutton(persistence_frame, text="Compress (gzip)", variable=self.compress_results_var).grid(row=2, column=2, sticky="w", padx=5)
+        self.stream_parquet_var = tk.BooleanVar(value=False)
+        ttk.Checkbutton(persistence_frame, text="Also Write Parquet", variable=self.stream_parquet_var).grid(row=2, column=3, sticky="w", padx=5)
+
+        ttk.Label(persistence_frame, text="Robots Cache:").grid(row=3, column=0, sticky="w", padx=5)
+        self.robots_cache_var = tk.StringVar(value="robots_cache.sqlite")
+        ttk.Entry(persistence_frame, textvariable=self.robots_cache_var, width=25).grid(row=3, column=1, sticky="w", padx=5)
+
+        ttk.Label(persistence_frame, text="Robots TTL (hours):").grid(row=3, column=2, sticky="w", padx=5)
+        self.robots_ttl_var = tk.StringVar(value="24")
+        ttk.Entry(persistence_frame, textvariable=self.robots_ttl_var, width=10).grid(row=3, column=3, sticky="w", padx=5)
+
+        # Validators and links of fetched pages, used to revalidate them on the next crawl
+        ttk.Label(persistence_frame, text="HTTP Cache:").grid(row=4, column=0, sticky="w", padx=5)
+        self.http_cache_var = tk.StringVar(value="http_cache.sqlite")
+        ttk.Entry(persistence_frame, textvariable=self.http_cache_var, width=25).grid(row=4, column=1, sticky="w", padx=5)
+
+        # Serves the stats in Prometheus format on this local port; 0 for none
+        ttk.Label(persistence_frame, text="Metrics Port:").grid(row=4, column=2, sticky="w", padx=5)
+        self.metrics_port_var = tk.StringVar(value="0")
+        ttk.Entry(persistence_frame, textvariable=self.metrics_port_var, width=10).grid(row=4, column=3, sticky="w", padx=5)
+
     def setup_control_frame(self):
         control_frame = ttk.Frame(self.main_frame)
         control_frame.pack(fill=tk.X, padx=5, pady=5)
@@ -127,6 +244,9 @@ class EnhancedWebCrawler:
         self.start_button = ttk.Button(control_frame, text="Start", command=self.start_crawling)
         self.start_button.pack(side=tk.LEFT, padx=5)
 
+        self.resume_crawl_button = ttk.Button(control_frame, text="Resume Crawl", command=self.resume_crawl)
+        self.resume_crawl_button.pack(side=tk.LEFT, padx=5)
+
         self.pause_button = ttk.Button(control_frame, text="Pause", command=self.pause_crawling, state="disabled")
         self.pause_button.pack(side=tk.LEFT, padx=5)
 
@@ -136,6 +256,21 @@ class EnhancedWebCrawler:
         self.export_button = ttk.Button(control_frame, text="Export Report", command=self.show_export_dialog, state="disabled")
         self.export_button.pack(side=tk.LEFT, padx=5)
 
+        # Stage timing can be switched on and off while crawling
+        self.trace_var = tk.BooleanVar(value=False)
+        ttk.Checkbutton(control_frame, text="Trace Stages", variable=self.trace_var,
+                        command=self.toggle_tracing).pack(side=tk.LEFT, padx=5)
+
+        ttk.Label(control_frame, text="Profile Next:").pack(side=tk.LEFT, padx=5)
+        self.profile_pages_var = tk.StringVar(value="200")
+        ttk.Entry(control_frame, textvariable=self.profile_pages_var, width=6).pack(side=tk.LEFT)
+        ttk.Label(control_frame, text="pages").pack(side=tk.LEFT, padx=2)
+        self.profile_mode_var = tk.StringVar(value=PROFILE_MODES[0])
+        ttk.Combobox(control_frame, textvariable=self.profile_mode_var, values=PROFILE_MODES,
+                     state="readonly", width=9).pack(side=tk.LEFT, padx=5)
+        self.profile_button = ttk.Button(control_frame, text="Profile", command=self.start_profile, state="disabled")
+        self.profile_button.pack(side=tk.LEFT, padx=5)
+
     def setup_status_frame(self):
         status_frame = ttk.LabelFrame(self.main_frame, text="Status", padding="5")
         status_frame.pack(fill=tk.X, padx=5, pady=5)
@@ -143,302 +278,184 @@ class EnhancedWebCrawler:
         self.status_var = tk.StringVar(value="Ready")
         ttk.Label(status_frame, textvariable=self.status_var).pack(fill=tk.X)
 
+
     def add_include_pattern(self):
         pattern = self.include_pattern_var.get().strip()
         if pattern:
-            self.url_filter.add_include_pattern(pattern)
+            self.include_patterns.append(pattern)
             self.include_pattern_var.set("")
             messagebox.showinfo("Success", f"Added include pattern: {pattern}")
 
     def add_exclude_pattern(self):
         pattern = self.exclude_pattern_var.get().strip()
         if pattern:
-            self.url_filter.add_exclude_pattern(pattern)
+            self.exclude_patterns.append(pattern)
             self.exclude_pattern_var.set("")
             messagebox.showinfo("Success", f"Added exclude pattern: {pattern}")
 
-    def validate_inputs(self) -> bool:
-        try:
-            max_depth = int(self.depth_var.get())
-            max_workers = int(self.workers_var.get())
-            rate_limit = float(self.rate_limit_var.get())
-
-            if max_depth < 1 or max_workers < 1 or rate_limit < 0:
-                raise ValueError("Invalid input values")
+    def build_config(self):
+        from crawler.engine import CrawlConfig
 
-            return True
+        try:
+            config = CrawlConfig(
+                start_url=self.url_var.get().strip(),
+                max_depth=int(self.depth_var.get()),
+                workers=int(self.workers_var.get()),
+                delay=float(self.rate_limit_var.get()),
+                user_agent=self.user_agent_var.get(),
+                engine=self.engine_var.get(),
+                pool_size=int(self.pool_size_var.get()),
+                keep_alive=self.keep_alive_var.get(),
+                host_concurrency=int(self.host_concurrency_var.get()),
+                adaptive=self.adaptive_var.get(),
+                global_limit=int(self.global_limit_var.get()),
+                max_retries=int(self.max_retries_var.get()),
+                seen_backend=self.seen_backend_var.get(),
+                bloom_error=float(self.bloom_error_var.get()),
+                extractor=self.extractor_var.get(),
+                parse_workers=int(self.parse_workers_var.get()),
+                dedup=self.dedup_var.get(),
+                dedup_distance=int(self.dedup_distance_var.get()),
+                include_patterns=list(self.include_patterns),
+                exclude_patterns=list(self.exclude_patterns),
+                allowed_domains=self.allowed_domains_var.get().split(","),
+                strip_params=self.strip_params_var.get().split(","),
+                sort_query=self.sort_query_var.get(),
+                proxies=self.proxies_var.get().split(","),
+                proxy_check_url=self.proxy_check_url_var.get().strip() or None,
+                proxy_cooldown=float(self.proxy_cooldown_var.get()),
+                state_dir=self.state_dir_var.get().strip(),
+                hot_window=int(self.hot_window_var.get()),
+                checkpoint_interval=float(self.checkpoint_interval_var.get()),
+                stream_csv=self.stream_csv_var.get(),
+                compress_results=self.compress_results_var.get(),
+                stream_parquet=self.stream_parquet_var.get(),
+                robots_cache=self.robots_cache_var.get().strip(),
+                robots_ttl=float(self.robots_ttl_var.get()),
+                http_cache=self.http_cache_var.get().strip(),
+                metrics_port=int(self.metrics_port_var.get()),
+                trace_stages=self.trace_var.get()
+            )
+            return config
         except ValueError:
-            messagebox.showerror("Error", "Please enter valid numeric values for depth, workers, and rate limit")
-            return False
+            messagebox.showerror("Error", "Please enter valid numeric values for the crawler and persistence settings")
+            return None
+
+    def resume_crawl(self):
+        self.start_crawling(resume=True)
 
-    def start_crawling(self):
-        if not self.validate_inputs():
+    def start_crawling(self, resume: bool = False):
+        config = self.build_config()
+        if config is None:
             return
 
-        url = self.url_var.get().strip()
-        if not url:
+        if not config.start_url and not resume:
             messagebox.showerror("Error", "Please enter a start URL")
             return
 
-        self.stop_requested = False
-        self.pause_requested = False
-        self.visited_urls.clear()
-        while not self.crawl_queue.empty():
-            self.crawl_queue.get()
+        if self.engine is None:
+            from crawler.engine import CrawlEngine
+            self.engine = CrawlEngine(on_complete=self.crawl_completed)
+        self.engine.config = config
+        try:
+            self.engine.start(resume)
+        except (ValueError, RuntimeError) as e:
+            messagebox.showerror("Error", str(e))
+            return
+
+        if resume:
+            # The saved crawl's settings replace the form's
+            self.url_var.set(config.start_url)
+            self.depth_var.set(str(config.max_depth))
+            self.stream_csv_var.set(config.stream_csv)
+            self.compress_results_var.set(config.compress_results)
+            self.stream_parquet_var.set(config.stream_parquet)
 
         self.start_button.configure(state="disabled")
+        self.resume_crawl_button.configure(state="disabled")
         self.pause_button.configure(state="normal")
         self.stop_button.configure(state="normal")
+        self.export_button.configure(state="disabled")
+        self.profile_button.configure(state="normal")
         self.status_var.set("Crawling...")
 
-
-        self.stats.start_session()
         self.visualization.reset()
-
-        self.thread_pool = ThreadPoolExecutor(max_workers=int(self.workers_var.get()))
-        threading.Thread(target=self.crawl_worker, args=(url,), daemon=True).start()
-
         self.update_stats()
 
     def pause_crawling(self):
-        if self.pause_requested:
-            self.pause_requested = False
+        if self.engine.pause_requested:
+            self.engine.unpause()
             self.pause_button.configure(text="Pause")
             self.status_var.set("Crawling...")
         else:
-            self.pause_requested = True
+            self.engine.pause()
             self.pause_button.configure(text="Resume")
             self.status_var.set("Paused")
 
     def stop_crawling(self):
-        self.stop_requested = True
+        self.engine.stop()
         self.status_var.set("Stopping...")
         self.pause_button.configure(state="disabled")
         self.stop_button.configure(state="disabled")
 
-    def crawl_worker(self, start_url: str):
-        try:
-            self.crawl_queue.put((start_url, 0))
-            max_depth = int(self.depth_var.get())
-            rate_limit = float(self.rate_limit_var.get())
-
-            while not self.stop_requested and not self.crawl_queue.empty():
-                if self.pause_requested:
-                    time.sleep(1)
-                    continue
-
-                url, depth = self.crawl_queue.get()
-                if depth > max_depth or url in self.visited_urls:
-                    continue
-
-                if not self.url_filter.should_crawl(url):
-                    continue
-
-                self.process_url(url, depth)
-                time.sleep(rate_limit)
-
-            self.crawl_completed()
+    def crawl_completed(self, error: Optional[str] = None):
+        # Called on the crawl thread
+        self.root.after(0, self.update_ui_on_completion, error)
 
-        except Exception as e:
-            self.logger.error(f"Crawl worker error: {str(e)}")
-            self.crawl_completed(error=str(e))
+    def toggle_tracing(self):
+        if self.engine:
+            self.engine.tracer.enabled = self.trace_var.get()
 
-    def process_url(self, url: str, depth: int):
+    def start_profile(self):
         try:
-            self.logger.info(f"Starting to process URL: {url} at depth {depth}")
-
-            if not self.robots_parser.can_fetch(url):
-                self.logger.info(f"Skipping {url} - not allowed by robots.txt")
-                return
-
-            self.logger.debug(f"Current queue size: {self.crawl_queue.qsize()}")
-            self.logger.debug(f"Visited URLs count: {len(self.visited_urls)}")
-
-            headers = {"User-Agent": self.user_agent_var.get()}
-            self.logger.debug(f"Using headers: {headers}")
-
-            self.logger.info(f"Making request to {url}")
-            try:
-                response = requests.get(
-                    url,
-                    headers=headers,
-                    timeout=10
-                )
-                response.raise_for_status()
-            except requests.RequestException as e:
-                self.logger.error(f"Request error for {url}: {str(e)}")
-                self.stats.increment_errors()
-                return
-
-            self.logger.info(f"Successfully downloaded {url}, status code: {response.status_code}")
-
-            self.visited_urls.add(url)
-            self.stats.increment_pages()
-            self.stats.add_bytes_downloaded(len(response.content))
-            self.stats.update_depth(depth)
-
-            self.logger.debug("Parsing page content with BeautifulSoup")
-            soup = BeautifulSoup(response.text, 'html.parser')
-            links = soup.find_all('a', href=True)
-            self.logger.info(f"Found {len(links)} links on page {url}")
-
-            data = {
-                'url': url,
-                'title': soup.title.string if soup.title else '',
-                'timestamp': datetime.now().isoformat(),
-                'depth': depth,
-                'links': [{'text': link.get_text(strip=True), 'href': urljoin(url, link['href'])}
-                         for link in links if link.get('href')]
-            }
-            self.crawled_data.append(data)
-
-
-            for link in links:
-                try:
-                    href = link['href']
-                    self.logger.debug(f"Processing link: {href}")
-                    next_url = urljoin(url, href)
-                    self.logger.debug(f"Joined URL: {next_url}")
-
-                    if self.url_filter.should_crawl(next_url):
-                        self.logger.debug(f"Adding URL to queue: {next_url}")
-                        self.crawl_queue.put((next_url, depth + 1))
-                except Exception as link_error:
-                    self.logger.error(f"Error processing link {link.get('href', '')}: {str(link_error)}")
-                    continue
-
-            self.stats.update_queue_size(self.crawl_queue.qsize())
-
-        except Exception as e:
-            self.logger.error(f"Error processing {url}: {str(e)}")
-            self.logger.exception("Full traceback for processing error:")
-            self.stats.increment_errors()
-
-    def crawl_completed(self, error: Optional[str] = None):
-        self.thread_pool.shutdown(wait=True)
-        self.stats.stop_session()
-
-        if not error:
-            self.export_button.configure(state="normal")
+            pages = int(self.profile_pages_var.get())
+        except ValueError:
+            messagebox.showerror("Error", "Please enter the number of pages to profile")
+            return
+        try:
+            path = self.engine.profile(pages, self.profile_mode_var.get(), on_done=self.profile_written)
+        except (ValueError, RuntimeError) as e:
+            messagebox.showerror("Error", str(e))
+            return
+        self.status_var.set(f"Crawling... profiling the next {pages} pages to {path}")
 
-        self.root.after(0, self.update_ui_on_completion, error)
+    def profile_written(self, path: Optional[str]):
+        # Called from a crawl thread
+        message = f"Profile written to {path}" if path else "The profile could not be written, see the log"
+        self.root.after(0, self.status_var.set, message)
 
     def update_ui_on_completion(self, error: Optional[str]):
         self.start_button.configure(state="normal")
-        self.pause_button.configure(state="disabled")
+        self.resume_crawl_button.configure(state="normal")
+        self.pause_button.configure(state="disabled", text="Pause")
         self.stop_button.configure(state="disabled")
+        self.profile_button.configure(state="disabled")
 
         if error:
             self.status_var.set(f"Error: {error}")
             messagebox.showerror("Error", f"Crawling failed: {error}")
         else:
+            self.export_button.configure(state="normal")
             self.status_var.set("Crawling completed")
             messagebox.showinfo("Success", "Crawling completed successfully")
 
     def update_stats(self):
-        if not self.stop_requested:
-            stats = self.stats.get_stats()
+        if not self.engine.stop_requested:
+            stats = self.engine.progress()
             self.dashboard.update_stats(stats)
+            self.dashboard.update_hosts(self.engine.host_control.snapshot())
+            self.dashboard.update_top_hosts(stats["top_hosts"])
+            self.dashboard.update_stages(stats["stages"])
             self.visualization.update_plots(stats)
             self.root.after(1000, self.update_stats)
 
     def export_data(self, format_type: str = 'html'):
-        timestamp = datetime.now().strftime('%Y%m%d_%H%M%S')
-
-        try:
-            if format_type == 'html':
-                filename = f'crawl_report_{timestamp}.html'
-                self._export_html(filename)
-            elif format_type == 'json':
-                filename = f'crawl_data_{timestamp}.json'
-                with open(filename, 'w', encoding='utf-8') as f:
-                    json.dump(self.crawled_data, f, indent=2, ensure_ascii=False)
-            elif format_type == 'csv':
-                filename = f'crawl_data_{timestamp}.csv'
-                df = pd.DataFrame([
-                    {
-                        'url': d['url'],
-                        'title': d['title'],
-                        'timestamp': d['timestamp'],
-                        'depth': d['depth'],
-                        'num_links': len(d['links'])
-                    }
-                    for d in self.crawled_data
-                ])
-                df.to_csv(filename, index=False)
-
-            self.logger.info(f"Data exported to {filename}")
-            return filename
-
-        except Exception as e:
-            self.logger.error(f"Error exporting data: {str(e)}")
-            raise
-
-    def _export_html(self, filename: str):
-        html_content = f"""
-        <!DOCTYPE html>
-        <html>
-        <head>
-            <title>Crawler Report - {datetime.now().strftime('%Y-%m-%d %H:%M:%S')}</title>
-            <style>
-                body {{ font-family: Arial, sans-serif; margin: 20px; }}
-                .stats {{ background: #f5f5f5; padding: 15px; border-radius: 5px; }}
-                .page {{ margin: 15px 0; padding: 10px; border: 1px solid #ddd; }}
-                .links {{ margin-left: 20px; }}
-                pre {{ background: #f8f8f8; padding: 10px; overflow-x: auto; }}
-            </style>
-        </head>
-        <body>
-            <h1>Web Crawler Report</h1>
-
-            <div class="stats">
-                <h2>Crawling Statistics</h2>
-                <p>Pages Crawled: {len(self.crawled_data)}</p>
-                <p>Start Time: {self.stats.start_time}</p>
-                <p>Total Time: {time.time() - self.stats.start_time:.2f} seconds</p>
-            </div>
-
-            <h2>Crawled Pages</h2>
-        """
-
-        for data in self.crawled_data:
-            html_content += f"""
-            <div class="page">
-                <h3><a href="{html.escape(data['url'])}">{html.escape(data['title'] or data['url'])}</a></h3>
-                <p>Depth: {data['depth']}</p>
-                <p>Crawled at: {data['timestamp']}</p>
-
-                <div class="links">
-                    <h4>Found Links ({len(data['links'])})</h4>
-                    <ul>
-            """
-
-            for link in data['links'][:10]:
-                html_content += f"""
-                    <li><a href="{html.escape(link['href'])}">{html.escape(link['text'] or link['href'])}</a></li>
-                """
-
-            if len(data['links']) > 10:
-                html_content += f"<li>... and {len(data['links']) - 10} more links</li>"
-
-            html_content += """
-                    </ul>
-                </div>
-            </div>
-            """
-
-        html_content += """
-        </body>
-        </html>
-        """
-
-        with open(filename, 'w', encoding='utf-8') as f:
-            f.write(html_content)
+        return self.engine.export(format_type)
 
     def show_export_dialog(self):
         export_window = tk.Toplevel(self.root)
         export_window.title("Export Crawler Data")
-        export_window.geometry("300x150")
+        export_window.geometry("300x180")
 
         ttk.Label(export_window, text="Choose export format:").pack(pady=10)
 
@@ -447,6 +464,9 @@ class EnhancedWebCrawler:
         ttk.Radiobutton(export_window, text="HTML Report", variable=format_var, value="html").pack()
         ttk.Radiobutton(export_window, text="JSON Data", variable=format_var, value="json").pack()
         ttk.Radiobutton(export_window, text="CSV Data", variable=format_var, value="csv").pack()
+        if ParquetSink.is_available():
+            ttk.Radiobutton(export_window, text="Parquet (pages + links)", variable=format_var, value="parquet").pack()
+        ttk.Radiobutton(export_window, text="Latency and Stage Timings (JSON)", variable=format_var, value="timings").pack()
 
         def do_export():
             try:
@@ -465,4 +485,4 @@ def main():
     root.mainloop()
 
 if __name__ == "__main__":
-    main()
\ No newline at end of file
+    main()